@@ -0,0 +1,537 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from marketplace.catalog import get_catalog
+from marketplace.models import Notification, SavedSearch
+
+logger = logging.getLogger(__name__)
+
+RANGE_COLUMNS = ("year", "price", "mileage")
+# Typical spread of each column; a range's width relative to it tells how
+# selective the range is, and so which interval tree it goes into.
+RANGE_SPANS = np.array([30.0, 100000.0, 400000.0])
+NO_LOW = np.iinfo(np.int64).min
+NO_HIGH = np.iinfo(np.int64).max
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alerts")
+
+
+def keyword_set(text: str) -> frozenset:
+    return frozenset(word.lower() for word in re.findall(r"\w+", text))
+
+
+def expand_ranges(starts, stops):
+    """
+    Concatenate ``range(start, stop)`` for every pair, vectorized.
+    """
+    counts = stops - starts
+    total = int(counts.sum())
+    if not total:
+        return counts, np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return counts, offsets + np.arange(total)
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed ``[low, high]`` ranges.
+
+    Every node keeps the ranges that contain its center, sorted by low
+    and by high. A point left of the center is contained by a prefix of
+    the former, a point right of it by a suffix of the latter, and only
+    one child can hold more ranges containing it, so ``stab`` visits one
+    node per level. A batch of points walks the tree together, with one
+    ``searchsorted`` per visited node.
+    """
+
+    def __init__(self, lows, highs, items):
+        self.nodes = []
+        if len(items):
+            self._build(
+                np.asarray(lows), np.asarray(highs), np.asarray(items)
+            )
+
+    def _build(self, lows, highs, items) -> int:
+        center = np.median(np.concatenate([lows, highs]))
+        left = highs < center
+        right = lows > center
+        here = ~(left | right)
+        by_low = np.argsort(lows[here], kind="stable")
+        by_high = np.argsort(highs[here], kind="stable")
+        node = [
+            center,
+            lows[here][by_low],
+            items[here][by_low],
+            highs[here][by_high],
+            items[here][by_high],
+            None,
+            None,
+        ]
+        position = len(self.nodes)
+        self.nodes.append(node)
+        if left.any():
+            node[5] = self._build(lows[left], highs[left], items[left])
+        if right.any():
+            node[6] = self._build(lows[right], highs[right], items[right])
+        return position
+
+    def stab_point(self, point) -> np.ndarray:
+        """
+        Return the items of every range containing ``point``.
+        """
+        found = []
+        node_index = 0 if self.nodes else None
+        while node_index is not None:
+            center, lows, low_items, highs, high_items, left, right = (
+                self.nodes[node_index]
+            )
+            if point < center:
+                found.append(low_items[:lows.searchsorted(point, "right")])
+                node_index = left
+            else:
+                found.append(high_items[highs.searchsorted(point, "left"):])
+                node_index = right
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def stab(self, points: np.ndarray) -> tuple:
+        """
+        Return ``(point positions, items)`` of every range containing
+        each of ``points``.
+        """
+        if len(points) == 1:
+            items = self.stab_point(points[0])
+            return np.zeros(len(items), dtype=np.int64), items
+        found_points, found_items = [], []
+        pending = [(0, np.arange(len(points)))] if self.nodes else []
+        while pending:
+            node_index, selected = pending.pop()
+            center, lows, low_items, highs, high_items, left, right = (
+                self.nodes[node_index]
+            )
+            values = points[selected]
+            is_left = values < center
+
+            before = selected[is_left]
+            if len(before) and len(lows):
+                counts, positions = expand_ranges(
+                    np.zeros(len(before), dtype=np.int64),
+                    np.searchsorted(lows, points[before], "right"),
+                )
+                found_points.append(np.repeat(before, counts))
+                found_items.append(low_items[positions])
+            after = selected[~is_left]
+            if len(after) and len(highs):
+                counts, positions = expand_ranges(
+                    np.searchsorted(highs, points[after], "left"),
+                    np.full(len(after), len(highs)),
+                )
+                found_points.append(np.repeat(after, counts))
+                found_items.append(high_items[positions])
+
+            if left is not None and len(before):
+                pending.append((left, before))
+            if right is not None and len(after):
+                pending.append((right, after))
+
+        if not found_points:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(found_points), np.concatenate(found_items)
+
+
+class SearchBucket:
+    """
+    Saved searches sharing a car model, a brand or neither. Each search
+    is filed in the interval tree of its most selective range; searches
+    without ranges match every listing of the bucket.
+    """
+
+    def __init__(self, rows):
+        self.search_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.user_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        self.lows = np.array(
+            [row[2] for row in rows], dtype=np.int64
+        ).reshape(-1, 3)
+        self.highs = np.array(
+            [row[3] for row in rows], dtype=np.int64
+        ).reshape(-1, 3)
+        self.keywords = [row[4] for row in rows]
+        self.has_keywords = np.array(
+            [keywords is not None for keywords in self.keywords], dtype=bool
+        )
+
+        bounded_lows = np.maximum(self.lows, 0).astype(np.float64)
+        bounded_highs = np.where(
+            self.highs == NO_HIGH, np.inf, self.highs
+        ).astype(np.float64)
+        widths = (bounded_highs - bounded_lows) / RANGE_SPANS
+        widths[(self.lows == NO_LOW) & (self.highs == NO_HIGH)] = np.inf
+        best = np.argmin(widths, axis=1)
+        unbounded = np.isinf(widths.min(axis=1))
+        self.unbounded = np.flatnonzero(unbounded)
+        self.trees = []
+        for column in range(len(RANGE_COLUMNS)):
+            items = np.flatnonzero((best == column) & ~unbounded)
+            if len(items):
+                self.trees.append((
+                    column,
+                    IntervalTree(
+                        self.lows[items, column],
+                        self.highs[items, column],
+                        items,
+                    ),
+                ))
+
+    def __len__(self):
+        return len(self.search_ids)
+
+    def match(self, values: np.ndarray) -> tuple:
+        """
+        Return ``(listing positions, search positions)`` of every search
+        whose ranges contain the ``(year, price, mileage)`` row of the
+        listing; keywords are left to the caller.
+        """
+        found_points, found_items = [], []
+        for column, tree in self.trees:
+            points, items = tree.stab(values[:, column])
+            found_points.append(points)
+            found_items.append(items)
+        if len(self.unbounded):
+            found_points.append(
+                np.repeat(np.arange(len(values)), len(self.unbounded))
+            )
+            found_items.append(np.tile(self.unbounded, len(values)))
+        if not found_points:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        points = np.concatenate(found_points)
+        items = np.concatenate(found_items)
+        rows = values[points]
+        inside = (
+            (self.lows[items] <= rows) & (rows <= self.highs[items])
+        ).all(axis=1)
+        return points[inside], items[inside]
+
+
+class SearchIndex:
+    """
+    Every saved search, bucketed by car model, by brand, or in one
+    bucket for searches on neither.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    @classmethod
+    def load(cls, queryset=None):
+        if queryset is None:
+            queryset = SavedSearch.objects.all()
+        grouped = {}
+        rows = queryset.order_by("id").values_list(
+            "id",
+            "user_id",
+            "brand_id",
+            "car_model_id",
+            "year_start",
+            "year_end",
+            "price_start",
+            "price_end",
+            "mileage_start",
+            "mileage_end",
+            "keywords",
+        )
+        for row in rows.iterator(chunk_size=10000):
+            search_id, user_id, brand_id, model_id = row[:4]
+            bounds = row[4:10]
+            if model_id is not None:
+                key = ("model", model_id)
+            elif brand_id is not None:
+                key = ("brand", brand_id)
+            else:
+                key = None
+            grouped.setdefault(key, []).append((
+                search_id,
+                user_id,
+                [NO_LOW if low is None else low for low in bounds[::2]],
+                [NO_HIGH if high is None else high for high in bounds[1::2]],
+                keyword_set(row[10]) if row[10] else None,
+            ))
+        return cls(
+            {key: SearchBucket(rows) for key, rows in grouped.items()}
+        )
+
+    def match(self, listings) -> tuple:
+        """
+        Return ``(listing positions, saved search ids, user ids)`` arrays
+        with one entry per saved search a listing matches, leaving out
+        the seller's own searches.
+
+        Listings are grouped by car model and brand, and each bucket
+        matches its whole group in one vectorized pass.
+        """
+        listings = list(listings)
+        empty = np.empty(0, dtype=np.int64)
+        if not listings or not self.buckets:
+            return empty, empty, empty
+        model_brands = get_catalog().model_brands
+        models = np.array(
+            [listing.car_model_id for listing in listings], dtype=np.int64
+        )
+        brands = np.array(
+            [model_brands.get(listing.car_model_id, -1)
+             for listing in listings],
+            dtype=np.int64,
+        )
+        values = np.array(
+            [
+                (listing.year, listing.price, listing.mileage)
+                for listing in listings
+            ],
+            dtype=np.int64,
+        )
+        sellers = np.array(
+            [listing.seller_id for listing in listings], dtype=np.int64
+        )
+
+        groups = [(None, np.arange(len(listings)))]
+        for name, keys in (("model", models), ("brand", brands)):
+            for key in np.unique(keys).tolist():
+                if (name, key) in self.buckets:
+                    groups.append(((name, key), np.flatnonzero(keys == key)))
+
+        found = ([], [], [])
+        descriptions = {}
+        for key, positions in groups:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            points, items = bucket.match(values[positions])
+            points = positions[points]
+            keep = sellers[points] != bucket.user_ids[items]
+            # Keywords are checked one pair at a time, and only for the
+            # few searches that have them.
+            for pair in np.flatnonzero(keep & bucket.has_keywords[items]):
+                point = int(points[pair])
+                if point not in descriptions:
+                    descriptions[point] = keyword_set(
+                        listings[point].description
+                    )
+                keep[pair] = (
+                    bucket.keywords[items[pair]] <= descriptions[point]
+                )
+            points, items = points[keep], items[keep]
+            found[0].append(points)
+            found[1].append(bucket.search_ids[items])
+            found[2].append(bucket.user_ids[items])
+        if not found[0]:
+            return empty, empty, empty
+        return tuple(np.concatenate(parts) for parts in found)
+
+
+class LayeredSearchIndex:
+    """
+    A :class:`SearchIndex` of the saved searches created before
+    ``cutoff`` and a small one of those created since.
+    """
+
+    def __init__(self, main, recent, cutoff):
+        self.main = main
+        self.recent = recent
+        self.cutoff = cutoff
+
+    def __len__(self):
+        return len(self.main) + len(self.recent)
+
+    @classmethod
+    def load(cls):
+        cutoff = now() - timedelta(
+            seconds=settings.SAVED_SEARCH_CHANGE_OVERLAP_SECONDS
+        )
+        return cls(
+            SearchIndex.load(
+                SavedSearch.objects.filter(created_at__lt=cutoff)
+            ),
+            cls.load_recent(cutoff),
+            cutoff,
+        )
+
+    @staticmethod
+    def load_recent(cutoff) -> SearchIndex:
+        return SearchIndex.load(
+            SavedSearch.objects.filter(created_at__gte=cutoff)
+        )
+
+    def refreshed(self):
+        return type(self)(
+            self.main, self.load_recent(self.cutoff), self.cutoff
+        )
+
+    def match(self, listings) -> tuple:
+        """
+        Same as :meth:`SearchIndex.match`, over both indexes.
+        """
+        listings = list(listings)
+        found = [self.main.match(listings), self.recent.match(listings)]
+        return tuple(np.concatenate(parts) for parts in zip(*found))
+
+
+class SearchIndexCache:
+    """
+    Process-local copy of the saved search index.
+
+    Searches created by any worker are read into the small recent index
+    at most every ``SAVED_SEARCH_CHECK_SECONDS``, so a new search never
+    reloads the whole index inside a request. The main index is reloaded
+    on a background thread once the recent one holds more than
+    ``SAVED_SEARCH_MAX_RECENT`` searches or it is older than
+    ``SAVED_SEARCH_REBUILD_SECONDS``. Deleted searches are skipped when
+    notifications are stored and dropped by that reload.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.snapshot = None
+        self.built_at = 0.0
+        self.checked_at = 0.0
+        self.rebuilding = False
+
+    def get(self) -> LayeredSearchIndex:
+        with self.lock:
+            snapshot = self.snapshot
+            stale = snapshot is not None and (
+                time.monotonic() - self.checked_at
+                > settings.SAVED_SEARCH_CHECK_SECONDS
+            )
+        if snapshot is None:
+            with self.build_lock:
+                if self.snapshot is None:
+                    self._load()
+                return self.snapshot
+        if not stale:
+            return snapshot
+
+        snapshot = snapshot.refreshed()
+        with self.lock:
+            if self.snapshot is not None and (
+                self.snapshot.cutoff == snapshot.cutoff
+            ):
+                self.snapshot = snapshot
+                self.checked_at = time.monotonic()
+            age = time.monotonic() - self.built_at
+            # Searches newer than the overlap stay in the recent index
+            # whatever the cutoff, so reloading sooner would not help.
+            expired = not self.rebuilding and (
+                len(snapshot.recent) > settings.SAVED_SEARCH_MAX_RECENT
+                and age > settings.SAVED_SEARCH_CHANGE_OVERLAP_SECONDS
+                or age > settings.SAVED_SEARCH_REBUILD_SECONDS
+            )
+            if expired:
+                self.rebuilding = True
+        if expired:
+            if settings.SAVED_SEARCH_ASYNC_REBUILD:
+                executor.submit(self.rebuild_in_background)
+            else:
+                try:
+                    self.rebuild()
+                finally:
+                    with self.lock:
+                        self.rebuilding = False
+        return snapshot
+
+    def _load(self) -> None:
+        snapshot = LayeredSearchIndex.load()
+        with self.lock:
+            self.snapshot = snapshot
+            self.built_at = self.checked_at = time.monotonic()
+
+    def rebuild(self) -> None:
+        with self.build_lock:
+            self._load()
+
+    def rebuild_in_background(self) -> None:
+        close_old_connections()
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Could not rebuild the saved search index")
+        finally:
+            close_old_connections()
+            with self.lock:
+                self.rebuilding = False
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.snapshot = None
+
+    def expire(self) -> None:
+        """
+        Re-read the recent searches on the next :meth:`get`.
+        """
+        with self.lock:
+            self.checked_at = 0.0
+
+
+search_index_cache = SearchIndexCache()
+
+
+def get_search_index() -> LayeredSearchIndex:
+    return search_index_cache.get()
+
+
+def saved_searches_changed() -> None:
+    search_index_cache.expire()
+
+
+def notify_new_listings(listings) -> int:
+    """
+    Match new listings against every saved search and store one
+    notification per match, ``NOTIFICATION_BATCH_SIZE`` rows per insert.
+    Returns the number of notifications stored.
+    """
+    listings = list(listings)
+    positions, search_ids, user_ids = get_search_index().match(listings)
+    if not len(positions):
+        return 0
+    # The index keeps deleted searches until its next full reload.
+    existing = np.fromiter(
+        SavedSearch.objects.filter(
+            id__in=np.unique(search_ids).tolist()
+        ).values_list("id", flat=True),
+        dtype=np.int64,
+    )
+    keep = np.isin(search_ids, existing)
+    positions, search_ids, user_ids = (
+        positions[keep], search_ids[keep], user_ids[keep]
+    )
+    listing_ids = [listing.id for listing in listings]
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                user_id=user_id,
+                saved_search_id=search_id,
+                listing_id=listing_ids[position],
+            )
+            for position, search_id, user_id in zip(
+                positions.tolist(), search_ids.tolist(), user_ids.tolist()
+            )
+        ],
+        batch_size=settings.NOTIFICATION_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return len(positions)
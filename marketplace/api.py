@@ -0,0 +1,135 @@
+import orjson
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.http import Http404, HttpRequest, HttpResponse
+from django.views.decorators.http import require_GET
+
+from marketplace.models import Listing
+from marketplace.pagination import CursorPaginator, InvalidCursor
+from marketplace.search import ORMSearchBackend, parse_search_params
+
+# Public field name -> ORM lookup read through ``.values()``.
+API_FIELDS = {
+    "id": "id",
+    "brand_id": "car_model__brand_id",
+    "brand": "car_model__brand__name",
+    "model_id": "car_model_id",
+    "model": "car_model__name",
+    "year": "year",
+    "price": "price",
+    "mileage": "mileage",
+    "description": "description",
+    "seller_id": "seller_id",
+    "created_at": "created_at",
+    "cover_image": "cover_image__image",
+}
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class BadRequest(Exception):
+    pass
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(
+        orjson.dumps(data), status=status, content_type="application/json"
+    )
+
+
+def parse_fields(request: HttpRequest) -> list:
+    value = request.GET.get("fields")
+    if not value:
+        return list(API_FIELDS)
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        raise BadRequest(
+            f"Unknown field(s): {', '.join(unknown)}. "
+            f"Available: {', '.join(API_FIELDS)}."
+        )
+    return fields
+
+
+def parse_page_size(request: HttpRequest) -> int:
+    value = request.GET.get("limit")
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise BadRequest("limit must be an integer.")
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def listing_values(queryset, fields: list):
+    """
+    Select ``fields`` plus the cursor columns as plain dicts; fields
+    read through a relation are fetched under an ``api_`` alias.
+    """
+    selected = set(fields) | {"id", "created_at"}
+    direct = [
+        lookup for name, lookup in API_FIELDS.items()
+        if name in selected and name == lookup
+    ]
+    aliased = {
+        f"api_{name}": F(lookup) for name, lookup in API_FIELDS.items()
+        if name in selected and name != lookup
+    }
+    return queryset.values(*direct, **aliased)
+
+
+def serialize_row(row: dict, fields: list) -> dict:
+    data = {}
+    for name in fields:
+        value = row[name if name == API_FIELDS[name] else f"api_{name}"]
+        if name == "cover_image":
+            value = default_storage.url(value) if value else None
+        data[name] = value
+    return data
+
+
+def page_url(request: HttpRequest, cursor) -> str:
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query["cursor"] = cursor
+    return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+
+@require_GET
+def listing_list_api(request: HttpRequest):
+    try:
+        fields = parse_fields(request)
+        page_size = parse_page_size(request)
+        if parse_search_params(request.GET) is None:
+            raise BadRequest("Filters must be integers.")
+        queryset = ORMSearchBackend().search(
+            Listing.objects.all(), request.GET
+        )
+        page = CursorPaginator(
+            listing_values(queryset, fields), page_size
+        ).page(request.GET.get("cursor"))
+    except (BadRequest, InvalidCursor) as error:
+        return json_response({"error": str(error)}, status=400)
+
+    return json_response(
+        {
+            "results": [serialize_row(row, fields) for row in page],
+            "next": page_url(request, page.next_cursor),
+            "previous": page_url(request, page.previous_cursor),
+        }
+    )
+
+
+@require_GET
+def listing_detail_api(request: HttpRequest, pk: int):
+    try:
+        fields = parse_fields(request)
+    except BadRequest as error:
+        return json_response({"error": str(error)}, status=400)
+
+    row = listing_values(Listing.objects.filter(pk=pk), fields).first()
+    if row is None:
+        raise Http404("Listing not found")
+    return json_response(serialize_row(row, fields))
@@ -0,0 +1,194 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import get_user
+from django.contrib.auth.mixins import AccessMixin
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import Http404, HttpRequest, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+
+from marketplace import views
+from marketplace.facets import listing_facets
+from marketplace.favourites import (
+    afavourite_ids,
+    ais_favourite,
+    atoggle_favourite,
+)
+from marketplace.forms import SearchForm
+from marketplace.models import Listing
+from marketplace.response_cache import cache_anonymous_response
+from marketplace.statistics import amarket_counters
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_QUERY_WORKERS or 1,
+    thread_name_prefix="queries",
+)
+
+
+def run_in_worker(function, *args):
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+async def in_query_thread(function, *args):
+    """
+    Run the blocking ``function`` on a query worker thread, which keeps
+    a database connection of its own.
+
+    Django's async ORM runs every query of a request on the request's
+    thread, one after another, so independent work is sent here to run
+    at the same time. With ``ASYNC_QUERY_WORKERS`` set to 0 it runs on
+    the request's thread as well, e.g. inside a test transaction that
+    other connections cannot see.
+    """
+    if not settings.ASYNC_QUERY_WORKERS:
+        return await sync_to_async(function)(*args)
+    return await sync_to_async(
+        run_in_worker, thread_sensitive=False, executor=executor
+    )(function, *args)
+
+
+def start_in_query_thread(function, *args):
+    """
+    Start ``in_query_thread(function, *args)`` and return an awaitable
+    for its result, so the request can go on with other work meanwhile.
+
+    Calls on the request's thread stay in the view's own task: asgiref
+    cannot trace a task started here back to the request, and would
+    queue the call on a thread that is waiting for the view to finish.
+    They therefore run when awaited, as do all calls with
+    ``ASYNC_QUERY_WORKERS`` set to 0.
+    """
+    call = in_query_thread(function, *args)
+    if settings.ASYNC_QUERY_WORKERS:
+        return asyncio.ensure_future(call)
+    return call
+
+
+async def aget_user(request: HttpRequest):
+    """
+    Load the lazy ``request.user`` on the request's thread; reading it
+    queries the session and user tables, which async code may not do.
+    """
+    return await sync_to_async(get_user)(request)
+
+
+class LoginRequiredMixin(AccessMixin):
+    """
+    ``LoginRequiredMixin`` for async views, which cannot read the lazy
+    ``request.user`` directly.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+@cache_anonymous_response("index")
+async def index(request: HttpRequest):
+    form = SearchForm(request.GET)
+    # Validating the form may look the brand and model up.
+    validation = start_in_query_thread(form.is_valid)
+    context = await amarket_counters()
+    is_valid = await validation
+
+    if is_valid:
+        context.update(
+            {
+                "search_form": form,
+            }
+        )
+        return TemplateResponse(
+            request, "marketplace/index.html", context=context
+        )
+
+
+@method_decorator(cache_anonymous_response("listings"), name="dispatch")
+class ListingListView(views.BaseListingListView):
+    """
+    The page of listings and the facets are loaded at the same time on
+    query threads; the favourite flags of the page follow.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        # A coroutine function, so the response cache wraps it with its
+        # async wrapper.
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        page = start_in_query_thread(self.load_page)
+        facets = start_in_query_thread(listing_facets, request.GET)
+        user = await aget_user(request)
+        self.object_list, self.pagination = await page
+        self.facets = await facets
+        self.favourite_ids = await afavourite_ids(
+            user, self.pagination[2]
+        )
+        return self.render_to_response(self.get_context_data())
+
+    def load_page(self) -> tuple:
+        queryset = self.get_queryset()
+        paginator, page, listings, is_paginated = super().paginate_queryset(
+            queryset, self.get_paginate_by(queryset)
+        )
+        page.object_list = list(listings)
+        return queryset, (paginator, page, page.object_list, is_paginated)
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.pagination
+
+    def get_facets(self) -> dict:
+        return self.facets
+
+    def get_favourite_ids(self, listings) -> set:
+        return self.favourite_ids
+
+
+class ListingDetailView(views.ListingDetailView):
+    async def get(self, request, *args, **kwargs):
+        cached = start_in_query_thread(self.get_cached_object)
+        user = await aget_user(request)
+        key, listing = await cached
+        if listing is not None:
+            self.is_favourite = await ais_favourite(user, listing.id)
+        else:
+            try:
+                listing = await self.get_queryset().aget(
+                    pk=kwargs[self.pk_url_kwarg]
+                )
+            except Listing.DoesNotExist:
+                raise Http404("No listing found matching the query")
+            # The flag belongs to the current user, so keep it out of the
+            # shared cache entry.
+            self.is_favourite = listing.__dict__.pop("is_favourite", False)
+            if key is not None:
+                await cache.aset(
+                    key, listing, settings.LISTING_DETAIL_CACHE_TIMEOUT
+                )
+
+        self.object = listing
+        return self.render_to_response(
+            self.get_context_data(object=listing)
+        )
+
+
+class ToggleAssignToListingView(LoginRequiredMixin, View):
+    async def post(self, request, pk):
+        if not await Listing.objects.filter(pk=pk).aexists():
+            raise Http404("Listing not found")
+        await atoggle_favourite(request.user, pk)
+
+        return HttpResponseRedirect(
+            reverse("marketplace:listing-detail", args=[pk])
+        )
@@ -0,0 +1,228 @@
+import random
+from array import array
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from marketplace.alerts import saved_searches_changed
+from marketplace.favourites import Favourite
+from marketplace.models import (
+    Brand,
+    Image,
+    Model,
+    Listing,
+    MarketUser,
+    SavedSearch,
+)
+from marketplace.pricing import fit_price_models
+from marketplace.statistics import rebuild_statistics
+
+BATCH_SIZE = 5000
+
+# Dataset shapes used by ``run_benchmark_suite --generate``.
+SCALES = {
+    "10k": {
+        "listings": 10_000,
+        "brands": 20,
+        "models_per_brand": 10,
+        "users": 500,
+        "images_per_listing": 1,
+        "favourites_per_user": 5,
+    },
+    "1m": {
+        "listings": 1_000_000,
+        "brands": 40,
+        "models_per_brand": 15,
+        "users": 20_000,
+        "images_per_listing": 1,
+        "favourites_per_user": 5,
+    },
+    "10m": {
+        "listings": 10_000_000,
+        "brands": 60,
+        "models_per_brand": 20,
+        "users": 200_000,
+        "images_per_listing": 1,
+        "favourites_per_user": 5,
+    },
+}
+
+
+def set_cover_images(listing_ids) -> None:
+    first_image = (
+        Image.objects.filter(listing=OuterRef("pk"))
+        .order_by("id")
+        .values("id")[:1]
+    )
+    Listing.objects.filter(id__in=listing_ids).update(
+        cover_image=Subquery(first_image)
+    )
+
+
+def generate_dataset(
+    listings: int,
+    brands: int = 40,
+    models_per_brand: int = 15,
+    users: int = 1000,
+    images_per_listing: int = 0,
+    favourites_per_user: int = 0,
+    seed: int = 0,
+    prefix: str = "bench",
+) -> dict:
+    """
+    Insert a deterministic synthetic dataset in batches.
+
+    Each listing gets between 0 and ``2 * images_per_listing`` image rows
+    (names only, no files) with the first one as its cover, and each user
+    favourites between 0 and ``2 * favourites_per_user`` random listings.
+    """
+    rng = random.Random(seed)
+
+    brand_objects = Brand.objects.bulk_create(
+        [Brand(name=f"{prefix}_brand_{i}") for i in range(brands)],
+        batch_size=BATCH_SIZE,
+    )
+    model_objects = Model.objects.bulk_create(
+        [
+            Model(brand=brand, name=f"{prefix}_model_{brand.id}_{i}")
+            for brand in brand_objects
+            for i in range(models_per_brand)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    user_objects = MarketUser.objects.bulk_create(
+        [
+            MarketUser(username=f"{prefix}_user_{i}", password="!")
+            for i in range(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    model_ids = [model.id for model in model_objects]
+    user_ids = [user.id for user in user_objects]
+    listing_ids = array("q")
+
+    created = 0
+    images = 0
+    while created < listings:
+        batch = min(BATCH_SIZE, listings - created)
+        with transaction.atomic():
+            listing_objects = Listing.objects.bulk_create(
+                [
+                    Listing(
+                        seller_id=rng.choice(user_ids),
+                        car_model_id=rng.choice(model_ids),
+                        year=rng.randint(1990, 2023),
+                        price=rng.randrange(1000, 100000, 100),
+                        mileage=rng.randrange(0, 400000, 1000),
+                        description=f"{prefix} listing {created + i}",
+                    )
+                    for i in range(batch)
+                ]
+            )
+            batch_ids = [listing.id for listing in listing_objects]
+            listing_ids.extend(batch_ids)
+            if images_per_listing:
+                image_objects = [
+                    Image(
+                        listing_id=listing_id,
+                        image=f"{prefix}/listing_{listing_id}_{i}.jpg",
+                    )
+                    for listing_id in batch_ids
+                    for i in range(rng.randint(0, 2 * images_per_listing))
+                ]
+                Image.objects.bulk_create(
+                    image_objects, batch_size=BATCH_SIZE
+                )
+                set_cover_images(batch_ids)
+                images += len(image_objects)
+        created += batch
+
+    favourites = 0
+    if favourites_per_user and listing_ids:
+        pending = []
+        for user_id in user_ids:
+            chosen = {
+                rng.choice(listing_ids)
+                for _ in range(rng.randint(0, 2 * favourites_per_user))
+            }
+            pending.extend(
+                Favourite(marketuser_id=user_id, listing_id=listing_id)
+                for listing_id in sorted(chosen)
+            )
+            if len(pending) >= BATCH_SIZE:
+                Favourite.objects.bulk_create(pending)
+                favourites += len(pending)
+                pending = []
+        Favourite.objects.bulk_create(pending)
+        favourites += len(pending)
+
+    # Bulk inserts bypass the signals that keep the rollups up to date.
+    rebuild_statistics()
+    fit_price_models()
+
+    return {
+        "brand_ids": [brand.id for brand in brand_objects],
+        "model_ids": model_ids,
+        "user_ids": user_ids,
+        "listings": created,
+        "images": images,
+        "favourites": favourites,
+    }
+
+
+def random_range(rng, chance, low, high, step, widest):
+    if rng.random() >= chance:
+        return None, None
+    start = rng.randrange(low, high, step)
+    end = start + rng.randrange(step, widest, step)
+    # A third of the ranges are one-sided.
+    side = rng.random()
+    if side < 0.15:
+        return None, end
+    if side < 0.3:
+        return start, None
+    return start, end
+
+
+def generate_saved_searches(count: int, seed: int = 0) -> int:
+    """
+    Insert ``count`` saved searches of existing users: mostly on a car
+    model, some on a brand and a few on neither, with random year, price
+    and mileage ranges and occasional keywords.
+    """
+    rng = random.Random(seed)
+    user_ids = list(MarketUser.objects.values_list("id", flat=True))
+    models = list(Model.objects.values_list("id", "brand_id"))
+    if not user_ids or not models:
+        return 0
+
+    created = 0
+    while created < count:
+        batch = []
+        for _ in range(min(BATCH_SIZE, count - created)):
+            model_id, brand_id = rng.choice(models)
+            kind = rng.random()
+            year_start, year_end = random_range(rng, 0.7, 1990, 2023, 1, 6)
+            price_start, price_end = random_range(
+                rng, 0.9, 1000, 100000, 500, 10000
+            )
+            mileage_start, mileage_end = random_range(
+                rng, 0.5, 0, 400000, 5000, 100000
+            )
+            batch.append(SavedSearch(
+                user_id=rng.choice(user_ids),
+                car_model_id=model_id if kind < 0.7 else None,
+                brand_id=brand_id if 0.7 <= kind < 0.97 else None,
+                year_start=year_start,
+                year_end=year_end,
+                price_start=price_start,
+                price_end=price_end,
+                mileage_start=mileage_start,
+                mileage_end=mileage_end,
+                keywords="listing" if rng.random() < 0.05 else "",
+            ))
+        SavedSearch.objects.bulk_create(batch)
+        created += len(batch)
+    saved_searches_changed()
+    return created
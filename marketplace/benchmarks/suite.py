@@ -0,0 +1,239 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from marketplace.favourites import Favourite
+from marketplace.models import Brand, Listing, MarketUser, Model
+from marketplace.pagination import encode_cursor
+from marketplace.views import ListingListView
+
+DETAIL_SAMPLE = 50
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Scenario:
+    """
+    A named set of request paths, optionally requested as ``user`` and
+    with ``settings`` overridden, e.g. to switch on cursor pagination.
+    """
+
+    def __init__(self, name: str, paths: list, user=None, settings=None):
+        self.name = name
+        self.paths = paths
+        self.user = user
+        self.settings = settings or {}
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def listings_url(**params) -> str:
+    query = "&".join(f"{name}={value}" for name, value in params.items())
+    url = reverse("marketplace:listings-list")
+    return f"{url}?{query}" if query else url
+
+
+def sample_listing_ids(rng: random.Random, size: int) -> list:
+    bounds = Listing.objects.order_by("id").values_list("id", flat=True)
+    first, last = bounds.first(), bounds.last()
+    candidates = [rng.randint(first, last) for _ in range(size * 2)]
+    ids = Listing.objects.filter(id__in=candidates).values_list(
+        "id", flat=True
+    )
+    return sorted(ids)[:size] or [first]
+
+
+def middle_cursor(total: int) -> str:
+    listing = (
+        Listing.objects.order_by("-created_at", "-id")
+        .only("id", "created_at")[total // 2]
+    )
+    return encode_cursor(listing.created_at, listing.id, "next")
+
+
+def build_scenarios(seed: int = 0) -> list:
+    """
+    Build the benchmark scenarios from the data that is in the database.
+
+    Raises :class:`BenchmarkError` when there are no listings to measure.
+    """
+    total = Listing.objects.count()
+    if not total:
+        raise BenchmarkError("There are no listings to benchmark.")
+
+    rng = random.Random(seed)
+    brand_ids = list(Brand.objects.values_list("id", flat=True)[:20])
+    model_ids = list(Model.objects.values_list("id", flat=True)[:50])
+    detail_ids = sample_listing_ids(rng, DETAIL_SAMPLE)
+    seller = MarketUser.objects.get(
+        id=Listing.objects.values_list("seller_id", flat=True).first()
+    )
+    fan = MarketUser.objects.filter(
+        id__in=Favourite.objects.values("marketuser_id")[:1]
+    ).first() or seller
+    deep_page = max(1, total // ListingListView.paginate_by)
+
+    return [
+        Scenario("index", [reverse("marketplace:index")]),
+        Scenario("listings", [listings_url()]),
+        Scenario(
+            "listings_brand",
+            [listings_url(brand=brand_id) for brand_id in brand_ids],
+        ),
+        Scenario(
+            "listings_model_year_price",
+            [
+                listings_url(
+                    model=model_id, year_start=2005, price_end=50000
+                )
+                for model_id in model_ids
+            ],
+        ),
+        Scenario("listings_keywords", [listings_url(keywords="listing")]),
+        Scenario("listings_deep_page", [listings_url(page=deep_page)]),
+        Scenario(
+            "listings_deep_cursor",
+            [listings_url(cursor=middle_cursor(total))],
+            settings={"LISTING_CURSOR_PAGINATION": True},
+        ),
+        Scenario(
+            "detail",
+            [
+                reverse("marketplace:listing-detail", args=[listing_id])
+                for listing_id in detail_ids
+            ],
+        ),
+        Scenario(
+            "favourites",
+            [reverse("marketplace:my-favourite-listings", args=[fan.id])],
+            user=fan,
+        ),
+        Scenario(
+            "sale",
+            [reverse("marketplace:sale-listings", args=[seller.id])],
+            user=seller,
+        ),
+        Scenario(
+            "api_listings",
+            [
+                f"{reverse('marketplace:api-listing-list')}?brand={brand_id}"
+                for brand_id in brand_ids
+            ],
+        ),
+    ]
+
+
+def request(client: Client, path: str):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise BenchmarkError(f"GET {path} returned {response.status_code}.")
+    return response
+
+
+def run_scenario(
+    scenario: Scenario, iterations: int = 50, warm: bool = False
+) -> dict:
+    """
+    Request the scenario paths in turn through the full middleware stack.
+
+    The first path is requested once untimed. Unless ``warm`` is set, the
+    cache is cleared before every request so the timings include the
+    database work. Peak memory is taken from one extra request under
+    ``tracemalloc``, which would skew the timings.
+    """
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+
+    timings = []
+    queries = []
+    with override_settings(ALLOWED_HOSTS=["testserver"], **scenario.settings):
+        request(client, scenario.paths[0])
+        for number in range(iterations):
+            path = scenario.paths[number % len(scenario.paths)]
+            if not warm:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                request(client, path)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        if not warm:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            request(client, scenario.paths[0])
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "queries": max(queries),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def run_suite(
+    scenarios: list, iterations: int = 50, warm: bool = False
+) -> dict:
+    return {
+        "listings": Listing.objects.count(),
+        "iterations": iterations,
+        "warm": warm,
+        "scenarios": {
+            scenario.name: run_scenario(scenario, iterations, warm)
+            for scenario in scenarios
+        },
+    }
+
+
+def compare_results(
+    results: dict, baseline: dict, tolerance: float = 0.2
+) -> list:
+    """
+    Return a message for every scenario that got slower than its
+    baseline p95 by more than ``tolerance``, or runs more queries.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.2f} ms, baseline "
+                f"{previous['p95_ms']:.2f} ms"
+            )
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                f"{name}: {current['queries']} queries, baseline "
+                f"{previous['queries']}"
+            )
+    return regressions
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding="utf-8") as source:
+        return json.load(source)
+
+
+def save_results(path: str, results: dict) -> None:
+    with open(path, "w", encoding="utf-8") as target:
+        json.dump(results, target, indent=2, sort_keys=True)
+        target.write("\n")
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+
+LISTINGS_GENERATION_KEY = "marketplace:listings:generation"
+FRAGMENTS_GENERATION_KEY = "marketplace:fragments:generation"
+CATALOG_VERSION_KEY = "marketplace:catalog:version"
+PRICING_VERSION_KEY = "marketplace:pricing:version"
+
+
+def _get_generation(key: str) -> int:
+    return cache.get_or_set(key, 1, timeout=None)
+
+
+def _bump_generation(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+def get_listings_generation() -> int:
+    return _get_generation(LISTINGS_GENERATION_KEY)
+
+
+def bump_listings_generation() -> None:
+    _bump_generation(LISTINGS_GENERATION_KEY)
+
+
+def get_fragments_generation() -> int:
+    return _get_generation(FRAGMENTS_GENERATION_KEY)
+
+
+def bump_fragments_generation() -> None:
+    """
+    Drop every cached listing card and detail entry at once, e.g. after a
+    car model is renamed.
+    """
+    _bump_generation(FRAGMENTS_GENERATION_KEY)
+
+
+def get_catalog_version() -> int:
+    return _get_generation(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> None:
+    _bump_generation(CATALOG_VERSION_KEY)
+
+
+def get_pricing_version() -> int:
+    return _get_generation(PRICING_VERSION_KEY)
+
+
+def bump_pricing_version() -> None:
+    _bump_generation(PRICING_VERSION_KEY)
+
+
+def get_favourites_generation(user_id: int) -> int:
+    return _get_generation(f"marketplace:favourites:{user_id}:generation")
+
+
+def bump_favourites_generation(user_id: int) -> None:
+    """
+    Drop the cached favourites count of one user. Favourites only change
+    per-user flags, so the shared listing caches are left alone.
+    """
+    _bump_generation(f"marketplace:favourites:{user_id}:generation")
+
+
+def listing_card_key(listing_id: int, generation: int) -> str:
+    return f"marketplace:card:{generation}:{listing_id}"
+
+
+def listing_detail_key(listing_id: int, generation: int) -> str:
+    return f"marketplace:detail:{generation}:{listing_id}"
+
+
+def similar_listings_key(listing_id: int, generation: int) -> str:
+    return f"marketplace:similar:{generation}:{listing_id}"
+
+
+def delete_listing_fragments(*listing_ids) -> None:
+    generation = get_fragments_generation()
+    keys = []
+    for listing_id in listing_ids:
+        keys.append(listing_card_key(listing_id, generation))
+        keys.append(listing_detail_key(listing_id, generation))
+        keys.append(similar_listings_key(listing_id, generation))
+    cache.delete_many(keys)
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from django import forms
+from django.conf import settings
+
+from marketplace.caching import get_catalog_version
+from marketplace.models import Brand, Model
+
+
+class Catalog:
+    """
+    Immutable snapshot of every brand and car model with their labels.
+    """
+
+    def __init__(self, brands, models, version=None):
+        self.brands = brands
+        self.models = models
+        self.version = version
+        self.models_by_brand = {brand_id: [] for brand_id, _ in brands}
+        self.model_brands = {}
+        for model_id, brand_id, label in models:
+            self.models_by_brand[brand_id].append((model_id, label))
+            self.model_brands[model_id] = brand_id
+
+    @classmethod
+    def load(cls, version=None):
+        brands = list(Brand.objects.values_list("id", "name"))
+        models = [
+            (model_id, brand_id, f"{brand_name} {name}")
+            for model_id, brand_id, brand_name, name in (
+                Model.objects.order_by("id").values_list(
+                    "id", "brand_id", "brand__name", "name"
+                )
+            )
+        ]
+        return cls(brands, models, version)
+
+    def brand_choices(self) -> list:
+        return list(self.brands)
+
+    def model_choices(self) -> list:
+        return [(model_id, label) for model_id, _, label in self.models]
+
+    def brand_model_choices(self, brand_id=None, model_id=None) -> list:
+        """
+        Models of ``brand_id``, or of the brand of ``model_id`` when no
+        brand is given; empty when neither is known.
+        """
+        if brand_id is None:
+            brand_id = self.model_brands.get(model_id)
+        return list(self.models_by_brand.get(brand_id, []))
+
+
+class CatalogCache:
+    """
+    Process-local copy of the catalog.
+
+    Brand and Model signals bump a version stored in the shared cache;
+    each process compares it with the version of its copy at most every
+    ``CATALOG_CHECK_SECONDS`` and reloads the catalog when it differs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.version = None
+        self.checked_at = 0.0
+
+    def get(self) -> Catalog:
+        now = time.monotonic()
+        with self.lock:
+            if (
+                self.snapshot is None
+                or now - self.checked_at > settings.CATALOG_CHECK_SECONDS
+            ):
+                version = get_catalog_version()
+                self.checked_at = now
+                if self.snapshot is None or version != self.version:
+                    self.snapshot = Catalog.load(version)
+                    self.version = version
+            return self.snapshot
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.snapshot = None
+
+
+catalog_cache = CatalogCache()
+
+
+def get_catalog() -> Catalog:
+    return catalog_cache.get()
+
+
+class CatalogChoiceIterator:
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        choices = getattr(get_catalog(), self.field.choices_name)
+        yield from choices(**self.field.choices_kwargs)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __bool__(self):
+        return True
+
+
+class CatalogChoiceField(forms.ModelChoiceField):
+    """
+    ``ModelChoiceField`` rendering its options from the catalog cache
+    instead of iterating the queryset; submitted values are still
+    validated against the queryset.
+    """
+
+    def __init__(self, queryset, choices_name: str, **kwargs):
+        self.choices_name = choices_name
+        self.choices_kwargs = {}
+        super().__init__(queryset, **kwargs)
+
+    def _get_choices(self):
+        return CatalogChoiceIterator(self)
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs) -> list:
+    """
+    Listing caches are invalidated through the default cache, which only
+    reaches the other workers when they share it.
+    """
+    if settings.SHARED_CACHE:
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process, so the listing "
+            "card and detail caches are switched off and other caches "
+            "are only invalidated in the worker that made the change.",
+            hint="Set REDIS_URL to a Redis server shared by all workers.",
+            id="marketplace.W001",
+        )
+    ]
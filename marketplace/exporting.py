@@ -0,0 +1,406 @@
+import csv
+import gzip
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+import orjson
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import close_old_connections, connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from marketplace.caching import (
+    bump_catalog_version,
+    bump_fragments_generation,
+    bump_listings_generation,
+)
+from marketplace.catalog import catalog_cache
+from marketplace.importing import open_source, read_rows, source_format
+from marketplace.models import Brand, Image, Listing, MarketUser, Model
+from marketplace.pricing import fit_price_models
+from marketplace.search import engine as search_engine
+from marketplace.similar import engine as similar_engine
+from marketplace.statistics import rebuild_statistics
+
+CHUNK_SIZE = 5000
+COMPRESS_LEVEL = 6
+
+# ``{table: (model, {column: field})}``. The listings columns include the
+# ones read by ``import_listings``, so a listings export can also be
+# imported as a feed of new listings.
+EXPORT_TABLES = {
+    "listings": (
+        Listing,
+        {
+            "id": "id",
+            "seller": "seller__username",
+            "brand": "car_model__brand__name",
+            "model": "car_model__name",
+            "year": "year",
+            "price": "price",
+            "mileage": "mileage",
+            "description": "description",
+            "created_at": "created_at",
+        },
+    ),
+    "users": (
+        MarketUser,
+        {
+            "id": "id",
+            "username": "username",
+            "first_name": "first_name",
+            "last_name": "last_name",
+            "email": "email",
+            "phone_number": "phone_number",
+            "date_joined": "date_joined",
+        },
+    ),
+    "brands": (
+        Brand,
+        {"id": "id", "name": "name"},
+    ),
+    "models": (
+        Model,
+        {"id": "id", "brand": "brand__name", "model": "name"},
+    ),
+    "images": (
+        Image,
+        {"id": "id", "listing": "listing_id", "image": "image"},
+    ),
+}
+
+
+def export_path(directory: str, table: str, fmt: str, compress: bool) -> str:
+    name = f"{table}.{fmt}.gz" if compress else f"{table}.{fmt}"
+    return os.path.join(directory, name)
+
+
+def open_target(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wb", compresslevel=COMPRESS_LEVEL)
+    return open(path, "wb")
+
+
+def chunks(rows, chunk_size: int):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_jsonl(target, columns, rows, chunk_size: int) -> None:
+    for chunk in chunks(rows, chunk_size):
+        target.write(b"".join(
+            orjson.dumps(
+                dict(zip(columns, row)), option=orjson.OPT_APPEND_NEWLINE
+            )
+            for row in chunk
+        ))
+
+
+def write_csv(target, columns, rows, chunk_size: int) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunks(rows, chunk_size):
+        writer.writerows(
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ]
+            for row in chunk
+        )
+        target.write(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+
+
+WRITERS = {"jsonl": write_jsonl, "csv": write_csv}
+
+
+def export_table(
+    table: str,
+    directory: str,
+    fmt: str = "jsonl",
+    compress: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Stream one table to ``<directory>/<table>.<fmt>[.gz]``.
+
+    Rows are read with ``.iterator(chunk_size=...)``, which uses a
+    server-side cursor on PostgreSQL, so memory stays bounded whatever
+    the table size. The file is written under a temporary name and moved
+    into place once complete. Returns ``{"table", "path", "rows"}``.
+    """
+    model, fields = EXPORT_TABLES[table]
+    columns = list(fields)
+    path = export_path(directory, table, fmt, compress)
+    temporary = f"{path}.tmp"
+    counted = 0
+
+    def rows():
+        nonlocal counted
+        queryset = model.objects.order_by("id").values_list(
+            *fields.values()
+        )
+        for row in queryset.iterator(chunk_size=chunk_size):
+            counted += 1
+            yield row
+
+    try:
+        with open_target(temporary, compress) as target:
+            WRITERS[fmt](target, columns, rows(), chunk_size)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return {"table": table, "path": path, "rows": counted}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@contextmanager
+def snapshot_transaction(snapshot: str = None):
+    """
+    Run the block in one transaction that sees a single snapshot of the
+    database: REPEATABLE READ on PostgreSQL, importing ``snapshot`` (an
+    id from ``pg_export_snapshot()``) when given.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+                )
+                if snapshot:
+                    cursor.execute("SET TRANSACTION SNAPSHOT %s", [snapshot])
+        yield
+
+
+def export_snapshot() -> str:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_export_snapshot()")
+        return cursor.fetchone()[0]
+
+
+def export_table_in_thread(snapshot: str, *arguments) -> dict:
+    close_old_connections()
+    try:
+        with snapshot_transaction(snapshot):
+            return export_table(*arguments)
+    finally:
+        close_old_connections()
+
+
+def export_tables(
+    directory: str,
+    tables=None,
+    fmt: str = "jsonl",
+    compress: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 1,
+) -> list:
+    """
+    Export ``tables`` (all of them by default) as of one moment, so that
+    e.g. every exported image belongs to an exported listing.
+
+    On PostgreSQL up to ``workers`` tables are exported at a time, each
+    on its own connection in a transaction importing the snapshot of
+    this one. Other databases cannot share a snapshot between
+    connections, so their tables are exported one after another.
+    """
+    tables = list(tables or EXPORT_TABLES)
+    os.makedirs(directory, exist_ok=True)
+    arguments = [
+        (table, directory, fmt, compress, chunk_size) for table in tables
+    ]
+    with snapshot_transaction():
+        if workers <= 1 or connection.vendor != "postgresql":
+            return [export_table(*argument) for argument in arguments]
+        snapshot = export_snapshot()
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(tables)),
+            thread_name_prefix="export",
+        ) as executor:
+            return list(executor.map(
+                lambda argument: export_table_in_thread(snapshot, *argument),
+                arguments,
+            ))
+
+
+# Tables are loaded after the ones their rows refer to.
+LOAD_ORDER = ("brands", "models", "users", "listings", "images")
+
+
+def find_export(directory: str, table: str):
+    for fmt in WRITERS:
+        for compress in (True, False):
+            path = export_path(directory, table, fmt, compress)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def field_value(model, name: str, value):
+    field = model._meta.get_field(name)
+    if value == "" and field.null:
+        # CSV writes None as an empty string.
+        return None
+    return field.to_python(value)
+
+
+class SnapshotLoader:
+    """
+    Turn exported rows back into model instances, resolving the names
+    the export writes for brands, car models and sellers to the ids of
+    the rows loaded before them.
+    """
+
+    def __init__(self):
+        self.brands = {}
+        self.models = {}
+        self.sellers = {}
+
+    def build(self, table: str, row: dict):
+        model, fields = EXPORT_TABLES[table]
+        values = {
+            field: field_value(model, field, row[column])
+            for column, field in fields.items()
+            if "__" not in field and field != "listing_id"
+        }
+        if table == "brands":
+            instance = Brand(**values)
+            self.brands[instance.name] = instance.id
+        elif table == "models":
+            brand = row["brand"]
+            if brand not in self.brands:
+                raise SnapshotError(
+                    f"Car model {values['id']} refers to brand {brand!r}, "
+                    f"which is not in the snapshot."
+                )
+            instance = Model(brand_id=self.brands[brand], **values)
+            self.models[(brand, instance.name)] = instance.id
+        elif table == "users":
+            # Password hashes are not exported; users set a new password.
+            instance = MarketUser(password=make_password(None), **values)
+            self.sellers[instance.username] = instance.id
+        elif table == "listings":
+            try:
+                seller_id = self.sellers[row["seller"]]
+                car_model_id = self.models[(row["brand"], row["model"])]
+            except KeyError as error:
+                raise SnapshotError(
+                    f"Listing {values['id']} refers to {error}, which is "
+                    f"not in the snapshot."
+                )
+            instance = Listing(
+                seller_id=seller_id, car_model_id=car_model_id, **values
+            )
+        else:
+            instance = Image(
+                listing_id=field_value(Image, "listing_id", row["listing"]),
+                **values,
+            )
+        return instance
+
+
+@contextmanager
+def keep_created_at():
+    """
+    Keep the exported ``created_at`` instead of the time of the load.
+    This changes the field for the whole process, which is only the
+    loading command.
+    """
+    field = Listing._meta.get_field("created_at")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def load_table(
+    loader: SnapshotLoader, table: str, path: str, chunk_size: int
+) -> int:
+    model = EXPORT_TABLES[table][0]
+    loaded = 0
+    with open_source(path) as source:
+        instances = (
+            loader.build(table, row)
+            for row in read_rows(source, source_format(path))
+        )
+        for chunk in chunks(instances, chunk_size):
+            model.objects.bulk_create(chunk)
+            loaded += len(chunk)
+    return loaded
+
+
+def finish_load() -> None:
+    """
+    Bulk writes bypass model signals, so set the cover images, reset the
+    id sequences past the loaded ids and rebuild what the signals would
+    have kept up to date.
+    """
+    first_image = (
+        Image.objects.filter(listing=OuterRef("pk"))
+        .order_by("id")
+        .values("id")[:1]
+    )
+    Listing.objects.filter(cover_image__isnull=True).update(
+        cover_image=Subquery(first_image)
+    )
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(
+            no_style(), [Brand, Model, MarketUser, Listing, Image]
+        ):
+            cursor.execute(statement)
+    rebuild_statistics()
+    fit_price_models()
+
+    for invalidate in (
+        bump_catalog_version,
+        catalog_cache.invalidate,
+        bump_listings_generation,
+        bump_fragments_generation,
+        search_engine.invalidate,
+        similar_engine.invalidate,
+    ):
+        transaction.on_commit(invalidate)
+
+
+def load_snapshot(directory: str, chunk_size: int = CHUNK_SIZE) -> list:
+    """
+    Load a snapshot written by :func:`export_tables` into an empty
+    database in one transaction, keeping the exported ids and listing
+    creation times. Every table must be in ``directory``. Returns
+    ``[{"table", "path", "rows"}]``.
+    """
+    paths = {table: find_export(directory, table) for table in LOAD_ORDER}
+    missing = [table for table, path in paths.items() if path is None]
+    if missing:
+        raise SnapshotError(
+            f"No export of {', '.join(missing)} in {directory}."
+        )
+    if any(
+        model.objects.exists() for model, _ in EXPORT_TABLES.values()
+    ):
+        raise SnapshotError("Snapshots can only be loaded into an empty "
+                            "database.")
+
+    loader = SnapshotLoader()
+    results = []
+    with transaction.atomic(), keep_created_at():
+        for table, path in paths.items():
+            rows = load_table(loader, table, path, chunk_size)
+            results.append({"table": table, "path": path, "rows": rows})
+        finish_load()
+    return results
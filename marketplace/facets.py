@@ -0,0 +1,177 @@
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+
+from marketplace.caching import get_catalog_version
+from marketplace.catalog import get_catalog
+from marketplace.models import Listing
+from marketplace.search import (
+    KEYWORD_PARAM,
+    ColumnarSearchBackend,
+    ORMSearchBackend,
+    engine as search_engine,
+    get_search_backend,
+    parse_search_params,
+)
+from marketplace.templatetags.query_transform import canonical_query
+
+FACETS_SQL = """
+WITH filtered AS ({filtered})
+SELECT 'model', model_id, model_name, brand_id, brand_name, COUNT(*)
+FROM filtered
+GROUP BY model_id, model_name, brand_id, brand_name
+UNION ALL
+SELECT 'year', year, NULL, NULL, NULL, COUNT(*)
+FROM filtered GROUP BY year
+UNION ALL
+SELECT 'price', price_bucket, NULL, NULL, NULL, COUNT(*)
+FROM filtered GROUP BY price_bucket
+UNION ALL
+SELECT 'mileage', mileage_bucket, NULL, NULL, NULL, COUNT(*)
+FROM filtered GROUP BY mileage_bucket
+"""
+
+
+def compute_facets(params) -> dict:
+    """
+    Count the listings matching ``params`` per brand, model and year and
+    bucket them by price and mileage, all in one aggregate query.
+    """
+    price_step = settings.LISTING_FACET_PRICE_STEP
+    mileage_step = settings.LISTING_FACET_MILEAGE_STEP
+
+    queryset = ORMSearchBackend().search(Listing.objects.all(), params)
+    queryset = queryset.order_by().values(
+        "year",
+        model_id=F("car_model_id"),
+        model_name=F("car_model__name"),
+        brand_id=F("car_model__brand_id"),
+        brand_name=F("car_model__brand__name"),
+        price_bucket=F("price") / price_step,
+        mileage_bucket=F("mileage") / mileage_step,
+    )
+    filtered_sql, filtered_params = queryset.query.sql_with_params()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            FACETS_SQL.format(filtered=filtered_sql), filtered_params
+        )
+        rows = cursor.fetchall()
+
+    facets = {
+        "brands": {}, "models": [], "years": [], "price": [], "mileage": []
+    }
+    steps = {"price": price_step, "mileage": mileage_step}
+    for kind, value, model_name, brand_id, brand_name, count in rows:
+        if kind == "model":
+            add_model(
+                facets, value, f"{brand_name} {model_name}",
+                brand_id, brand_name, count,
+            )
+        elif kind == "year":
+            facets["years"].append({"value": value, "count": count})
+        else:
+            add_bucket(facets, kind, int(value), steps[kind], count)
+    return sort_facets(facets)
+
+
+def columnar_facets(match):
+    """
+    Count the rows of a columnar search match like ``compute_facets``,
+    from the in-memory arrays instead of the database.
+
+    Returns None when a matched car model is missing from this worker's
+    catalog copy, e.g. right after it was added.
+    """
+    catalog = get_catalog()
+    labels = {model_id: label for model_id, _, label in catalog.models}
+    brand_names = dict(catalog.brands)
+
+    facets = {
+        "brands": {}, "models": [], "years": [], "price": [], "mileage": []
+    }
+    model_ids, counts = np.unique(match.values("model"), return_counts=True)
+    for model_id, count in zip(model_ids.tolist(), counts.tolist()):
+        if model_id not in labels:
+            return None
+        brand_id = catalog.model_brands[model_id]
+        add_model(
+            facets, model_id, labels[model_id],
+            brand_id, brand_names[brand_id], count,
+        )
+    years, counts = np.unique(match.values("year"), return_counts=True)
+    for year, count in zip(years.tolist(), counts.tolist()):
+        facets["years"].append({"value": year, "count": count})
+    for kind in ("price", "mileage"):
+        step = getattr(settings, f"LISTING_FACET_{kind.upper()}_STEP")
+        buckets, counts = np.unique(
+            match.values(kind) // step, return_counts=True
+        )
+        for bucket, count in zip(buckets.tolist(), counts.tolist()):
+            add_bucket(facets, kind, bucket, step, count)
+    return sort_facets(facets)
+
+
+def add_model(facets, model_id, name, brand_id, brand_name, count):
+    facets["models"].append({
+        "id": model_id,
+        "name": name,
+        "brand_id": brand_id,
+        "count": count,
+    })
+    brand = facets["brands"].setdefault(
+        brand_id, {"id": brand_id, "name": brand_name, "count": 0}
+    )
+    brand["count"] += count
+
+
+def add_bucket(facets, kind, bucket, step, count):
+    start = bucket * step
+    facets[kind].append({
+        "start": start,
+        "end": start + step - 1,
+        "count": count,
+    })
+
+
+def sort_facets(facets) -> dict:
+    facets["brands"] = sorted(
+        facets["brands"].values(), key=lambda brand: brand["name"]
+    )
+    facets["models"].sort(key=lambda model: model["name"])
+    facets["years"].sort(key=lambda year: year["value"], reverse=True)
+    facets["price"].sort(key=lambda bucket: bucket["start"])
+    facets["mileage"].sort(key=lambda bucket: bucket["start"])
+    return facets
+
+
+def listing_facets(params) -> dict:
+    """
+    Facets of the listing search ``params``.
+
+    The columnar backend counts its in-memory match on every request.
+    Otherwise the counts are cached per normalized query for
+    ``LISTING_FACET_CACHE_TIMEOUT`` seconds: listing changes do not
+    invalidate them, so they may lag behind by that long.
+    """
+    if isinstance(get_search_backend(), ColumnarSearchBackend):
+        filters = parse_search_params(params)
+        if filters is not None and not params.get(KEYWORD_PARAM):
+            facets = columnar_facets(search_engine.search(filters))
+            if facets is not None:
+                return facets
+
+    query = canonical_query(params, exclude=("page", "cursor"))
+    digest = hashlib.md5(query.encode()).hexdigest()
+    # Only catalog changes rename facets.
+    cache_key = f"marketplace:facets:{get_catalog_version()}:{digest}"
+
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = compute_facets(params)
+        cache.set(cache_key, facets, settings.LISTING_FACET_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,116 @@
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from marketplace.caching import bump_favourites_generation
+from marketplace.models import MarketUser
+
+Favourite = MarketUser.favourite_listings.through
+
+
+def is_favourite(user, listing_id: int) -> bool:
+    if not user.is_authenticated:
+        return False
+    return Favourite.objects.filter(
+        marketuser_id=user.id, listing_id=listing_id
+    ).exists()
+
+
+async def ais_favourite(user, listing_id: int) -> bool:
+    if not user.is_authenticated:
+        return False
+    return await Favourite.objects.filter(
+        marketuser_id=user.id, listing_id=listing_id
+    ).aexists()
+
+
+def toggle_favourite(user, listing_id: int) -> bool:
+    """
+    Add or remove ``listing_id`` from the favourites of ``user`` with an
+    existence check and a single insert or delete on the through table.
+
+    Returns whether the listing is a favourite afterwards.
+    """
+    favourite = Favourite.objects.filter(
+        marketuser_id=user.id, listing_id=listing_id
+    )
+    if favourite.exists():
+        favourite.delete()
+        added = False
+    else:
+        Favourite.objects.bulk_create(
+            [Favourite(marketuser_id=user.id, listing_id=listing_id)],
+            ignore_conflicts=True,
+        )
+        added = True
+    # Writes to the through table do not send m2m_changed.
+    transaction.on_commit(partial(bump_favourites_generation, user.id))
+    return added
+
+
+async def atoggle_favourite(user, listing_id: int) -> bool:
+    """
+    Async version of :func:`toggle_favourite`.
+    """
+    favourite = Favourite.objects.filter(
+        marketuser_id=user.id, listing_id=listing_id
+    )
+    if await favourite.aexists():
+        await favourite.adelete()
+        added = False
+    else:
+        await Favourite.objects.abulk_create(
+            [Favourite(marketuser_id=user.id, listing_id=listing_id)],
+            ignore_conflicts=True,
+        )
+        added = True
+    await sync_to_async(bump_favourites_generation)(user.id)
+    return added
+
+
+def favourite_ids(user, listings) -> set:
+    """
+    Return the ids of ``listings`` that ``user`` has favourited, in one
+    query for the whole page.
+    """
+    listing_ids = [listing.id for listing in listings]
+    if not user.is_authenticated or not listing_ids:
+        return set()
+    return set(
+        Favourite.objects.filter(
+            marketuser_id=user.id, listing_id__in=listing_ids
+        ).values_list("listing_id", flat=True)
+    )
+
+
+async def afavourite_ids(user, listings) -> set:
+    """
+    Async version of :func:`favourite_ids`.
+    """
+    listing_ids = [listing.id for listing in listings]
+    if not user.is_authenticated or not listing_ids:
+        return set()
+    return {
+        listing_id
+        async for listing_id in Favourite.objects.filter(
+            marketuser_id=user.id, listing_id__in=listing_ids
+        ).values_list("listing_id", flat=True)
+    }
+
+
+class FavouriteFlagsMixin:
+    """
+    Adds ``favourite_ids`` for the listings of the current page to the
+    context of a listing ``ListView``.
+    """
+
+    def get_favourite_ids(self, listings) -> set:
+        return favourite_ids(self.request.user, listings)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["favourite_ids"] = self.get_favourite_ids(
+            context["object_list"]
+        )
+        return context
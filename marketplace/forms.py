@@ -10,7 +10,15 @@ from django.contrib.auth.forms import (
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
-from marketplace.models import Brand, Model, Image, Listing, MarketUser
+from marketplace.catalog import CatalogChoiceField
+from marketplace.models import (
+    Brand,
+    Model,
+    Image,
+    Listing,
+    MarketUser,
+    SavedSearch,
+)
 
 current_year = datetime.now().year
 MIN_YEAR = 1970
@@ -20,8 +28,9 @@ YEARS = [("", "-----")] + [
 
 
 class SearchForm(forms.Form):
-    brand = forms.ModelChoiceField(
+    brand = CatalogChoiceField(
         queryset=Brand.objects.all(),
+        choices_name="brand_choices",
         required=False,
         widget=forms.Select(
             attrs={"class": "form-control", "placeholder": "Choose a brand..."}
@@ -29,8 +38,9 @@ class SearchForm(forms.Form):
         help_text="Select a brand",
     )
 
-    model = forms.ModelChoiceField(
+    model = CatalogChoiceField(
         queryset=Model.objects.select_related("brand"),
+        choices_name="brand_model_choices",
         required=False,
         widget=forms.Select(
             attrs={"class": "form-control", "title": "Select a model"}
@@ -97,14 +107,53 @@ class SearchForm(forms.Form):
         ),
     )
 
+    keywords = forms.CharField(
+        required=False,
+        max_length=255,
+        widget=forms.TextInput(
+            attrs={
+                "class": "form-control",
+                "placeholder": "Keywords, e.g. leather seats...",
+            }
+        ),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the selected brand's models are rendered; the rest are
+        # fetched from the brand-models endpoint when the brand changes.
+        self.fields["model"].choices_kwargs = {
+            "brand_id": parse_id(self.data.get("brand")),
+            "model_id": parse_id(self.data.get("model")),
+        }
+
+    def saved_search(self, user) -> SavedSearch:
+        """
+        Unsaved ``SavedSearch`` of ``user`` with the cleaned filters.
+        """
+        data = self.cleaned_data
+        return SavedSearch(
+            user=user,
+            brand=data["brand"],
+            car_model=data["model"],
+            year_start=int(data["year_start"] or 0) or None,
+            year_end=int(data["year_end"] or 0) or None,
+            price_start=data["price_start"],
+            price_end=data["price_end"],
+            mileage_start=data["mileage_start"],
+            mileage_end=data["mileage_end"],
+            keywords=data["keywords"],
+        )
+
 
 class ListingForm(forms.ModelForm):
     class Meta:
         model = Listing
-        fields = "__all__"
+        exclude = ["cover_image"]
 
-    car_model = forms.ModelChoiceField(
-        queryset=Model.objects.all(),
+    car_model = CatalogChoiceField(
+        queryset=Model.objects.select_related("brand"),
+        choices_name="model_choices",
         widget=forms.Select(
             attrs={
                 "class": "form-control",
@@ -171,6 +220,13 @@ class MarketUserCreationForm(UserCreationForm):
         return validate_phone_number(self.cleaned_data["phone_number"])
 
 
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def validate_phone_number(phone_number):
     if len(phone_number) != 13:
         raise ValidationError(
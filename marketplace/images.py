@@ -0,0 +1,244 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image as PillowImage
+from PIL import ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+VARIANT_QUALITY = 80
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="variants")
+
+# Sent with ``sender=model`` and ``instance`` once variants are stored;
+# they are written with ``update()``, which does not send ``post_save``.
+variants_stored = Signal()
+
+
+def supported_formats() -> list:
+    PillowImage.init()
+    saveable = PillowImage.SAVE.keys()
+    return [
+        extension for extension, (pillow_format, _) in VARIANT_FORMATS.items()
+        if pillow_format in saveable
+    ]
+
+
+def variant_name(name: str, width: int, extension: str) -> str:
+    root, _ = os.path.splitext(name)
+    return f"{root}_{width}w.{extension}"
+
+
+def generate_variants(field_file) -> dict:
+    """
+    Write resized copies of ``field_file`` next to the original.
+
+    Returns ``{"source": name, "<format>": {"<width>": name}}``; widths
+    larger than the original are skipped.
+    """
+    storage = field_file.storage
+    with field_file.open("rb") as source:
+        original = PillowImage.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    variants = {"source": field_file.name}
+    for extension in supported_formats():
+        pillow_format = VARIANT_FORMATS[extension][0]
+        variants[extension] = {}
+        for width in VARIANT_WIDTHS:
+            if width >= original.width and variants[extension]:
+                break
+            resized = original.convert("RGB")
+            resized.thumbnail((width, width * 10))
+            buffer = BytesIO()
+            resized.save(buffer, pillow_format, quality=VARIANT_QUALITY)
+            name = storage.save(
+                variant_name(field_file.name, width, extension),
+                ContentFile(buffer.getvalue()),
+            )
+            variants[extension][str(resized.width)] = name
+    return variants
+
+
+def variant_names(variants) -> list:
+    variants = variants or {}
+    return [
+        name
+        for extension in VARIANT_FORMATS
+        for name in (variants.get(extension) or {}).values()
+    ]
+
+
+def delete_files(storage, names) -> None:
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Could not delete %s", name, exc_info=True)
+
+
+def reserve_upload_names(instances, field_name: str) -> list:
+    """
+    Pick a storage name for each pending file up front; the storage's own
+    collision check cannot see files that are still being uploaded in
+    parallel.
+    """
+    reserved = []
+    for instance in instances:
+        field_file = getattr(instance, field_name)
+        storage = field_file.storage
+        max_length = field_file.field.max_length
+        name = storage.get_available_name(
+            field_file.field.generate_filename(instance, field_file.name),
+            max_length=max_length,
+        )
+        root, extension = os.path.splitext(name)
+        while name in reserved:
+            name = storage.get_available_name(
+                storage.get_alternative_name(root, extension),
+                max_length=max_length,
+            )
+        reserved.append(name)
+    return reserved
+
+
+def upload_file(field_name: str, instance, name: str) -> None:
+    field_file = getattr(instance, field_name)
+    stored_name = field_file.storage.save(
+        name, field_file.file, max_length=field_file.field.max_length
+    )
+    # Assigning the stored name marks the file as committed, so saving
+    # the row does not upload it again.
+    setattr(instance, field_name, stored_name)
+
+
+def save_with_concurrent_uploads(instances, field_name: str) -> None:
+    """
+    Upload the pending files of ``instances`` to the media storage in
+    parallel, then save the rows one by one so their signals still fire.
+    """
+    pending = [
+        instance for instance in instances
+        if getattr(instance, field_name)
+        and not getattr(instance, field_name)._committed
+    ]
+    if len(pending) > 1:
+        names = reserve_upload_names(pending, field_name)
+        workers = min(len(pending), settings.MEDIA_UPLOAD_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as upload_executor:
+            list(upload_executor.map(
+                partial(upload_file, field_name), pending, names
+            ))
+    for instance in instances:
+        instance.save()
+
+
+def store_variants(model, pk, field_name: str, variants_field: str) -> None:
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    if not needs_variants(instance, field_name, variants_field):
+        return
+    field_file = getattr(instance, field_name)
+    previous = getattr(instance, variants_field)
+    if not field_file:
+        # The upload was cleared; only its variants are left to drop.
+        variants = None
+    else:
+        try:
+            variants = generate_variants(field_file)
+        except (
+            OSError,
+            ValueError,
+            UnidentifiedImageError,
+            PillowImage.DecompressionBombError,
+        ):
+            logger.warning(
+                "Could not generate variants for %s", field_file.name,
+                exc_info=True,
+            )
+            variants = {"source": field_file.name}
+    updated = model.objects.filter(
+        pk=pk, **{field_name: field_file.name}
+    ).update(**{variants_field: variants})
+    if not updated:
+        # Replaced or deleted meanwhile; the next run covers the new file.
+        delete_files(field_file.storage, variant_names(variants))
+        return
+    delete_files(
+        field_file.storage,
+        set(variant_names(previous)) - set(variant_names(variants)),
+    )
+    variants_stored.send(sender=model, instance=instance)
+
+
+def store_variants_in_background(*arguments) -> None:
+    close_old_connections()
+    try:
+        store_variants(*arguments)
+    except Exception:
+        logger.exception("Could not store variants for %s %s", *arguments[:2])
+    finally:
+        close_old_connections()
+
+
+def needs_variants(instance, field_name: str, variants_field: str) -> bool:
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if not field_file:
+        return bool(variant_names(variants))
+    return variants.get("source") != field_file.name
+
+
+def schedule_variants(instance, field_name: str, variants_field: str) -> None:
+    """
+    Generate the variants of ``instance.<field_name>`` after the current
+    transaction commits, on a background thread unless
+    ``IMAGE_VARIANTS_ASYNC`` is disabled.
+    """
+    if not needs_variants(instance, field_name, variants_field):
+        return
+
+    def run():
+        arguments = (type(instance), instance.pk, field_name, variants_field)
+        if getattr(settings, "IMAGE_VARIANTS_ASYNC", True):
+            executor.submit(store_variants_in_background, *arguments)
+        else:
+            store_variants(*arguments)
+
+    transaction.on_commit(run)
+
+
+def schedule_variant_deletion(
+    instance, field_name: str, variants_field: str
+) -> None:
+    """
+    Delete the variant files of a deleted ``instance`` once the
+    transaction commits, like ``schedule_variants``.
+    """
+    names = variant_names(getattr(instance, variants_field))
+    if not names:
+        return
+    storage = getattr(instance, field_name).storage
+
+    def run():
+        if getattr(settings, "IMAGE_VARIANTS_ASYNC", True):
+            executor.submit(delete_files, storage, names)
+        else:
+            delete_files(storage, names)
+
+    transaction.on_commit(run)
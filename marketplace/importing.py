@@ -0,0 +1,275 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from marketplace.alerts import notify_new_listings
+from marketplace.caching import bump_listings_generation
+from marketplace.forms import ListingForm
+from marketplace.models import Brand, Listing, MarketUser, Model
+from marketplace.pricing import apply_price_changes
+from marketplace.search import engine, record_listing_changes
+from marketplace.similar import engine as similar_engine
+from marketplace.statistics import apply_listing_changes, listing_row
+
+VALIDATED_FIELDS = ("year", "price", "mileage", "description")
+COPY_COLUMNS = (
+    "id",
+    "seller_id",
+    "car_model_id",
+    "year",
+    "price",
+    "mileage",
+    "description",
+    "created_at",
+)
+
+
+class RowError(Exception):
+    pass
+
+
+def open_source(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def source_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".json")) else "csv"
+
+
+def read_rows(source, fmt: str):
+    """
+    Yield one dict per record of an open CSV or JSON Lines file without
+    reading the whole file into memory.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(source)
+        return
+    for line in source:
+        if line.strip():
+            yield json.loads(line)
+
+
+class CatalogLookup:
+    """
+    Resolve brand, model and seller names to ids from dicts loaded once,
+    optionally creating brands and models that do not exist yet.
+    """
+
+    def __init__(self, create_missing: bool = False):
+        self.create_missing = create_missing
+        self.brands = {
+            name.casefold(): pk
+            for pk, name in Brand.objects.values_list("id", "name")
+        }
+        self.models = {
+            (brand_id, name.casefold()): pk
+            for pk, brand_id, name in Model.objects.values_list(
+                "id", "brand_id", "name"
+            )
+        }
+        self.sellers = dict(
+            MarketUser.objects.values_list("username", "id")
+        )
+
+    def model_id(self, brand_name: str, model_name: str) -> int:
+        brand_key = brand_name.strip().casefold()
+        model_key = model_name.strip().casefold()
+        brand_id = self.brands.get(brand_key)
+        if brand_id is None:
+            if not self.create_missing or not brand_key:
+                raise RowError(f"Unknown brand '{brand_name}'.")
+            brand_id = Brand.objects.create(name=brand_name.strip()).id
+            self.brands[brand_key] = brand_id
+
+        model_id = self.models.get((brand_id, model_key))
+        if model_id is None:
+            if not self.create_missing or not model_key:
+                raise RowError(
+                    f"Unknown model '{model_name}' of brand '{brand_name}'."
+                )
+            model_id = Model.objects.create(
+                brand_id=brand_id, name=model_name.strip()
+            ).id
+            self.models[(brand_id, model_key)] = model_id
+        return model_id
+
+    def seller_id(self, username: str) -> int:
+        seller_id = self.sellers.get(username)
+        if seller_id is None:
+            raise RowError(f"Unknown seller '{username}'.")
+        return seller_id
+
+
+def build_listing(row: dict, lookup: CatalogLookup, default_seller=None):
+    """
+    Validate ``row`` with the field rules of :class:`ListingForm` and
+    return an unsaved :class:`Listing`.
+    """
+    cleaned = {}
+    errors = []
+    for name in VALIDATED_FIELDS:
+        try:
+            cleaned[name] = ListingForm.base_fields[name].clean(row.get(name))
+        except ValidationError as error:
+            errors.append(f"{name}: {' '.join(error.messages)}")
+    if errors:
+        raise RowError("; ".join(errors))
+
+    seller = row.get("seller") or default_seller
+    if not seller:
+        raise RowError("seller: This field is required.")
+    return Listing(
+        seller_id=lookup.seller_id(seller),
+        car_model_id=lookup.model_id(
+            row.get("brand") or "", row.get("model") or ""
+        ),
+        **cleaned,
+    )
+
+
+def reserve_ids(cursor, count: int) -> list:
+    """
+    Take ``count`` ids from the listing id sequence, so rows written with
+    COPY have known primary keys like ``bulk_create`` gives them.
+    """
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+        "FROM generate_series(1, %s)",
+        [Listing._meta.db_table, count],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def copy_listings(connection, listings) -> None:
+    created_at = timezone.now()
+    with connection.cursor() as cursor:
+        for listing, listing_id in zip(
+            listings, reserve_ids(cursor, len(listings))
+        ):
+            listing.id = listing_id
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for listing in listings:
+        writer.writerow([
+            listing.id,
+            listing.seller_id,
+            listing.car_model_id,
+            listing.year,
+            listing.price,
+            listing.mileage,
+            listing.description,
+            created_at.isoformat(),
+        ])
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {Listing._meta.db_table} ({', '.join(COPY_COLUMNS)}) "
+            f"FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def write_listings(listings, using: str = "default") -> None:
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        copy_listings(connection, listings)
+    else:
+        Listing.objects.using(using).bulk_create(listings)
+
+
+def read_checkpoint(path: str, source: str) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as checkpoint:
+        state = json.load(checkpoint)
+    if state.get("source") != os.path.abspath(source):
+        return 0
+    return state["rows"]
+
+
+def write_checkpoint(path: str, source: str, rows: int) -> None:
+    temporary = f"{path}.tmp"
+    state = {"source": os.path.abspath(source), "rows": rows}
+    with open(temporary, "w", encoding="utf-8") as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(temporary, path)
+
+
+def finish_import() -> None:
+    """
+    Bulk writes bypass model signals, so invalidate what they would have.
+    Market statistics, price models and saved search notifications are
+    updated batch by batch in ``flush``.
+    """
+    bump_listings_generation()
+    engine.invalidate()
+    similar_engine.expire()
+
+
+def import_listings(
+    path: str,
+    batch_size: int = 5000,
+    checkpoint: str = None,
+    default_seller: str = None,
+    create_missing: bool = False,
+    fmt: str = None,
+    on_batch=None,
+    on_error=None,
+) -> dict:
+    """
+    Stream listings from ``path`` into the database in batches.
+
+    The checkpoint is updated after every committed batch, so an
+    interrupted import resumes after the last committed row. Returns
+    ``{"rows": processed, "imported": written, "errors": rejected}``.
+    """
+    lookup = CatalogLookup(create_missing=create_missing)
+    skip = read_checkpoint(checkpoint, path)
+    stats = {"rows": skip, "imported": 0, "errors": 0}
+    batch = []
+
+    def flush():
+        if batch:
+            with transaction.atomic():
+                write_listings(batch)
+                record_listing_changes(listing.id for listing in batch)
+                rows = [listing_row(listing) for listing in batch]
+                apply_listing_changes(added=rows)
+                apply_price_changes(added=rows)
+                notify_new_listings(batch)
+            stats["imported"] += len(batch)
+            batch.clear()
+            if on_batch:
+                on_batch(stats)
+        if checkpoint:
+            write_checkpoint(checkpoint, path, stats["rows"])
+
+    with open_source(path) as source:
+        for number, row in enumerate(
+            read_rows(source, fmt or source_format(path)), start=1
+        ):
+            if number <= skip:
+                continue
+            stats["rows"] = number
+            try:
+                batch.append(build_listing(row, lookup, default_seller))
+            except RowError as error:
+                stats["errors"] += 1
+                if on_error:
+                    on_error(number, error)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+    if stats["imported"]:
+        finish_import()
+    return stats
@@ -0,0 +1,105 @@
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.management.commands.benchmark_listing_search import (
+    percentile,
+    random_search_params,
+)
+from marketplace.models import Brand, Listing, Model
+
+
+async def fetch(host: str, port: int, path: str) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1])
+
+
+async def run_load(host: str, port: int, paths: list, concurrency: int):
+    """
+    Request ``paths`` over ``concurrency`` connections at a time and
+    return the wall time, the latency of each request in milliseconds
+    and the number of failed requests. Random filters may ask for a
+    page past the end, so a 404 is not a failure.
+    """
+    queue = list(reversed(paths))
+    timings = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            try:
+                status = await fetch(host, port, path)
+            except (OSError, IndexError, ValueError):
+                status = None
+            timings.append((time.perf_counter() - started) * 1000)
+            errors += status is None or status >= 500
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, timings, errors
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Send concurrent requests for the index, listing and detail "
+        "pages to a running server and report throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="e.g. http://127.0.0.1:8000")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("Expected a plain http:// server URL.")
+        brand_ids = list(Brand.objects.values_list("id", flat=True))
+        model_ids = list(Model.objects.values_list("id", flat=True))
+        last_id = Listing.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first()
+        if not last_id:
+            raise CommandError("There are no listings to request.")
+
+        rng = random.Random(options["seed"])
+        paths = []
+        for _ in range(options["requests"]):
+            kind = rng.random()
+            if kind < 0.2:
+                paths.append("/")
+            elif kind < 0.6:
+                paths.append("/listings/?" + urlencode(
+                    random_search_params(rng, brand_ids, model_ids)
+                ))
+            else:
+                paths.append(f"/listing-detail/{rng.randint(1, last_id)}")
+
+        elapsed, timings, errors = asyncio.run(run_load(
+            url.hostname, url.port or 80, paths, options["concurrency"]
+        ))
+        self.stdout.write(
+            f"{len(timings)} requests, {options['concurrency']} at a time, "
+            f"in {elapsed:.1f}s: {len(timings) / elapsed:.0f} req/s  "
+            f"p50 {statistics.median(timings):.1f} ms  "
+            f"p95 {percentile(timings, 0.95):.1f} ms  "
+            f"errors {errors}"
+        )
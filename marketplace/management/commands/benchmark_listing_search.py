@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.models import Brand, Listing, Model
+from marketplace.search import (
+    ColumnarSearchBackend,
+    ORMSearchBackend,
+    engine,
+)
+from marketplace.views import ListingListView
+
+
+def random_search_params(rng: random.Random, brand_ids, model_ids) -> dict:
+    params = {}
+    if rng.random() < 0.3:
+        params["brand"] = rng.choice(brand_ids)
+    elif rng.random() < 0.4:
+        params["model"] = rng.choice(model_ids)
+    if rng.random() < 0.5:
+        params["year_start"] = rng.randint(1990, 2020)
+    if rng.random() < 0.3:
+        params["year_end"] = rng.randint(2000, 2023)
+    if rng.random() < 0.5:
+        params["price_start"] = rng.randrange(1000, 60000, 1000)
+        params["price_end"] = params["price_start"] + rng.randrange(
+            1000, 40000, 1000
+        )
+    if rng.random() < 0.3:
+        params["mileage_end"] = rng.randrange(10000, 400000, 10000)
+    params["page"] = rng.choice((1, 1, 1, 2, 3, 10))
+    return params
+
+
+def run_search(backend, params: dict) -> int:
+    per_page = ListingListView.paginate_by
+    queryset = backend.search(Listing.objects.all(), params)
+    count = queryset.count()
+    start = (params["page"] - 1) * per_page
+    return count + len(list(queryset[start:start + per_page]))
+
+
+def percentile(timings: list, fraction: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Compare the ORM and the in-memory columnar listing search "
+        "backends on random filter combinations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            type=int,
+            default=0,
+            help="Insert this many synthetic listings before measuring.",
+        )
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["generate"]:
+            started = time.perf_counter()
+            generate_dataset(options["generate"], seed=options["seed"])
+            self.stdout.write(
+                f"Generated {options['generate']} listings in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+
+        started = time.perf_counter()
+        engine.rebuild()
+        snapshot = engine.snapshot
+        memory = sum(
+            array.nbytes
+            for array in (
+                snapshot.ids,
+                snapshot.created,
+                snapshot.alive,
+                *snapshot.columns.values(),
+                *(part for index in snapshot.indexes.values()
+                  for part in index),
+            )
+        )
+        self.stdout.write(
+            f"Snapshot of {len(snapshot)} listings built in "
+            f"{time.perf_counter() - started:.1f}s, "
+            f"{memory / 2 ** 20:.1f} MiB."
+        )
+
+        rng = random.Random(options["seed"])
+        brand_ids = list(Brand.objects.values_list("id", flat=True))
+        model_ids = list(Model.objects.values_list("id", flat=True))
+        scenarios = [
+            random_search_params(rng, brand_ids, model_ids)
+            for _ in range(options["queries"])
+        ]
+
+        for name, backend in (
+            ("orm", ORMSearchBackend()),
+            ("columnar", ColumnarSearchBackend()),
+        ):
+            timings = []
+            for params in scenarios:
+                started = time.perf_counter()
+                run_search(backend, params)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:<10} p50 {statistics.median(timings):8.2f} ms  "
+                f"p95 {percentile(timings, 0.95):8.2f} ms"
+            )
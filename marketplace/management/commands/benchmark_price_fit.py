@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.models import Model
+from marketplace.pricing import fit_price_models, get_price_table
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Refit the per car model price regressions from all listings and "
+        "time the fit and the in-memory estimates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            type=int,
+            default=0,
+            help="Insert this many synthetic listings before measuring.",
+        )
+        parser.add_argument("--estimates", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["generate"]:
+            started = time.perf_counter()
+            generate_dataset(options["generate"], seed=options["seed"])
+            self.stdout.write(
+                f"Generated {options['generate']} listings in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+
+        result = fit_price_models()
+        self.stdout.write(
+            f"Fitted {result['models']} car models over "
+            f"{result['listings']} listings: "
+            f"{result['load_seconds']:.2f}s loading, "
+            f"{result['fit_seconds'] * 1000:.1f} ms fitting."
+        )
+
+        rng = random.Random(options["seed"])
+        model_ids = list(Model.objects.values_list("id", flat=True))
+        if not model_ids or not options["estimates"]:
+            return
+        requests = [
+            (
+                rng.choice(model_ids),
+                rng.randint(1990, 2023),
+                rng.randrange(0, 400000, 1000),
+            )
+            for _ in range(options["estimates"])
+        ]
+        table = get_price_table()
+        started = time.perf_counter()
+        for car_model_id, year, mileage in requests:
+            table.estimate(car_model_id, year, mileage)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{len(requests)} estimates, "
+            f"{elapsed / len(requests) * 1e6:.2f} us each."
+        )
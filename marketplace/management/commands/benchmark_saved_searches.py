@@ -0,0 +1,129 @@
+import random
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from marketplace.alerts import NO_HIGH, NO_LOW, SearchIndex
+from marketplace.benchmarks.dataset import generate_saved_searches
+from marketplace.catalog import get_catalog
+from marketplace.management.commands.benchmark_listing_search import (
+    percentile,
+)
+from marketplace.models import Listing, SavedSearch
+
+
+def load_search_arrays() -> dict:
+    rows = list(SavedSearch.objects.values_list(
+        "car_model_id", "brand_id", "year_start", "year_end",
+        "price_start", "price_end", "mileage_start", "mileage_end",
+    ))
+    return {
+        "models": np.array(
+            [-1 if row[0] is None else row[0] for row in rows]
+        ),
+        "brands": np.array(
+            [-1 if row[1] is None else row[1] for row in rows]
+        ),
+        "lows": np.array([
+            [NO_LOW if low is None else low for low in row[2::2]]
+            for row in rows
+        ], dtype=np.int64).reshape(-1, 3),
+        "highs": np.array([
+            [NO_HIGH if high is None else high for high in row[3::2]]
+            for row in rows
+        ], dtype=np.int64).reshape(-1, 3),
+    }
+
+
+def linear_scan(searches: dict, listing, brand_id: int) -> int:
+    """
+    Count the searches whose filters contain ``listing`` by testing all
+    of them at once; the baseline the index is compared with.
+    """
+    values = np.array([listing.year, listing.price, listing.mileage])
+    models = searches["models"]
+    brands = searches["brands"]
+    mask = (
+        (models == listing.car_model_id)
+        | ((models == -1) & ((brands == brand_id) | (brands == -1)))
+    ) & (
+        (searches["lows"] <= values).all(axis=1)
+        & (values <= searches["highs"]).all(axis=1)
+    )
+    return int(mask.sum())
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Build the saved search index and time matching new listings "
+        "one by one and in import-sized batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            type=int,
+            default=0,
+            help="Insert this many synthetic saved searches first.",
+        )
+        parser.add_argument("--listings", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["generate"]:
+            started = time.perf_counter()
+            generate_saved_searches(options["generate"], options["seed"])
+            self.stdout.write(
+                f"Generated {options['generate']} saved searches in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+
+        started = time.perf_counter()
+        index = SearchIndex.load()
+        self.stdout.write(
+            f"Index of {len(index)} saved searches in "
+            f"{len(index.buckets)} buckets built in "
+            f"{time.perf_counter() - started:.2f}s."
+        )
+
+        rng = random.Random(options["seed"])
+        last_id = Listing.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first()
+        if not last_id or not options["listings"]:
+            return
+        listings = list(Listing.objects.only(
+            "id", "seller_id", "car_model_id", "year", "price", "mileage",
+            "description",
+        ).in_bulk([
+            rng.randint(1, last_id) for _ in range(options["listings"])
+        ]).values())
+        model_brands = get_catalog().model_brands
+        searches = load_search_arrays()
+
+        for name, match in (
+            ("index", lambda listing: index.match([listing])),
+            ("linear", lambda listing: linear_scan(
+                searches, listing, model_brands[listing.car_model_id]
+            )),
+        ):
+            timings = []
+            for listing in listings:
+                started = time.perf_counter()
+                match(listing)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:<7} one listing: p50 "
+                f"{statistics.median(timings):.3f} ms  "
+                f"p95 {percentile(timings, 0.95):.3f} ms"
+            )
+
+        started = time.perf_counter()
+        matches = len(index.match(listings)[0])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Batch of {len(listings)} listings matched in "
+            f"{elapsed * 1000:.1f} ms, {matches} notifications."
+        )
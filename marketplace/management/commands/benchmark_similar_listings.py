@@ -0,0 +1,77 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.management.commands.benchmark_listing_search import (
+    percentile,
+)
+from marketplace.models import Listing
+from marketplace.similar import engine
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Build the similar listings index and time top-k queries for "
+        "random listings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            type=int,
+            default=0,
+            help="Insert this many synthetic listings before measuring.",
+        )
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["generate"]:
+            started = time.perf_counter()
+            generate_dataset(options["generate"], seed=options["seed"])
+            self.stdout.write(
+                f"Generated {options['generate']} listings in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+
+        started = time.perf_counter()
+        engine.rebuild()
+        index = engine.index
+        memory = sum(
+            array.nbytes
+            for array in (
+                index.ids, index.models, index.vectors, index.alive,
+                index.id_order,
+            )
+        )
+        self.stdout.write(
+            f"Index of {len(index)} listings built in "
+            f"{time.perf_counter() - started:.1f}s, "
+            f"{memory / 2 ** 20:.1f} MiB."
+        )
+        if not len(index) or not options["queries"]:
+            return
+
+        rng = random.Random(options["seed"])
+        sample = [
+            int(index.ids[rng.randrange(len(index))])
+            for _ in range(options["queries"])
+        ]
+        listings = Listing.objects.only(
+            "id", "car_model_id", "year", "price", "mileage"
+        ).in_bulk(sample)
+        timings = []
+        for listing_id in sample:
+            listing = listings[listing_id]
+            started = time.perf_counter()
+            engine.similar(listing, settings.SIMILAR_LISTINGS_COUNT)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{len(timings)} queries, top {settings.SIMILAR_LISTINGS_COUNT}: "
+            f"p50 {statistics.median(timings):.3f} ms  "
+            f"p95 {percentile(timings, 0.95):.3f} ms"
+        )
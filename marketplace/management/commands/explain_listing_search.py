@@ -0,0 +1,106 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.models import Brand, Listing, Model
+from marketplace.search import ORMSearchBackend
+from marketplace.views import ListingListView
+
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"SCAN marketplace_listing\b(?! USING)"),
+    "postgresql": re.compile(r"Seq Scan on marketplace_listing\b"),
+}
+SORT_PATTERNS = {
+    "sqlite": re.compile(r"USE TEMP B-TREE FOR ORDER BY"),
+    "postgresql": re.compile(r"\bSort\b"),
+}
+
+
+def search_scenarios(brand_id: int, model_id: int) -> dict:
+    return {
+        "all": {},
+        "brand": {"brand": brand_id},
+        "model": {"model": model_id},
+        "model_years": {
+            "model": model_id, "year_start": 2010, "year_end": 2015
+        },
+        "model_years_price": {
+            "model": model_id,
+            "year_start": 2010,
+            "year_end": 2015,
+            "price_start": 10000,
+            "price_end": 30000,
+        },
+        "years_price": {
+            "year_start": 2018, "price_start": 5000, "price_end": 8000
+        },
+        "price": {"price_start": 50000, "price_end": 51000},
+        "mileage": {"mileage_start": 0, "mileage_end": 1000},
+        "keywords": {"keywords": "leather seats"},
+        "keywords_price": {"keywords": "leather", "price_end": 20000},
+    }
+
+
+def listing_search_queryset(params: dict):
+    queryset = ORMSearchBackend().search(
+        Listing.objects.select_related("car_model__brand"), params
+    )
+    return queryset[:ListingListView.paginate_by]
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Print query plans for the listing search filter combinations "
+        "and flag the ones that fall back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            type=int,
+            default=0,
+            help="Insert this many synthetic listings before explaining.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full plan for every scenario.",
+        )
+
+    def handle(self, *args, **options):
+        if options["generate"]:
+            dataset = generate_dataset(
+                options["generate"], seed=options["seed"]
+            )
+            self.stdout.write(
+                f"Generated {dataset['listings']} listings."
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        brand = Brand.objects.filter(models__isnull=False).first()
+        model = Model.objects.filter(brand=brand).first()
+        if brand is None:
+            self.stderr.write("No brands with models found, use --generate.")
+            return
+
+        full_scan = FULL_SCAN_PATTERNS.get(connection.vendor)
+        sort = SORT_PATTERNS.get(connection.vendor)
+        scans = 0
+        for name, params in search_scenarios(brand.id, model.id).items():
+            plan = listing_search_queryset(params).explain()
+            if full_scan and full_scan.search(plan):
+                scans += 1
+                status = self.style.WARNING("FULL SCAN")
+            else:
+                status = self.style.SUCCESS("index")
+            if sort and sort.search(plan):
+                status += " + sort"
+            self.stdout.write(f"{name:<20} {status}")
+            if options["verbose_plans"]:
+                self.stdout.write(plan)
+
+        self.stdout.write(f"{scans} scenario(s) use a full table scan.")
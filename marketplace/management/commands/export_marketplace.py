@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.exporting import CHUNK_SIZE, EXPORT_TABLES, export_tables
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Stream listings, users, brands, car models and image references to "
+        "gzipped JSON Lines or CSV files, one file per table, all as of "
+        "the same moment. Load them back with load_marketplace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument(
+            "--table",
+            action="append",
+            choices=list(EXPORT_TABLES),
+            help="Only export this table; may be repeated.",
+        )
+        parser.add_argument(
+            "--format", choices=("jsonl", "csv"), default="jsonl"
+        )
+        parser.add_argument(
+            "--no-compress",
+            action="store_true",
+            help="Write plain files instead of gzip.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of tables exported in parallel (PostgreSQL only).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            results = export_tables(
+                options["directory"],
+                tables=options["table"],
+                fmt=options["format"],
+                compress=not options["no_compress"],
+                chunk_size=options["chunk_size"],
+                workers=options["workers"],
+            )
+        except OSError as error:
+            raise CommandError(error)
+
+        elapsed = time.perf_counter() - started
+        for result in results:
+            self.stdout.write(f"{result['table']}: {result['rows']} rows "
+                              f"to {result['path']}")
+        rows = sum(result["rows"] for result in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rows} rows in {elapsed:.1f}s "
+            f"({rows / elapsed:.0f} rows/sec)."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from marketplace.images import store_variants
+from marketplace.models import Image, MarketUser
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Generate missing thumbnails and WebP/AVIF variants for listing "
+        "images and profile pictures."
+    )
+
+    def handle(self, *args, **options):
+        targets = (
+            (Image, "image", "variants"),
+            (MarketUser, "profile_picture", "profile_picture_variants"),
+        )
+        for model, field_name, variants_field in targets:
+            pks = (
+                model.objects.exclude(
+                    Q(**{f"{field_name}__isnull": True})
+                    | Q(**{field_name: ""})
+                )
+                .filter(**{f"{variants_field}__isnull": True})
+                .values_list("pk", flat=True)
+            )
+            processed = 0
+            for pk in pks.iterator():
+                store_variants(model, pk, field_name, variants_field)
+                processed += 1
+            self.stdout.write(
+                f"{model.__name__}: generated variants for {processed} "
+                f"file(s)."
+            )
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.importing import import_listings
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Stream listings from a CSV or JSON Lines file (optionally gzipped) "
+        "into the database. Columns: brand, model, year, price, mileage, "
+        "description and seller (username)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "jsonl"),
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the last committed row, used to resume.",
+        )
+        parser.add_argument(
+            "--seller",
+            help="Username used for rows without a seller column.",
+        )
+        parser.add_argument(
+            "--create-missing",
+            action="store_true",
+            help="Create brands and models that do not exist yet.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def report_batch(stats):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{stats['rows']} rows read, {stats['imported']} imported "
+                f"({stats['imported'] / elapsed:.0f} rows/sec)"
+            )
+
+        def report_error(number, error):
+            if options["verbosity"] > 1:
+                self.stderr.write(f"Row {number}: {error}")
+
+        try:
+            stats = import_listings(
+                options["path"],
+                batch_size=options["batch_size"],
+                checkpoint=options["checkpoint"],
+                default_seller=options["seller"],
+                create_missing=options["create_missing"],
+                fmt=options["format"],
+                on_batch=report_batch,
+                on_error=report_error,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} listings in {elapsed:.1f}s "
+            f"({stats['imported'] / elapsed:.0f} rows/sec), "
+            f"{stats['errors']} rows rejected."
+        ))
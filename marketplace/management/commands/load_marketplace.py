@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.exporting import CHUNK_SIZE, SnapshotError, load_snapshot
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Load a snapshot written by export_marketplace into an empty "
+        "database, keeping the exported ids and listing creation times. "
+        "Users get unusable passwords, as hashes are not exported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            results = load_snapshot(
+                options["directory"], chunk_size=options["chunk_size"]
+            )
+        except (OSError, ValueError, KeyError, SnapshotError) as error:
+            raise CommandError(error)
+
+        elapsed = time.perf_counter() - started
+        for result in results:
+            self.stdout.write(f"{result['table']}: {result['rows']} rows "
+                              f"from {result['path']}")
+        rows = sum(result["rows"] for result in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {rows} rows in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.response_cache import (
+    reset_response_cache_stats,
+    response_cache_stats,
+)
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Show the hit rate of the anonymous response cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = response_cache_stats()
+        self.stdout.write(
+            f"Hits: {stats['hits']}, misses: {stats['misses']}, "
+            f"hit rate: {stats['hit_rate']:.1%}"
+        )
+        if options["reset"]:
+            reset_response_cache_stats()
+            self.stdout.write("Counters reset.")
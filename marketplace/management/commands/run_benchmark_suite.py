@@ -0,0 +1,116 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.benchmarks.dataset import SCALES, generate_dataset
+from marketplace.benchmarks.suite import (
+    BenchmarkError,
+    build_scenarios,
+    compare_results,
+    load_results,
+    run_suite,
+    save_results,
+)
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Time the main marketplace pages and report p50/p95 latency, "
+        "query counts and peak memory, optionally against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            choices=sorted(SCALES),
+            help="Insert a synthetic dataset of this scale first.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            help="Only run this scenario; may be repeated.",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Keep the cache between requests.",
+        )
+        parser.add_argument(
+            "--output", help="Write the results to this JSON file."
+        )
+        parser.add_argument(
+            "--baseline", help="Compare the results with this JSON file."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p95 slowdown against the baseline (0.2 = 20%%).",
+        )
+
+    def handle(self, *args, **options):
+        if options["generate"]:
+            started = time.perf_counter()
+            generated = generate_dataset(
+                **SCALES[options["generate"]], seed=options["seed"]
+            )
+            self.stdout.write(
+                f"Generated {generated['listings']} listings, "
+                f"{generated['images']} images and "
+                f"{generated['favourites']} favourites in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+
+        try:
+            scenarios = build_scenarios(options["seed"])
+        except BenchmarkError as error:
+            raise CommandError(f"{error} Use --generate.")
+        if options["scenario"]:
+            unknown = set(options["scenario"]) - {
+                scenario.name for scenario in scenarios
+            }
+            if unknown:
+                raise CommandError(
+                    f"Unknown scenario(s): {', '.join(sorted(unknown))}."
+                )
+            scenarios = [
+                scenario for scenario in scenarios
+                if scenario.name in options["scenario"]
+            ]
+
+        try:
+            results = run_suite(
+                scenarios, options["iterations"], options["warm"]
+            )
+        except BenchmarkError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(
+            f"{'scenario':<28}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'queries':>9}{'peak KiB':>11}"
+        )
+        for name, result in results["scenarios"].items():
+            self.stdout.write(
+                f"{name:<28}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['queries']:>9}"
+                f"{result['peak_memory_kib']:>11.1f}"
+            )
+
+        if options["output"]:
+            save_results(options["output"], results)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if options["baseline"]:
+            regressions = compare_results(
+                results,
+                load_results(options["baseline"]),
+                options["tolerance"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressions against the baseline:\n"
+                    + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.5 on 2026-10-17 19:14
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """
+    Build the index with ``CREATE INDEX CONCURRENTLY`` on PostgreSQL, so
+    the listings table keeps taking writes; a plain ``AddIndex`` on
+    other databases.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("marketplace", "0002_alter_listing_car_model"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="listing_created_desc_idx"
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(
+                fields=["car_model", "year", "price"],
+                name="listing_model_year_price_idx",
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(
+                fields=["car_model", "-created_at"],
+                name="listing_model_created_idx",
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(
+                fields=["year", "price"], name="listing_year_price_idx"
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(fields=["price"], name="listing_price_idx"),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(fields=["mileage"], name="listing_mileage_idx"),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="listing",
+            index=models.Index(
+                fields=["car_model", "-created_at", "-id"],
+                include=["year", "price", "mileage"],
+                name="listing_model_cover_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations, transaction
+
+# An expression index instead of a stored tsvector column: adding a
+# generated column rewrites the whole table, while CONCURRENTLY builds
+# the index without blocking writes. Queries must repeat the expression
+# exactly (see marketplace.search.filter_keywords).
+POSTGRES_FORWARD = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS listing_search_vector_idx "
+    "ON marketplace_listing "
+    "USING gin (to_tsvector('english', description))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX CONCURRENTLY IF EXISTS listing_search_vector_idx",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE marketplace_listing_fts USING fts5("
+    "description, content='marketplace_listing', content_rowid='id')",
+    "CREATE TRIGGER marketplace_listing_fts_insert "
+    "AFTER INSERT ON marketplace_listing BEGIN "
+    "INSERT INTO marketplace_listing_fts (rowid, description) "
+    "VALUES (new.id, new.description); END",
+    "CREATE TRIGGER marketplace_listing_fts_delete "
+    "AFTER DELETE ON marketplace_listing BEGIN "
+    "INSERT INTO marketplace_listing_fts "
+    "(marketplace_listing_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER marketplace_listing_fts_update "
+    "AFTER UPDATE OF description ON marketplace_listing BEGIN "
+    "INSERT INTO marketplace_listing_fts "
+    "(marketplace_listing_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO marketplace_listing_fts (rowid, description) "
+    "VALUES (new.id, new.description); END",
+    "INSERT INTO marketplace_listing_fts (marketplace_listing_fts) "
+    "VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS marketplace_listing_fts_insert",
+    "DROP TRIGGER IF EXISTS marketplace_listing_fts_delete",
+    "DROP TRIGGER IF EXISTS marketplace_listing_fts_update",
+    "DROP TABLE IF EXISTS marketplace_listing_fts",
+]
+
+
+STATEMENTS = {
+    "forward": {"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD},
+    "backward": {"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD},
+}
+
+
+def run_statements(schema_editor, direction):
+    connection = schema_editor.connection
+    statements = STATEMENTS[direction].get(connection.vendor, [])
+    if connection.vendor == "postgresql":
+        # CONCURRENTLY cannot run inside a transaction.
+        for statement in statements:
+            schema_editor.execute(statement)
+        return
+    with transaction.atomic(using=connection.alias):
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, "forward")
+
+
+def drop_search_index(apps, schema_editor):
+    run_statements(schema_editor, "backward")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("marketplace", "0003_listing_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-17 19:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0004_listing_description_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="cover_image",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="marketplace.image",
+            ),
+        ),
+    ]
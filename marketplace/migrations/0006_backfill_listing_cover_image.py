@@ -0,0 +1,43 @@
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill_cover_images(apps, schema_editor):
+    listing_model = apps.get_model("marketplace", "Listing")
+    image_model = apps.get_model("marketplace", "Image")
+    first_image = (
+        image_model.objects.filter(listing=OuterRef("pk"))
+        .order_by("id")
+        .values("id")[:1]
+    )
+
+    last_id = 0
+    while True:
+        ids = list(
+            listing_model.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        with transaction.atomic(using=schema_editor.connection.alias):
+            listing_model.objects.filter(id__in=ids).update(
+                cover_image=Subquery(first_image)
+            )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("marketplace", "0005_listing_cover_image"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_cover_images, migrations.RunPython.noop
+        ),
+    ]
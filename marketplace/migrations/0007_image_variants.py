@@ -0,0 +1,22 @@
+# Generated by Django 4.2.5 on 2026-10-17 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0006_backfill_listing_cover_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="variants",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketuser",
+            name="profile_picture_variants",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.5 on 2026-10-17 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0007_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarketStatistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("total", "All listings"),
+                            ("model", "Car model"),
+                            ("year", "Year"),
+                            ("users", "Users"),
+                            ("models", "Car models"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("key", models.IntegerField(default=0)),
+                ("count", models.IntegerField(default=0)),
+                ("price_sum", models.BigIntegerField(default=0)),
+                ("price_min", models.IntegerField(null=True)),
+                ("price_max", models.IntegerField(null=True)),
+                ("price_median", models.IntegerField(null=True)),
+                ("price_p90", models.IntegerField(null=True)),
+                ("price_histogram", models.JSONField(default=dict)),
+                ("mileage_sum", models.BigIntegerField(default=0)),
+                ("mileage_min", models.IntegerField(null=True)),
+                ("mileage_max", models.IntegerField(null=True)),
+                ("mileage_median", models.IntegerField(null=True)),
+                ("mileage_p90", models.IntegerField(null=True)),
+                ("mileage_histogram", models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="marketstatistic",
+            constraint=models.UniqueConstraint(
+                fields=("dimension", "key"), name="market_statistic_dimension_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.5 on 2026-10-17 20:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0008_market_statistics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                ("moments", models.JSONField(default=list)),
+                ("intercept", models.FloatField(default=0)),
+                ("year_coefficient", models.FloatField(default=0)),
+                ("mileage_coefficient", models.FloatField(default=0)),
+                ("residual_std", models.FloatField(default=0)),
+                (
+                    "car_model",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_model",
+                        to="marketplace.model",
+                    ),
+                ),
+            ],
+        ),
+    ]
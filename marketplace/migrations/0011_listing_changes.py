@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0010_saved_searches"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ListingChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("listing_id", models.BigIntegerField()),
+                (
+                    "changed_at",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0011_listing_changes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="savedsearch",
+            index=models.Index(
+                fields=["created_at"], name="saved_search_created_idx"
+            ),
+        ),
+    ]
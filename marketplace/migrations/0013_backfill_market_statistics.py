@@ -0,0 +1,113 @@
+import math
+
+from django.db import migrations, transaction
+
+# Frozen copies of the values in marketplace.statistics and the
+# MarketStatistic dimensions, so later changes there cannot break this
+# migration.
+PRICE_BUCKET = 500
+MILEAGE_BUCKET = 5000
+CHUNK_SIZE = 100000
+
+
+def percentile(histogram, count, fraction, width, low, high):
+    if not count:
+        return None
+    rank = max(1, math.ceil(fraction * count))
+    seen = 0
+    for bucket in sorted(histogram, key=int):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return min(max(int(bucket) * width + width // 2, low), high)
+    return high
+
+
+def add_row(statistic, price, mileage):
+    statistic.count += 1
+    for column, width, value in (
+        ("price", PRICE_BUCKET, price),
+        ("mileage", MILEAGE_BUCKET, mileage),
+    ):
+        setattr(statistic, f"{column}_sum",
+                getattr(statistic, f"{column}_sum") + value)
+        low = getattr(statistic, f"{column}_min")
+        high = getattr(statistic, f"{column}_max")
+        setattr(statistic, f"{column}_min",
+                value if low is None else min(low, value))
+        setattr(statistic, f"{column}_max",
+                value if high is None else max(high, value))
+        histogram = getattr(statistic, f"{column}_histogram")
+        bucket = str(value // width)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+
+def backfill_market_statistics(apps, schema_editor):
+    # 0008 created the rollup empty, which left the homepage counters at
+    # zero until rebuild_market_statistics was run by hand.
+    MarketStatistic = apps.get_model("marketplace", "MarketStatistic")
+    Listing = apps.get_model("marketplace", "Listing")
+
+    statistics = {}
+    total = MarketStatistic(dimension="total", key=0)
+    rows = Listing.objects.order_by().values_list(
+        "car_model_id", "year", "price", "mileage"
+    )
+    for car_model_id, year, price, mileage in rows.iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        for group in (("model", car_model_id), ("year", year)):
+            statistic = statistics.get(group)
+            if statistic is None:
+                statistic = statistics[group] = MarketStatistic(
+                    dimension=group[0], key=group[1]
+                )
+            add_row(statistic, price, mileage)
+        total.count += 1
+        total.price_sum += price
+        total.mileage_sum += mileage
+
+    for statistic in statistics.values():
+        for column, width in (
+            ("price", PRICE_BUCKET), ("mileage", MILEAGE_BUCKET)
+        ):
+            arguments = (
+                getattr(statistic, f"{column}_histogram"),
+                statistic.count,
+            )
+            bounds = (
+                width,
+                getattr(statistic, f"{column}_min"),
+                getattr(statistic, f"{column}_max"),
+            )
+            setattr(statistic, f"{column}_median",
+                    percentile(*arguments, 0.5, *bounds))
+            setattr(statistic, f"{column}_p90",
+                    percentile(*arguments, 0.9, *bounds))
+
+    counters = [total]
+    for dimension, model_name in (
+        ("users", "MarketUser"), ("models", "Model")
+    ):
+        counters.append(MarketStatistic(
+            dimension=dimension,
+            key=0,
+            count=apps.get_model("marketplace", model_name).objects.count(),
+        ))
+
+    with transaction.atomic():
+        MarketStatistic.objects.all().delete()
+        MarketStatistic.objects.bulk_create(
+            [*statistics.values(), *counters], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0012_saved_search_created_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_market_statistics, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-17 22:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketplace", "0013_backfill_market_statistics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pricemodel",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -1,4 +1,5 @@
 import os
+from urllib.parse import urlencode
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
@@ -41,13 +42,47 @@ class Listing(models.Model):
     mileage = models.IntegerField()
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    cover_image = models.ForeignKey(
+        "Image",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
 
     @property
     def first_photo(self) -> object:
-        return self.images.first()
+        return self.cover_image
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="listing_created_desc_idx",
+            ),
+            models.Index(
+                fields=["car_model", "year", "price"],
+                name="listing_model_year_price_idx",
+            ),
+            models.Index(
+                fields=["car_model", "-created_at"],
+                name="listing_model_created_idx",
+            ),
+            models.Index(
+                fields=["year", "price"],
+                name="listing_year_price_idx",
+            ),
+            models.Index(fields=["price"], name="listing_price_idx"),
+            models.Index(fields=["mileage"], name="listing_mileage_idx"),
+            # Answers the model filtered, newest first page from the
+            # index alone on PostgreSQL. Other databases ignore INCLUDE.
+            models.Index(
+                fields=["car_model", "-created_at", "-id"],
+                include=["year", "price", "mileage"],
+                name="listing_model_cover_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.car_model.name}, {self.price}, " \
@@ -59,6 +94,7 @@ class Image(models.Model):
         Listing, on_delete=models.CASCADE, related_name="images"
     )
     image = models.ImageField(null=True)
+    variants = models.JSONField(null=True, blank=True, editable=False)
 
     def image_upload_to(self, filename):
         return os.path.join("images", f"listing_{self.listing.id}", filename)
@@ -71,6 +107,9 @@ class Image(models.Model):
 
 class MarketUser(AbstractUser):
     profile_picture = models.ImageField(null=True, blank=True)
+    profile_picture_variants = models.JSONField(
+        null=True, blank=True, editable=False
+    )
     phone_number = models.CharField(max_length=13, unique=True, null=True)
     favourite_listings = models.ManyToManyField(
         Listing, related_name="users", blank=True
@@ -86,3 +125,189 @@ class MarketUser(AbstractUser):
         return os.path.join("images", f"marketuser_{self.id}", filename)
 
     profile_picture.upload_to = image_upload_to
+
+
+class MarketStatistic(models.Model):
+    """
+    Rollup row of listing prices and mileages for one group, or a row
+    counter, maintained by ``marketplace.statistics``.
+    """
+
+    TOTAL = "total"
+    MODEL = "model"
+    YEAR = "year"
+    USERS = "users"
+    MODELS = "models"
+    DIMENSION_CHOICES = [
+        (TOTAL, "All listings"),
+        (MODEL, "Car model"),
+        (YEAR, "Year"),
+        (USERS, "Users"),
+        (MODELS, "Car models"),
+    ]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.IntegerField(default=0)
+    count = models.IntegerField(default=0)
+    price_sum = models.BigIntegerField(default=0)
+    price_min = models.IntegerField(null=True)
+    price_max = models.IntegerField(null=True)
+    price_median = models.IntegerField(null=True)
+    price_p90 = models.IntegerField(null=True)
+    price_histogram = models.JSONField(default=dict)
+    mileage_sum = models.BigIntegerField(default=0)
+    mileage_min = models.IntegerField(null=True)
+    mileage_max = models.IntegerField(null=True)
+    mileage_median = models.IntegerField(null=True)
+    mileage_p90 = models.IntegerField(null=True)
+    mileage_histogram = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dimension", "key"],
+                name="market_statistic_dimension_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key}: {self.count}"
+
+
+class PriceModel(models.Model):
+    """
+    Per car model regression of price on year and mileage, maintained by
+    ``marketplace.pricing``. ``moments`` holds the sums the fit is solved
+    from, so single listings can be added or removed without a full pass.
+    A model whose last listing is gone keeps a row with a zero count, so
+    workers refreshing their copy by ``updated_at`` see it go.
+    """
+
+    car_model = models.OneToOneField(
+        Model, on_delete=models.CASCADE, related_name="price_model"
+    )
+    count = models.IntegerField(default=0)
+    moments = models.JSONField(default=list)
+    intercept = models.FloatField(default=0)
+    year_coefficient = models.FloatField(default=0)
+    mileage_coefficient = models.FloatField(default=0)
+    residual_std = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.car_model_id}: {self.count} listings"
+
+
+class SavedSearch(models.Model):
+    """
+    Listing search a user wants to be notified about; new listings are
+    matched against it by ``marketplace.alerts``.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="saved_searches",
+    )
+    brand = models.ForeignKey(
+        Brand, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="+",
+    )
+    car_model = models.ForeignKey(
+        Model, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="+",
+    )
+    year_start = models.IntegerField(null=True, blank=True)
+    year_end = models.IntegerField(null=True, blank=True)
+    price_start = models.IntegerField(null=True, blank=True)
+    price_end = models.IntegerField(null=True, blank=True)
+    mileage_start = models.IntegerField(null=True, blank=True)
+    mileage_end = models.IntegerField(null=True, blank=True)
+    keywords = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["created_at"], name="saved_search_created_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.query_string()}"
+
+    def params(self) -> dict:
+        """
+        The search as listing page query parameters, without empty ones.
+        """
+        values = {
+            "brand": self.brand_id,
+            "model": self.car_model_id,
+            "year_start": self.year_start,
+            "year_end": self.year_end,
+            "price_start": self.price_start,
+            "price_end": self.price_end,
+            "mileage_start": self.mileage_start,
+            "mileage_end": self.mileage_end,
+            "keywords": self.keywords,
+        }
+        return {
+            param: value for param, value in values.items()
+            if value not in (None, "")
+        }
+
+    def query_string(self) -> str:
+        return urlencode(self.params())
+
+
+class Notification(models.Model):
+    """
+    A new listing matching one of the user's saved searches.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+    )
+    saved_search = models.ForeignKey(
+        SavedSearch, on_delete=models.CASCADE, related_name="notifications"
+    )
+    listing = models.ForeignKey(
+        Listing, on_delete=models.CASCADE, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    seen = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["saved_search", "listing"],
+                name="notification_search_listing",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"],
+                name="notification_user_created_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: listing {self.listing_id}"
+
+
+class ListingChange(models.Model):
+    """
+    Id of a listing that was created, edited or deleted, written in the
+    same transaction. Workers read it to keep their in-memory search
+    snapshots in step with each other.
+    """
+
+    listing_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"listing {self.listing_id} at {self.changed_at}"
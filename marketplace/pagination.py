@@ -0,0 +1,319 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (
+    EmptyPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from marketplace.caching import get_listings_generation
+from marketplace.templatetags.query_transform import canonical_query
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_at: datetime, pk: int, direction: str) -> str:
+    payload = json.dumps(
+        {"c": created_at.isoformat(), "i": pk, "d": direction},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"])
+        pk = int(payload["i"])
+        direction = payload["d"]
+    except (
+        binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError
+    ):
+        raise InvalidCursor("Invalid cursor")
+    if direction not in ("next", "prev"):
+        raise InvalidCursor("Invalid cursor direction")
+    return created_at, pk, direction
+
+
+def estimate_count(queryset) -> int:
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_queryset(queryset, count_key=None) -> tuple:
+    """
+    Return ``(count, is_capped)`` for a search queryset.
+
+    Counts above ``LISTING_COUNT_THRESHOLD`` are reported as the
+    threshold itself, so a broad search never counts the whole table.
+    On PostgreSQL the planner estimate is used first when
+    ``LISTING_COUNT_ESTIMATE`` is enabled. Results are cached for
+    ``LISTING_COUNT_CACHE_TIMEOUT`` seconds under ``count_key``.
+    """
+    threshold = getattr(settings, "LISTING_COUNT_THRESHOLD", None)
+    timeout = getattr(settings, "LISTING_COUNT_CACHE_TIMEOUT", 0)
+
+    if not isinstance(queryset, QuerySet):
+        count = len(queryset)
+        if threshold and count > threshold:
+            return threshold, True
+        return count, False
+
+    cache_key = None
+    if count_key is not None and timeout:
+        digest = hashlib.md5(count_key.encode()).hexdigest()
+        cache_key = (
+            f"marketplace:count:{get_listings_generation()}:{digest}"
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return tuple(cached)
+
+    result = None
+    if (
+        threshold
+        and getattr(settings, "LISTING_COUNT_ESTIMATE", False)
+        and connections[queryset.db].vendor == "postgresql"
+        and estimate_count(queryset) > threshold
+    ):
+        result = (threshold, True)
+    if result is None and threshold:
+        count = queryset.order_by()[:threshold + 1].count()
+        result = (min(count, threshold), count > threshold)
+    if result is None:
+        result = (queryset.count(), False)
+
+    if cache_key is not None:
+        cache.set(cache_key, result, timeout)
+    return result
+
+
+class CappedPage(Page):
+    """
+    A page of a search whose count was capped; whether a next page
+    exists is known from the extra row fetched with this one.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def end_index(self) -> int:
+        return self.start_index() + len(self.object_list) - 1
+
+
+class CountedPaginator(Paginator):
+    """
+    A paginator for search results counted by ``count_queryset``.
+
+    Once the count is capped it says nothing about where the results
+    end, so page numbers are checked by fetching the page instead of
+    against ``num_pages``.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count_info(self) -> tuple:
+        return count_queryset(self.object_list, self.count_key)
+
+    @property
+    def count(self) -> int:
+        return self.count_info[0]
+
+    @property
+    def count_is_capped(self) -> bool:
+        return self.count_info[1]
+
+    def validate_number(self, number):
+        if not self.count_is_capped:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        if not self.count_is_capped:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return CappedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @staticmethod
+    def _position(row) -> tuple:
+        if isinstance(row, dict):
+            return row["created_at"], row["id"]
+        return row.created_at, row.pk
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(*self._position(self.object_list[-1]), "next")
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(*self._position(self.object_list[0]), "prev")
+
+
+class CursorPaginator:
+    """
+    Seek pagination over (created_at, id), newest first.
+
+    Every page is a range scan on the listing_created_desc_idx index,
+    so its cost does not depend on how deep the page is.
+    """
+
+    def __init__(self, queryset, per_page: int, count_key=None):
+        self.queryset = queryset.order_by("-created_at", "-id")
+        self.per_page = per_page
+        self.count_key = count_key
+
+    @cached_property
+    def count_info(self) -> tuple:
+        return count_queryset(self.queryset, self.count_key)
+
+    @property
+    def count(self) -> int:
+        return self.count_info[0]
+
+    @property
+    def count_is_capped(self) -> bool:
+        return self.count_info[1]
+
+    def page(self, cursor=None) -> CursorPage:
+        if not cursor:
+            rows = list(self.queryset[:self.per_page + 1])
+            return CursorPage(
+                rows[:self.per_page], self, len(rows) > self.per_page, False
+            )
+
+        created_at, pk, direction = decode_cursor(cursor)
+        if direction == "next":
+            rows = list(
+                self.queryset.filter(
+                    Q(created_at__lt=created_at)
+                    | Q(created_at=created_at, id__lt=pk)
+                )[:self.per_page + 1]
+            )
+            return CursorPage(
+                rows[:self.per_page], self, len(rows) > self.per_page, True
+            )
+
+        rows = list(
+            self.queryset.filter(
+                Q(created_at__gt=created_at)
+                | Q(created_at=created_at, id__gt=pk)
+            ).order_by("created_at", "id")[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, True, has_previous)
+
+
+class ListingPaginationMixin:
+    paginator_class = CountedPaginator
+    cursor_query_param = "cursor"
+
+    def use_cursor_pagination(self) -> bool:
+        return getattr(settings, "LISTING_CURSOR_PAGINATION", False)
+
+    def get_count_key(self) -> str:
+        match = self.request.resolver_match
+        view_name = match.view_name if match else type(self).__name__
+        query = canonical_query(
+            self.request.GET,
+            exclude=(self.page_kwarg, self.cursor_query_param),
+        )
+        return f"{view_name}:{sorted(self.kwargs.items())}:{query}"
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return super().get_paginator(
+            queryset, per_page, count_key=self.get_count_key(), **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(
+            queryset, page_size, count_key=self.get_count_key()
+        )
+        try:
+            page = paginator.page(
+                self.request.GET.get(self.cursor_query_param)
+            )
+        except InvalidCursor as error:
+            raise Http404(str(error))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cursor_pagination"] = self.use_cursor_pagination()
+        return context
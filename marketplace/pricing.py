@@ -0,0 +1,370 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import format_html
+from django.utils.timezone import now
+
+from marketplace.caching import bump_pricing_version, get_pricing_version
+from marketplace.models import Listing, PriceModel
+
+# Features are shifted and scaled so the sums stay well conditioned.
+YEAR_ORIGIN = 2000
+MILEAGE_UNIT = 10000
+# Small ridge penalty on the slopes: a model whose listings all share a
+# year or a mileage gets a zero slope instead of a singular system.
+RIDGE = 1.0
+FIT_CHUNK_SIZE = 100000
+MOMENT_COUNT = 10
+
+
+def listing_moments(years, mileages, prices) -> np.ndarray:
+    """
+    Per-row terms of the normal equations: ``1, x1, x2, x1², x1·x2, x2²,
+    y, x1·y, x2·y, y²`` with ``x1`` the year, ``x2`` the mileage and
+    ``y`` the price.
+    """
+    x1 = np.asarray(years, dtype=np.float64) - YEAR_ORIGIN
+    x2 = np.asarray(mileages, dtype=np.float64) / MILEAGE_UNIT
+    price = np.asarray(prices, dtype=np.float64)
+    return np.column_stack([
+        np.ones_like(price), x1, x2, x1 * x1, x1 * x2, x2 * x2,
+        price, x1 * price, x2 * price, price * price,
+    ])
+
+
+def solve(sums: np.ndarray) -> tuple:
+    """
+    Fit every row of ``sums`` (one per car model) at once.
+
+    Returns the ``(intercept, year, mileage)`` coefficients and the
+    residual standard deviation of each model.
+    """
+    count, s1, s2, s11, s12, s22, sy, s1y, s2y, syy = sums.T
+    xtx = np.empty((len(sums), 3, 3))
+    xtx[:, 0, 0] = count
+    xtx[:, 0, 1] = xtx[:, 1, 0] = s1
+    xtx[:, 0, 2] = xtx[:, 2, 0] = s2
+    xtx[:, 1, 1] = s11
+    xtx[:, 1, 2] = xtx[:, 2, 1] = s12
+    xtx[:, 2, 2] = s22
+    xty = np.stack([sy, s1y, s2y], axis=1)
+
+    regularized = xtx.copy()
+    regularized[:, 1, 1] += RIDGE
+    regularized[:, 2, 2] += RIDGE
+    coefficients = np.linalg.solve(regularized, xty[..., None])[..., 0]
+
+    residuals = (
+        syy
+        - 2 * np.einsum("mi,mi->m", coefficients, xty)
+        + np.einsum("mi,mij,mj->m", coefficients, xtx, coefficients)
+    )
+    std = np.sqrt(np.maximum(residuals, 0) / np.maximum(count - 3, 1))
+    return coefficients, std
+
+
+def set_fit(price_model, sums, coefficients, std) -> None:
+    price_model.count = int(round(sums[0]))
+    price_model.moments = [float(value) for value in sums]
+    (
+        price_model.intercept,
+        price_model.year_coefficient,
+        price_model.mileage_coefficient,
+    ) = (float(value) for value in coefficients)
+    price_model.residual_std = float(std)
+
+
+def pricing_changed() -> None:
+    bump_pricing_version()
+    price_table_cache.invalidate()
+
+
+def prices_refitted() -> None:
+    """
+    Drop this worker's price table after a full refit. Other workers
+    reload theirs once the pricing version is bumped on commit; before
+    the commit they could load the old rows under the new version and
+    keep them until the next refit.
+    """
+    price_table_cache.invalidate()
+    transaction.on_commit(pricing_changed)
+
+
+def apply_price_changes(added=(), removed=()) -> None:
+    """
+    Add or remove listing rows (``(car_model_id, year, price, mileage)``)
+    from the stored sums and refit only the car models they belong to.
+
+    The pricing version is left alone: workers pick up the refitted rows
+    by their ``updated_at`` on their next check.
+    """
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        if not rows:
+            continue
+        model_ids, years, prices, mileages = zip(*rows)
+        terms = sign * listing_moments(years, mileages, prices)
+        for model_id, row in zip(model_ids, terms):
+            deltas[model_id] = deltas.get(model_id, 0) + row
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        price_models = {
+            price_model.car_model_id: price_model
+            for price_model in PriceModel.objects.select_for_update()
+            .filter(car_model_id__in=deltas)
+        }
+        for model_id, delta in deltas.items():
+            price_model = price_models.get(model_id)
+            if price_model is None:
+                price_model = PriceModel(car_model_id=model_id)
+            sums = np.array(
+                price_model.moments or [0.0] * MOMENT_COUNT
+            ) + delta
+            if round(sums[0]) <= 0:
+                if price_model.pk:
+                    price_model.count = 0
+                    price_model.moments = []
+                    price_model.save()
+                continue
+            coefficients, std = solve(sums[None, :])
+            set_fit(price_model, sums, coefficients[0], std[0])
+            price_model.save()
+        price_table_cache.expire()
+        transaction.on_commit(price_table_cache.expire)
+
+
+def accumulate(totals: dict, chunk) -> None:
+    columns = np.array(chunk, dtype=np.int64)
+    model_ids, inverse = np.unique(columns[:, 0], return_inverse=True)
+    terms = listing_moments(columns[:, 1], columns[:, 2], columns[:, 3])
+    sums = np.column_stack([
+        np.bincount(inverse, weights=terms[:, column],
+                    minlength=len(model_ids))
+        for column in range(MOMENT_COUNT)
+    ])
+    for model_id, row in zip(model_ids.tolist(), sums):
+        totals[model_id] = totals.get(model_id, 0) + row
+
+
+def fit_price_models(chunk_size: int = FIT_CHUNK_SIZE) -> dict:
+    """
+    Refit every car model from scratch.
+
+    Listings are read in chunks of ``(car_model, year, mileage, price)``
+    columns and reduced to per-model sums with ``np.bincount``; all
+    models are then solved in one batched ``np.linalg.solve``. Returns
+    the number of models and listings, and the load and fit times.
+    """
+    started = time.perf_counter()
+    totals = {}
+    listings = 0
+    chunk = []
+    rows = Listing.objects.order_by().values_list(
+        "car_model_id", "year", "mileage", "price"
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            accumulate(totals, chunk)
+            listings += len(chunk)
+            chunk = []
+    if chunk:
+        accumulate(totals, chunk)
+        listings += len(chunk)
+    loaded = time.perf_counter()
+
+    model_ids = list(totals)
+    sums = np.array([totals[model_id] for model_id in model_ids])
+    price_models = []
+    if model_ids:
+        coefficients, std = solve(sums)
+        for index, model_id in enumerate(model_ids):
+            price_model = PriceModel(car_model_id=model_id)
+            set_fit(price_model, sums[index], coefficients[index], std[index])
+            price_models.append(price_model)
+    fitted = time.perf_counter()
+
+    with transaction.atomic():
+        PriceModel.objects.all().delete()
+        PriceModel.objects.bulk_create(price_models, batch_size=1000)
+        prices_refitted()
+    return {
+        "models": len(price_models),
+        "listings": listings,
+        "load_seconds": loaded - started,
+        "fit_seconds": fitted - loaded,
+    }
+
+
+class PriceTable:
+    """
+    In-memory coefficients of every fitted car model; an estimate is a
+    dict lookup and three multiplications.
+    """
+
+    def __init__(self, models, version=None):
+        self.models = models
+        self.version = version
+
+    @staticmethod
+    def rows(queryset):
+        return queryset.values_list(
+            "car_model_id",
+            "count",
+            "intercept",
+            "year_coefficient",
+            "mileage_coefficient",
+            "residual_std",
+        )
+
+    @classmethod
+    def load(cls, version=None):
+        return cls(
+            {
+                model_id: tuple(fit)
+                for model_id, *fit in cls.rows(
+                    PriceModel.objects.filter(count__gt=0)
+                )
+            },
+            version,
+        )
+
+    def refresh(self, since) -> None:
+        """
+        Reload the fits updated since ``since`` and drop the car models
+        that have no listings left.
+        """
+        models = dict(self.models)
+        for model_id, *fit in self.rows(
+            PriceModel.objects.filter(updated_at__gte=since)
+        ):
+            if fit[0] > 0:
+                models[model_id] = tuple(fit)
+            else:
+                models.pop(model_id, None)
+        self.models = models
+
+    def estimate(self, car_model_id: int, year: int, mileage: int):
+        """
+        Return ``{"estimate", "low", "high", "listings"}`` with ``low``
+        and ``high`` one residual standard deviation away, or None when
+        the car model has no listings.
+        """
+        fit = self.models.get(car_model_id)
+        if fit is None:
+            return None
+        count, intercept, year_coefficient, mileage_coefficient, std = fit
+        estimate = max(
+            0.0,
+            intercept
+            + year_coefficient * (year - YEAR_ORIGIN)
+            + mileage_coefficient * mileage / MILEAGE_UNIT,
+        )
+        return {
+            "estimate": round(estimate),
+            "low": round(max(0.0, estimate - std)),
+            "high": round(estimate + std),
+            "listings": count,
+        }
+
+    def rating(self, listing):
+        """
+        ``"good"`` when the listing is priced below the low end of its
+        estimate, ``"high"`` above the high end, otherwise None. Models
+        with fewer than ``PRICE_ESTIMATE_MIN_LISTINGS`` listings are not
+        rated.
+        """
+        estimate = self.estimate(
+            listing.car_model_id, int(listing.year), int(listing.mileage)
+        )
+        if (
+            estimate is None
+            or estimate["listings"] < settings.PRICE_ESTIMATE_MIN_LISTINGS
+        ):
+            return None
+        if listing.price < estimate["low"]:
+            return "good"
+        if listing.price > estimate["high"]:
+            return "high"
+        return None
+
+
+class PriceTableCache:
+    """
+    Process-local copy of the price table, checked at most every
+    ``PRICE_TABLE_CHECK_SECONDS``.
+
+    A full refit bumps the shared pricing version and every worker
+    reloads the whole table. Listing changes only refit single models;
+    each check re-reads the rows updated since the previous one, minus
+    ``PRICE_TABLE_CHANGE_OVERLAP_SECONDS`` for transactions that commit
+    late and clock skew between workers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.version = None
+        self.checked_at = None
+        self.changes_since = None
+
+    def get(self) -> PriceTable:
+        checked_at = time.monotonic()
+        with self.lock:
+            if (
+                self.snapshot is None
+                or self.checked_at is None
+                or checked_at - self.checked_at
+                > settings.PRICE_TABLE_CHECK_SECONDS
+            ):
+                version = get_pricing_version()
+                started = now()
+                if self.snapshot is None or version != self.version:
+                    self.snapshot = PriceTable.load(version)
+                    self.version = version
+                else:
+                    self.snapshot.refresh(self.changes_since - timedelta(
+                        seconds=settings.PRICE_TABLE_CHANGE_OVERLAP_SECONDS
+                    ))
+                self.checked_at = checked_at
+                self.changes_since = started
+            return self.snapshot
+
+    def expire(self) -> None:
+        """
+        Check for changes on the next ``get``, e.g. after this worker
+        refitted a model.
+        """
+        with self.lock:
+            self.checked_at = None
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.snapshot = None
+
+
+price_table_cache = PriceTableCache()
+
+
+def get_price_table() -> PriceTable:
+    return price_table_cache.get()
+
+
+PRICE_BADGES = {
+    "good": ("bg-gradient-success", "Good deal"),
+    "high": ("bg-gradient-warning", "Overpriced"),
+}
+
+
+def price_badge(table: PriceTable, listing) -> str:
+    rating = table.rating(listing)
+    if rating is None:
+        return ""
+    css_class, label = PRICE_BADGES[rating]
+    return format_html('<span class="badge {}">{}</span>', css_class, label)
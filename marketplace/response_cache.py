@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from marketplace.caching import get_listings_generation
+from marketplace.templatetags.query_transform import canonical_query
+
+HITS_KEY = "marketplace:response:hits"
+MISSES_KEY = "marketplace:response:misses"
+
+
+def response_cache_key(name: str, request) -> str:
+    query = canonical_query(request.GET)
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return (
+        f"marketplace:response:{name}:{get_listings_generation()}:{digest}"
+    )
+
+
+def count(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def response_cache_stats() -> dict:
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def reset_response_cache_stats() -> None:
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def is_cacheable(request) -> bool:
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and settings.RESPONSE_CACHE_TIMEOUT > 0
+    )
+
+
+def get_cached_response(name: str, request) -> tuple:
+    """
+    Return ``(key, response)`` for ``request``, with ``response`` None on
+    a miss and both None when the request is not cacheable.
+    """
+    if not is_cacheable(request):
+        return None, None
+
+    key = response_cache_key(name, request)
+    response = cache.get(key)
+    if response is not None:
+        count(HITS_KEY)
+        response["X-Cache"] = "HIT"
+        return key, response
+
+    count(MISSES_KEY)
+    return key, None
+
+
+def store_response(key: str, response):
+    def store(rendered):
+        if rendered.status_code == 200 and not rendered.cookies:
+            cache.set(key, rendered, settings.RESPONSE_CACHE_TIMEOUT)
+
+    if hasattr(response, "render") and not response.is_rendered:
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+def cache_anonymous_response(name: str):
+    """
+    Cache the rendered response of a view for anonymous visitors.
+
+    The key is the canonical query string (sorted, empty values dropped)
+    under the current listings generation, so any listing change makes
+    every entry stale at once. Async views are wrapped by an async
+    wrapper, which does the cache work on a thread.
+    """
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key, response = await sync_to_async(get_cached_response)(
+                    name, request
+                )
+                if response is not None:
+                    return response
+
+                response = await view(request, *args, **kwargs)
+                if key is None:
+                    return response
+                return await sync_to_async(store_response)(key, response)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key, response = get_cached_response(name, request)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if key is None:
+                return response
+            return store_response(key, response)
+
+        return wrapper
+
+    return decorator
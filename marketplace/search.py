@@ -0,0 +1,556 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from marketplace.models import Listing, ListingChange
+
+logger = logging.getLogger(__name__)
+
+ORM_FILTERS = {
+    "brand": "car_model__brand__id",
+    "model": "car_model__id",
+    "year_start": "year__gte",
+    "year_end": "year__lte",
+    "price_start": "price__gte",
+    "price_end": "price__lte",
+    "mileage_start": "mileage__gte",
+    "mileage_end": "mileage__lte",
+}
+KEYWORD_PARAM = "keywords"
+RANGE_COLUMNS = ("year", "price", "mileage")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+LOAD_CHUNK_SIZE = 100000
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+
+
+def filter_keywords(queryset, keywords: str):
+    """
+    Match listing descriptions against every word in ``keywords``.
+
+    Uses the ``to_tsvector`` expression index on PostgreSQL and the FTS5
+    table on SQLite, both created in migration 0004, and falls back to
+    ``icontains`` elsewhere.
+    """
+    words = re.findall(r"\w+", keywords)
+    if not words:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        return queryset.annotate(
+            keyword_match=RawSQL(
+                # Same expression as the index, or it is not used.
+                "to_tsvector('english', marketplace_listing.description) "
+                "@@ plainto_tsquery('english', %s)",
+                (" ".join(words),),
+                output_field=BooleanField(),
+            )
+        ).filter(keyword_match=True)
+    if vendor == "sqlite":
+        return queryset.filter(
+            id__in=RawSQL(
+                "SELECT rowid FROM marketplace_listing_fts "
+                "WHERE marketplace_listing_fts MATCH %s",
+                (" ".join(f'"{word}"' for word in words),),
+            )
+        )
+    for word in words:
+        queryset = queryset.filter(description__icontains=word)
+    return queryset
+
+
+class ORMSearchBackend:
+    def search(self, queryset, params):
+        for param, lookup in ORM_FILTERS.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        keywords = params.get(KEYWORD_PARAM)
+        if keywords:
+            queryset = filter_keywords(queryset, keywords)
+        return queryset
+
+
+def get_search_backend():
+    backend_path = getattr(
+        settings,
+        "LISTING_SEARCH_BACKEND",
+        "marketplace.search.ORMSearchBackend",
+    )
+    return import_string(backend_path)()
+
+
+def parse_search_params(params):
+    filters = {}
+    for param in ORM_FILTERS:
+        value = params.get(param)
+        if not value:
+            continue
+        try:
+            filters[param] = int(value)
+        except (TypeError, ValueError):
+            return None
+    return filters
+
+
+def to_microseconds(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class ListingSnapshot:
+    """
+    Columnar copy of the searchable listing fields.
+
+    Rows are stored newest first, so ascending row positions are already
+    in the listing page order. Brand, model, price and mileage carry a
+    sorted index used to pick a small candidate set before the remaining
+    predicates are applied as vectorized masks.
+    """
+
+    def __init__(self, ids, created, models, brands, years, prices, mileages):
+        self.ids = ids
+        self.created = created
+        self.columns = {
+            "model": models,
+            "brand": brands,
+            "year": years,
+            "price": prices,
+            "mileage": mileages,
+        }
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.indexes = {}
+        for column in ("model", "brand", "price", "mileage"):
+            order = np.argsort(self.columns[column], kind="stable")
+            order = order.astype(np.int32)
+            self.indexes[column] = (self.columns[column][order], order)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, queryset=None):
+        if queryset is None:
+            queryset = Listing.objects.all()
+        rows = queryset.order_by("-created_at", "-id").values_list(
+            "id",
+            "created_at",
+            "car_model_id",
+            "car_model__brand_id",
+            "year",
+            "price",
+            "mileage",
+        )
+        chunks = [[] for _ in range(7)]
+        chunk = []
+        for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == LOAD_CHUNK_SIZE:
+                cls._append_chunk(chunks, chunk)
+                chunk = []
+        cls._append_chunk(chunks, chunk)
+
+        dtypes = (
+            np.int64, np.int64, np.int64, np.int64,
+            np.int32, np.int32, np.int32,
+        )
+        return cls(*[
+            np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+            for parts, dtype in zip(chunks, dtypes)
+        ])
+
+    @staticmethod
+    def _append_chunk(chunks, rows):
+        if not rows:
+            return
+        ids, created, models, brands, years, prices, mileages = zip(*rows)
+        chunks[0].append(np.array(ids, dtype=np.int64))
+        chunks[1].append(
+            np.array([to_microseconds(value) for value in created],
+                     dtype=np.int64)
+        )
+        chunks[2].append(np.array(models, dtype=np.int64))
+        chunks[3].append(np.array(brands, dtype=np.int64))
+        chunks[4].append(np.array(years, dtype=np.int32))
+        chunks[5].append(np.array(prices, dtype=np.int32))
+        chunks[6].append(np.array(mileages, dtype=np.int32))
+
+    def _index_range(self, column, low, high):
+        values, order = self.indexes[column]
+        left = 0 if low is None else np.searchsorted(values, low, "left")
+        right = (
+            len(values) if high is None
+            else np.searchsorted(values, high, "right")
+        )
+        return order, left, right
+
+    def match(self, filters: dict):
+        """
+        Return the row positions matching ``filters``, newest first.
+        """
+        bounds = {
+            "model": (filters.get("model"), filters.get("model")),
+            "brand": (filters.get("brand"), filters.get("brand")),
+        }
+        for column in RANGE_COLUMNS:
+            bounds[column] = (
+                filters.get(f"{column}_start"), filters.get(f"{column}_end")
+            )
+        bounds = {
+            column: bound for column, bound in bounds.items()
+            if bound != (None, None)
+        }
+
+        driver = None
+        for column in bounds.keys() & self.indexes.keys():
+            order, left, right = self._index_range(column, *bounds[column])
+            if driver is None or right - left < driver[2] - driver[1]:
+                driver = (order, left, right, column)
+
+        if driver is not None and (driver[2] - driver[1]) * 8 < len(self):
+            order, left, right, column = driver
+            positions = order[left:right]
+            if column not in ("model", "brand"):
+                positions = np.sort(positions)
+            bounds.pop(column)
+            mask = self.alive[positions]
+            for column, (low, high) in bounds.items():
+                values = self.columns[column][positions]
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            return positions[mask]
+
+        mask = self.alive.copy()
+        for column, (low, high) in bounds.items():
+            values = self.columns[column]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return np.flatnonzero(mask)
+
+    def discard(self, listing_id: int) -> None:
+        hits = np.flatnonzero(self.ids == listing_id)
+        self.alive[hits] = False
+
+
+def record_listing_changes(listing_ids) -> None:
+    """
+    Log ``listing_ids`` as changed for the search snapshots of every
+    worker; call it inside the transaction that changes the listings.
+
+    Only the columnar backend reads the log, and only its rebuilds prune
+    it, so nothing is written under any other backend.
+    """
+    if not isinstance(get_search_backend(), ColumnarSearchBackend):
+        return
+    ListingChange.objects.bulk_create(
+        [ListingChange(listing_id=listing_id) for listing_id in listing_ids],
+        batch_size=1000,
+    )
+
+
+class ColumnarSearchEngine:
+    """
+    In-memory search over a :class:`ListingSnapshot`.
+
+    Listings saved in this process are applied through signals into a
+    small delta that is scanned row by row once their transaction
+    commits. Listings created, edited or deleted by other workers are
+    read back from the :class:`ListingChange` log every
+    ``LISTING_SEARCH_REFRESH_SECONDS``, and the snapshot is rebuilt once
+    the delta grows past ``LISTING_SEARCH_MAX_DELTA`` rows or the
+    snapshot is older than ``LISTING_SEARCH_REBUILD_SECONDS``. Those
+    rebuilds load the new snapshot on a background thread while
+    requests keep using the old one.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.snapshot = None
+        self.delta = {}
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+        self.changes_since = None
+        self.rebuilding = False
+        # Changes applied while a new snapshot loads, replayed on top of it.
+        self.pending = None
+
+    def rebuild(self) -> None:
+        with self.build_lock:
+            self._load()
+
+    def _load(self) -> None:
+        """
+        Load a new snapshot and swap it in with the changes applied since
+        the load started.
+        """
+        with self.lock:
+            self.pending = []
+        started = now()
+        try:
+            snapshot = ListingSnapshot.load()
+        finally:
+            with self.lock:
+                pending, self.pending = self.pending, None
+        with self.lock:
+            self.snapshot = snapshot
+            self.delta = {}
+            self.built_at = self.refreshed_at = time.monotonic()
+            self.changes_since = started
+            for listing_id, row in pending:
+                self._put(listing_id, row)
+        # No snapshot is older than this, so its changes are done.
+        ListingChange.objects.filter(
+            changed_at__lt=started - timedelta(
+                seconds=settings.LISTING_SEARCH_REBUILD_SECONDS
+                + settings.LISTING_SEARCH_CHANGE_OVERLAP_SECONDS
+            )
+        ).delete()
+
+    def rebuild_in_background(self) -> None:
+        close_old_connections()
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Could not rebuild the listing search snapshot")
+        finally:
+            close_old_connections()
+            with self.lock:
+                self.rebuilding = False
+
+    def invalidate(self) -> None:
+        """
+        Drop the snapshot; the next search loads a new one.
+        """
+        with self.lock:
+            self.snapshot = None
+
+    def ensure_fresh(self) -> None:
+        checked_at = time.monotonic()
+        with self.lock:
+            loaded = self.snapshot is not None
+            expired = loaded and not self.rebuilding and (
+                len(self.delta) > settings.LISTING_SEARCH_MAX_DELTA
+                or checked_at - self.built_at
+                > settings.LISTING_SEARCH_REBUILD_SECONDS
+            )
+            if expired:
+                self.rebuilding = True
+            elif loaded and (
+                checked_at - self.refreshed_at
+                > settings.LISTING_SEARCH_REFRESH_SECONDS
+            ):
+                self.refresh()
+        if expired:
+            if settings.LISTING_SEARCH_ASYNC_REBUILD:
+                executor.submit(self.rebuild_in_background)
+            else:
+                try:
+                    self.rebuild()
+                finally:
+                    with self.lock:
+                        self.rebuilding = False
+        elif not loaded:
+            # Nothing to answer from yet: the first search loads the
+            # snapshot and concurrent ones wait for it.
+            with self.build_lock:
+                if self.snapshot is None:
+                    self._load()
+
+    def refresh(self) -> None:
+        """
+        Re-read every listing logged as changed since the last refresh.
+
+        The log is read again from ``LISTING_SEARCH_CHANGE_OVERLAP_SECONDS``
+        back, so a change committed after a later one is not missed;
+        applying a listing twice is harmless.
+        """
+        started = now()
+        changed = set(
+            ListingChange.objects.filter(
+                changed_at__gte=self.changes_since - timedelta(
+                    seconds=settings.LISTING_SEARCH_CHANGE_OVERLAP_SECONDS
+                )
+            ).values_list("listing_id", flat=True)
+        )
+        listings = Listing.objects.select_related("car_model").in_bulk(
+            changed
+        )
+        for listing_id in changed:
+            if listing_id in listings:
+                self.apply(listings[listing_id])
+            else:
+                self.remove(listing_id)
+        self.changes_since = started
+        self.refreshed_at = time.monotonic()
+
+    def _put(self, listing_id: int, row) -> None:
+        self.snapshot.discard(listing_id)
+        if row is None:
+            self.delta.pop(listing_id, None)
+        else:
+            self.delta[listing_id] = row
+
+    def _record(self, listing_id: int, row) -> None:
+        if self.pending is not None:
+            self.pending.append((listing_id, row))
+        if self.snapshot is not None:
+            self._put(listing_id, row)
+
+    def apply(self, listing) -> None:
+        with self.lock:
+            if self.snapshot is None and self.pending is None:
+                return
+            self._record(listing.id, {
+                "id": listing.id,
+                "created": to_microseconds(listing.created_at),
+                "model": listing.car_model_id,
+                "brand": listing.car_model.brand_id,
+                "year": int(listing.year),
+                "price": int(listing.price),
+                "mileage": int(listing.mileage),
+            })
+
+    def remove(self, listing_id: int) -> None:
+        with self.lock:
+            if self.snapshot is None and self.pending is None:
+                return
+            self._record(listing_id, None)
+
+    def _delta_matches(self, filters: dict) -> list:
+        matches = []
+        for row in self.delta.values():
+            if "brand" in filters and row["brand"] != filters["brand"]:
+                continue
+            if "model" in filters and row["model"] != filters["model"]:
+                continue
+            if any(
+                row[column] < filters.get(f"{column}_start", row[column])
+                or row[column] > filters.get(f"{column}_end", row[column])
+                for column in RANGE_COLUMNS
+            ):
+                continue
+            matches.append((row["created"], row["id"], row))
+        matches.sort(key=lambda match: match[:2], reverse=True)
+        return matches
+
+    def search(self, filters: dict) -> "ColumnarMatch":
+        while True:
+            self.ensure_fresh()
+            with self.lock:
+                # Invalidated since the check: load the snapshot again.
+                if self.snapshot is not None:
+                    return ColumnarMatch(
+                        self.snapshot,
+                        self.snapshot.match(filters),
+                        self._delta_matches(filters),
+                    )
+
+
+class ColumnarMatch:
+    def __init__(self, snapshot, positions, delta):
+        self.snapshot = snapshot
+        self.positions = positions
+        self.delta = delta
+
+    def __len__(self):
+        return len(self.positions) + len(self.delta)
+
+    def drop(self, listing_ids) -> None:
+        self.positions = self.positions[
+            ~np.isin(self.snapshot.ids[self.positions], list(listing_ids))
+        ]
+        self.delta = [row for row in self.delta if row[1] not in listing_ids]
+
+    def values(self, column: str):
+        """
+        Return ``column`` of every matched row, snapshot rows first.
+        """
+        values = self.snapshot.columns[column]
+        return np.concatenate([
+            values[self.positions],
+            np.array([row[2][column] for row in self.delta],
+                     dtype=values.dtype),
+        ])
+
+    def ids(self, start: int, stop: int) -> list:
+        head = self.positions[:stop]
+        if not self.delta:
+            return self.snapshot.ids[head[start:]].tolist()
+        created = np.concatenate([
+            self.snapshot.created[head],
+            np.array([row[0] for row in self.delta[:stop]], dtype=np.int64),
+        ])
+        ids = np.concatenate([
+            self.snapshot.ids[head],
+            np.array([row[1] for row in self.delta[:stop]], dtype=np.int64),
+        ])
+        order = np.lexsort((-ids, -created))
+        return ids[order][start:stop].tolist()
+
+
+class ColumnarResult:
+    """
+    Lazy sequence handed to the paginator in place of a queryset.
+
+    Counting is answered from memory; slicing fetches only the rows of
+    the requested page from the database, in the order of the match.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, match: ColumnarMatch):
+        self.queryset = queryset
+        self.match = match
+
+    def count(self) -> int:
+        return len(self.match)
+
+    def __len__(self):
+        return len(self.match)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        while True:
+            start, stop, _ = index.indices(len(self))
+            ids = self.match.ids(start, stop)
+            rows = {
+                listing.id: listing
+                for listing in self.queryset.filter(id__in=ids)
+            }
+            missing = {pk for pk in ids if pk not in rows}
+            if not missing:
+                return [rows[pk] for pk in ids]
+            # Deleted since the last refresh: fill the page from the
+            # following matches instead of returning it short.
+            self.match.drop(missing)
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+engine = ColumnarSearchEngine()
+
+
+class ColumnarSearchBackend:
+    def search(self, queryset, params):
+        filters = parse_search_params(params)
+        if filters is None or params.get(KEYWORD_PARAM):
+            return ORMSearchBackend().search(queryset, params)
+        return ColumnarResult(queryset, engine.search(filters))
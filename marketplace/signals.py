@@ -0,0 +1,273 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from marketplace.alerts import notify_new_listings, saved_searches_changed
+from marketplace.caching import (
+    bump_fragments_generation,
+    bump_catalog_version,
+    bump_favourites_generation,
+    bump_listings_generation,
+    delete_listing_fragments,
+)
+from marketplace.catalog import catalog_cache
+from marketplace.images import (
+    schedule_variant_deletion,
+    schedule_variants,
+    variants_stored,
+)
+from marketplace.models import (
+    Brand,
+    Image,
+    Listing,
+    MarketStatistic,
+    MarketUser,
+    Model,
+    SavedSearch,
+)
+from marketplace.pricing import apply_price_changes
+from marketplace.search import (
+    engine as search_engine,
+    record_listing_changes,
+)
+from marketplace.similar import engine as similar_engine
+from marketplace.statistics import (
+    adjust_counter,
+    apply_listing_changes,
+    listing_row,
+)
+
+COUNTERS = {
+    MarketUser: MarketStatistic.USERS,
+    Model: MarketStatistic.MODELS,
+}
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Model)
+@receiver(post_delete, sender=Model)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(variants_stored, sender=Image)
+def listing_changed(sender, **kwargs):
+    # Cache invalidations wait for the commit, or a concurrent request
+    # could cache the old rows again under the new keys.
+    transaction.on_commit(bump_listings_generation)
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def listing_card_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(delete_listing_fragments, instance.id))
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_card_changed(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(delete_listing_fragments, instance.listing_id)
+    )
+
+
+@receiver(variants_stored, sender=Image)
+def image_variants_stored(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(delete_listing_fragments, instance.listing_id)
+    )
+
+
+@receiver(post_save, sender=Listing)
+def listing_saved(sender, instance, **kwargs):
+    record_listing_changes([instance.id])
+    transaction.on_commit(partial(search_engine.apply, instance))
+    transaction.on_commit(partial(similar_engine.apply, instance))
+
+
+@receiver(post_delete, sender=Listing)
+def listing_deleted(sender, instance, **kwargs):
+    record_listing_changes([instance.id])
+    transaction.on_commit(partial(search_engine.remove, instance.id))
+    transaction.on_commit(partial(similar_engine.remove, instance.id))
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_delete, sender=Model)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def car_model_changed(sender, **kwargs):
+    search_engine.invalidate()
+    transaction.on_commit(similar_engine.expire)
+    transaction.on_commit(bump_fragments_generation)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Model)
+@receiver(post_delete, sender=Model)
+def catalog_changed(sender, **kwargs):
+    # Before the commit another worker could load the old catalog under
+    # the new version and keep it until the next change. This worker
+    # drops its copy again then, in case another thread reloaded it.
+    catalog_cache.invalidate()
+    transaction.on_commit(catalog_cache.invalidate)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, created, **kwargs):
+    if created:
+        Listing.objects.filter(
+            id=instance.listing_id, cover_image__isnull=True
+        ).update(cover_image=instance)
+    schedule_variants(instance, "image", "variants")
+
+
+@receiver(post_save, sender=MarketUser)
+def seller_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no listing page shows.
+    if created or update_fields == frozenset({"last_login"}):
+        return
+    transaction.on_commit(partial(
+        delete_listing_fragments,
+        *instance.car_listings.values_list("id", flat=True),
+    ))
+
+
+@receiver(post_save, sender=MarketUser)
+def market_user_saved(sender, instance, **kwargs):
+    schedule_variants(
+        instance, "profile_picture", "profile_picture_variants"
+    )
+
+
+@receiver(post_delete, sender=Image)
+def image_variants_deleted(sender, instance, **kwargs):
+    schedule_variant_deletion(instance, "image", "variants")
+
+
+@receiver(post_delete, sender=MarketUser)
+def profile_picture_variants_deleted(sender, instance, **kwargs):
+    schedule_variant_deletion(
+        instance, "profile_picture", "profile_picture_variants"
+    )
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    first_image = (
+        Image.objects.filter(listing=OuterRef("pk"))
+        .order_by("id")
+        .values("id")[:1]
+    )
+    Listing.objects.filter(
+        id=instance.listing_id, cover_image__isnull=True
+    ).update(cover_image=Subquery(first_image))
+
+
+@receiver(m2m_changed, sender=MarketUser.favourite_listings.through)
+def favourite_listings_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if reverse and action == "pre_clear":
+        instance._favourited_by = list(
+            instance.users.values_list("id", flat=True)
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == "post_clear":
+        user_ids = instance.__dict__.pop("_favourited_by", [])
+    else:
+        user_ids = pk_set
+    for user_id in user_ids:
+        transaction.on_commit(partial(bump_favourites_generation, user_id))
+
+
+LISTING_ROW_FIELDS = {
+    "car_model", "car_model_id", "year", "price", "mileage"
+}
+
+
+@receiver(pre_save, sender=Listing)
+def remember_listing_row(sender, instance, update_fields=None, **kwargs):
+    # The rollups need the stored values to take an edited listing out.
+    if instance._state.adding:
+        instance._previous_row = None
+    elif update_fields is not None and not (
+        LISTING_ROW_FIELDS & set(update_fields)
+    ):
+        # None of the counted values is written, e.g. a new cover image.
+        instance._previous_row = listing_row(instance)
+    else:
+        instance._previous_row = (
+            Listing.objects.filter(pk=instance.pk)
+            .values_list("car_model_id", "year", "price", "mileage")
+            .first()
+        )
+
+
+def listing_row_changes(instance) -> tuple:
+    previous = getattr(instance, "_previous_row", None)
+    current = listing_row(instance)
+    if previous == current:
+        return [], []
+    return [current], [previous] if previous else []
+
+
+@receiver(post_save, sender=Listing)
+def listing_statistics_saved(sender, instance, **kwargs):
+    added, removed = listing_row_changes(instance)
+    apply_listing_changes(added=added, removed=removed)
+
+
+@receiver(post_delete, sender=Listing)
+def listing_statistics_deleted(sender, instance, **kwargs):
+    apply_listing_changes(removed=[listing_row(instance)])
+
+
+@receiver(post_save, sender=Listing)
+def listing_prices_saved(sender, instance, **kwargs):
+    added, removed = listing_row_changes(instance)
+    apply_price_changes(added=added, removed=removed)
+
+
+@receiver(post_delete, sender=Listing)
+def listing_prices_deleted(sender, instance, **kwargs):
+    apply_price_changes(removed=[listing_row(instance)])
+
+
+@receiver(post_save, sender=MarketUser)
+@receiver(post_save, sender=Model)
+def counted_row_created(sender, created, **kwargs):
+    if created:
+        adjust_counter(COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=MarketUser)
+@receiver(post_delete, sender=Model)
+def counted_row_deleted(sender, **kwargs):
+    adjust_counter(COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Listing)
+def listing_created_notify(sender, instance, created, **kwargs):
+    if created:
+        notify_new_listings([instance])
+
+
+@receiver(post_save, sender=SavedSearch)
+@receiver(post_delete, sender=SavedSearch)
+def saved_search_changed(sender, **kwargs):
+    transaction.on_commit(saved_searches_changed)
@@ -0,0 +1,344 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+
+from marketplace.catalog import get_catalog
+from marketplace.models import Listing
+
+logger = logging.getLogger(__name__)
+
+# One unit of distance: a model year, 10% of the price or 10 000 km.
+YEAR_SCALE = 1.0
+PRICE_SCALE = math.log(1.1)
+MILEAGE_SCALE = 10000.0
+# Squared distance added to listings of another model of the same brand;
+# they only fill the block when the model itself has too few listings.
+OTHER_MODEL_PENALTY = 9.0
+LOAD_CHUNK_SIZE = 100000
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similar")
+
+
+def listing_vectors(years, prices, mileages) -> np.ndarray:
+    """
+    Normalized ``(year, log price, mileage)`` vectors, one row per
+    listing, scaled so that each unit is an equally noticeable change.
+    """
+    return np.column_stack([
+        np.asarray(years, dtype=np.float64) / YEAR_SCALE,
+        np.log1p(np.asarray(prices, dtype=np.float64)) / PRICE_SCALE,
+        np.asarray(mileages, dtype=np.float64) / MILEAGE_SCALE,
+    ]).astype(np.float32)
+
+
+def bucket_slices(keys: np.ndarray) -> dict:
+    """
+    Map every value of the sorted ``keys`` to its ``(start, stop)`` run.
+    """
+    if not len(keys):
+        return {}
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate([[0], starts])
+    stops = np.concatenate([starts[1:], [len(keys)]])
+    return {
+        key: (start, stop)
+        for key, start, stop in zip(
+            keys[starts].tolist(), starts.tolist(), stops.tolist()
+        )
+    }
+
+
+class SimilarityIndex:
+    """
+    Listing vectors sorted by brand and car model, so every model is one
+    contiguous bucket inside the contiguous run of its brand. A query
+    scans only the bucket of its model with vectorized distances, and
+    the brand run when the model has too few listings.
+    """
+
+    def __init__(self, ids, brands, models, vectors):
+        order = np.lexsort((ids, models, brands))
+        self.ids = ids[order]
+        self.models = models[order]
+        self.vectors = vectors[order]
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.id_order = np.argsort(self.ids).astype(np.int32)
+        self.model_slices = bucket_slices(self.models)
+        self.brand_slices = bucket_slices(brands[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, queryset=None):
+        if queryset is None:
+            queryset = Listing.objects.all()
+        rows = queryset.order_by().values_list(
+            "id",
+            "car_model__brand_id",
+            "car_model_id",
+            "year",
+            "price",
+            "mileage",
+        )
+        chunks = ([], [], [], [])
+        chunk = []
+        for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == LOAD_CHUNK_SIZE:
+                cls._append_chunk(chunks, chunk)
+                chunk = []
+        cls._append_chunk(chunks, chunk)
+
+        if not chunks[0]:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(empty, empty, empty, listing_vectors([], [], []))
+        return cls(*[np.concatenate(parts) for parts in chunks])
+
+    @staticmethod
+    def _append_chunk(chunks, rows):
+        if not rows:
+            return
+        ids, brands, models, years, prices, mileages = zip(*rows)
+        chunks[0].append(np.array(ids, dtype=np.int64))
+        chunks[1].append(np.array(brands, dtype=np.int64))
+        chunks[2].append(np.array(models, dtype=np.int64))
+        chunks[3].append(listing_vectors(years, prices, mileages))
+
+    def discard(self, listing_id: int) -> None:
+        position = np.searchsorted(self.ids, listing_id, sorter=self.id_order)
+        if position < len(self.ids):
+            row = self.id_order[position]
+            if self.ids[row] == listing_id:
+                self.alive[row] = False
+
+    def _scan(self, start, stop, vector, count, model_id=None):
+        distances = np.square(self.vectors[start:stop] - vector).sum(axis=1)
+        if model_id is not None:
+            distances += OTHER_MODEL_PENALTY * (
+                self.models[start:stop] != model_id
+            )
+        distances[~self.alive[start:stop]] = np.inf
+        if count < len(distances):
+            nearest = np.argpartition(distances, count)[:count]
+        else:
+            nearest = np.arange(len(distances))
+        nearest = nearest[np.isfinite(distances[nearest])]
+        return self.ids[start:stop][nearest], distances[nearest]
+
+    def nearest(self, model_id, vector, count, brand_id=None) -> tuple:
+        """
+        Return the ids and squared distances of up to ``count`` listings
+        of ``model_id`` nearest to ``vector``, unordered. With
+        ``brand_id``, the other models of that brand are searched too.
+        """
+        if brand_id is None:
+            bounds = self.model_slices.get(model_id, (0, 0))
+            return self._scan(*bounds, vector, count)
+        bounds = self.brand_slices.get(brand_id, (0, 0))
+        return self._scan(*bounds, vector, count, model_id)
+
+
+class SimilarListingsEngine:
+    """
+    Nearest-neighbour search over a :class:`SimilarityIndex`.
+
+    Listings saved in this process are applied through signals into a
+    small per-brand delta once their transaction commits; listings saved
+    by other workers appear once the index is rebuilt, after
+    ``SIMILAR_LISTINGS_MAX_DELTA`` local changes or
+    ``SIMILAR_LISTINGS_REBUILD_SECONDS``. Those rebuilds load the new
+    index on a background thread while requests keep using the old one.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.index = None
+        self.delta = {}
+        self.delta_size = 0
+        self.built_at = 0.0
+        self.stale = False
+        self.rebuilding = False
+        # Changes applied while a new index loads, replayed on top of it.
+        self.pending = None
+
+    def rebuild(self) -> None:
+        with self.build_lock:
+            self._load()
+
+    def _load(self) -> None:
+        """
+        Load a new index and swap it in with the changes applied since
+        the load started.
+        """
+        with self.lock:
+            self.pending = []
+            self.stale = False
+        try:
+            index = SimilarityIndex.load()
+        finally:
+            with self.lock:
+                pending, self.pending = self.pending, None
+        with self.lock:
+            self.index = index
+            self.delta = {}
+            self.delta_size = 0
+            self.built_at = time.monotonic()
+            for listing_id, brand_id, row in pending:
+                self._put(listing_id, brand_id, row)
+
+    def rebuild_in_background(self) -> None:
+        close_old_connections()
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Could not rebuild the similar listings index")
+        finally:
+            close_old_connections()
+            with self.lock:
+                self.rebuilding = False
+
+    def invalidate(self) -> None:
+        """
+        Drop the index; the next request loads a new one.
+        """
+        with self.lock:
+            self.index = None
+
+    def expire(self) -> None:
+        """
+        Rebuild the index in the background on the next request.
+        """
+        with self.lock:
+            self.stale = True
+
+    def ensure_fresh(self) -> None:
+        with self.lock:
+            loaded = self.index is not None
+            expired = loaded and not self.rebuilding and (
+                self.stale
+                or self.delta_size > settings.SIMILAR_LISTINGS_MAX_DELTA
+                or time.monotonic() - self.built_at
+                > settings.SIMILAR_LISTINGS_REBUILD_SECONDS
+            )
+            if expired:
+                self.rebuilding = True
+        if expired:
+            if settings.SIMILAR_LISTINGS_ASYNC_REBUILD:
+                executor.submit(self.rebuild_in_background)
+            else:
+                try:
+                    self.rebuild()
+                finally:
+                    with self.lock:
+                        self.rebuilding = False
+        elif not loaded:
+            # Nothing to answer from yet: the first request loads the
+            # index and concurrent ones wait for it.
+            with self.build_lock:
+                if self.index is None:
+                    self._load()
+
+    def _pop_delta(self, listing_id: int) -> None:
+        for rows in self.delta.values():
+            if rows.pop(listing_id, None) is not None:
+                self.delta_size -= 1
+                return
+
+    def _put(self, listing_id: int, brand_id, row) -> None:
+        self.index.discard(listing_id)
+        self._pop_delta(listing_id)
+        if row is not None:
+            self.delta.setdefault(brand_id, {})[listing_id] = row
+            self.delta_size += 1
+
+    def _record(self, listing_id: int, brand_id, row) -> None:
+        if self.pending is not None:
+            self.pending.append((listing_id, brand_id, row))
+        if self.index is not None:
+            self._put(listing_id, brand_id, row)
+
+    def apply(self, listing) -> None:
+        with self.lock:
+            if self.index is None and self.pending is None:
+                return
+            self._record(
+                listing.id,
+                get_catalog().model_brands.get(listing.car_model_id),
+                (
+                    listing.car_model_id,
+                    listing_vectors(
+                        [listing.year], [listing.price], [listing.mileage]
+                    )[0],
+                ),
+            )
+
+    def remove(self, listing_id: int) -> None:
+        with self.lock:
+            if self.index is None and self.pending is None:
+                return
+            self._record(listing_id, None, None)
+
+    def similar(self, listing, count: int) -> list:
+        """
+        Return the ids of the ``count`` listings nearest to ``listing``,
+        nearest first; other models of its brand only fill up a short
+        list.
+        """
+        brand_id = get_catalog().model_brands.get(listing.car_model_id)
+        vector = listing_vectors(
+            [listing.year], [listing.price], [listing.mileage]
+        )[0]
+        while True:
+            self.ensure_fresh()
+            with self.lock:
+                # Invalidated since the check: load the index again.
+                if self.index is not None:
+                    ids, distances = self._nearest(
+                        listing, vector, count, brand_id
+                    )
+                    break
+        keep = ids != listing.id
+        ids, distances = ids[keep], distances[keep]
+        return ids[np.lexsort((ids, distances))][:count].tolist()
+
+    def _nearest(self, listing, vector, count: int, brand_id) -> tuple:
+        # Called with the lock held and an index loaded.
+        ids, distances = self.index.nearest(
+            listing.car_model_id, vector, count + 1
+        )
+        delta = self.delta.get(brand_id, {})
+        same_model = {
+            listing_id: row for listing_id, row in delta.items()
+            if row[0] == listing.car_model_id
+        }
+        if len(ids) + len(same_model) > count:
+            delta = same_model
+        else:
+            # Too few listings of the model: fill up from its brand.
+            ids, distances = self.index.nearest(
+                listing.car_model_id, vector, count + 1, brand_id
+            )
+        if delta:
+            delta_ids = np.fromiter(delta, dtype=np.int64)
+            delta_models = np.array([row[0] for row in delta.values()])
+            delta_vectors = np.array([row[1] for row in delta.values()])
+            ids = np.concatenate([ids, delta_ids])
+            distances = np.concatenate([
+                distances,
+                np.square(delta_vectors - vector).sum(axis=1)
+                + OTHER_MODEL_PENALTY * (
+                    delta_models != listing.car_model_id
+                ),
+            ])
+        return ids, distances
+
+
+engine = SimilarListingsEngine()
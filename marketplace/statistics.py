@@ -0,0 +1,368 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Max, Min, Q
+
+from marketplace.models import Listing, MarketStatistic, MarketUser, Model
+
+PRICE_BUCKET = 500
+MILEAGE_BUCKET = 5000
+REBUILD_CHUNK_SIZE = 100000
+LISTING_DIMENSIONS = (MarketStatistic.MODEL, MarketStatistic.YEAR)
+COLUMNS = (
+    ("price", PRICE_BUCKET),
+    ("mileage", MILEAGE_BUCKET),
+)
+
+
+def listing_row(listing) -> tuple:
+    return (
+        listing.car_model_id,
+        int(listing.year),
+        int(listing.price),
+        int(listing.mileage),
+    )
+
+
+def listing_groups(car_model_id: int, year: int) -> tuple:
+    return (
+        (MarketStatistic.MODEL, car_model_id),
+        (MarketStatistic.YEAR, year),
+    )
+
+
+def group_filter(dimension: str, key: int) -> Q:
+    if dimension == MarketStatistic.MODEL:
+        return Q(car_model_id=key)
+    if dimension == MarketStatistic.YEAR:
+        return Q(year=key)
+    return Q()
+
+
+def add_values(statistic, column: str, width: int, values, sign: int):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) ``values`` of one column.
+
+    Returns True when a removed value was the minimum or maximum, which
+    then has to be looked up again.
+    """
+    histogram = getattr(statistic, f"{column}_histogram")
+    total = 0
+    stale = False
+    low = getattr(statistic, f"{column}_min")
+    high = getattr(statistic, f"{column}_max")
+    for value in values:
+        total += value
+        bucket = str(value // width)
+        remaining = histogram.get(bucket, 0) + sign
+        if remaining > 0:
+            histogram[bucket] = remaining
+        else:
+            histogram.pop(bucket, None)
+        if sign > 0:
+            low = value if low is None else min(low, value)
+            high = value if high is None else max(high, value)
+        elif value in (low, high):
+            stale = True
+    setattr(statistic, f"{column}_sum",
+            getattr(statistic, f"{column}_sum") + sign * total)
+    setattr(statistic, f"{column}_min", low)
+    setattr(statistic, f"{column}_max", high)
+    return stale
+
+
+def refresh_extremes(statistic) -> None:
+    extremes = Listing.objects.filter(
+        group_filter(statistic.dimension, statistic.key)
+    ).aggregate(
+        price_min=Min("price"),
+        price_max=Max("price"),
+        mileage_min=Min("mileage"),
+        mileage_max=Max("mileage"),
+    )
+    for name, value in extremes.items():
+        setattr(statistic, name, value)
+
+
+def apply_listing_changes(added=(), removed=()) -> None:
+    """
+    Fold listing rows (see :func:`listing_row`) into the rollup: the per
+    model and per year rows are updated once per batch.
+
+    The total row only keeps the count and sums, which are added in
+    place, so concurrent saves do not queue up on its lock.
+    """
+    changes = {}
+    totals = [0, 0, 0]
+    for sign, rows in ((1, added), (-1, removed)):
+        for car_model_id, year, price, mileage in rows:
+            totals[0] += sign
+            totals[1] += sign * price
+            totals[2] += sign * mileage
+            for group in listing_groups(car_model_id, year):
+                change = changes.setdefault(
+                    group, {1: ([], []), -1: ([], [])}
+                )
+                change[sign][0].append(price)
+                change[sign][1].append(mileage)
+    if not changes:
+        return
+
+    lookup = Q()
+    for dimension in LISTING_DIMENSIONS:
+        keys = [key for group, key in changes if group == dimension]
+        if keys:
+            lookup |= Q(dimension=dimension, key__in=keys)
+
+    with transaction.atomic():
+        statistics = {
+            (statistic.dimension, statistic.key): statistic
+            for statistic in MarketStatistic.objects.select_for_update()
+            .filter(lookup)
+        }
+        for group, change in changes.items():
+            statistic = statistics.get(group)
+            if statistic is None:
+                statistic = MarketStatistic(dimension=group[0], key=group[1])
+            stale = False
+            for sign, (prices, mileages) in change.items():
+                statistic.count += sign * len(prices)
+                stale |= add_values(
+                    statistic, "price", PRICE_BUCKET, prices, sign
+                )
+                stale |= add_values(
+                    statistic, "mileage", MILEAGE_BUCKET, mileages, sign
+                )
+
+            if statistic.count <= 0:
+                if statistic.pk:
+                    statistic.delete()
+                continue
+            if stale:
+                refresh_extremes(statistic)
+            refresh_percentiles(statistic)
+            statistic.save()
+        if any(totals):
+            adjust_counter(
+                MarketStatistic.TOTAL,
+                totals[0],
+                price_sum=totals[1],
+                mileage_sum=totals[2],
+            )
+
+
+def adjust_counter(dimension: str, delta: int, **sums) -> None:
+    """
+    Add ``delta`` to the count of a counter row, and each of ``sums`` to
+    the column of that name, with a single ``UPDATE``.
+    """
+    changes = {"count": F("count") + delta}
+    for column, value in sums.items():
+        changes[column] = F(column) + value
+    rows = MarketStatistic.objects.filter(dimension=dimension, key=0)
+    with transaction.atomic():
+        if rows.update(**changes):
+            return
+        _, created = MarketStatistic.objects.get_or_create(
+            dimension=dimension,
+            key=0,
+            defaults={"count": max(delta, 0), **sums},
+        )
+        if not created:
+            # Another transaction created it first.
+            rows.update(**changes)
+
+
+def histogram_percentile(
+    histogram: dict, count: int, fraction: float, width: int, low, high
+):
+    """
+    Approximate percentile from a bucket histogram: the middle of the
+    bucket holding the rank, kept within the exact minimum and maximum.
+    """
+    if not count:
+        return None
+    rank = max(1, int(np.ceil(fraction * count)))
+    seen = 0
+    for bucket in sorted(histogram, key=int):
+        seen += histogram[bucket]
+        if seen >= rank:
+            value = int(bucket) * width + width // 2
+            if low is not None:
+                value = max(value, low)
+            if high is not None:
+                value = min(value, high)
+            return value
+    return high
+
+
+def refresh_percentiles(statistic) -> None:
+    for column, width in COLUMNS:
+        arguments = (
+            getattr(statistic, f"{column}_histogram"),
+            statistic.count,
+        )
+        bounds = (
+            width,
+            getattr(statistic, f"{column}_min"),
+            getattr(statistic, f"{column}_max"),
+        )
+        setattr(statistic, f"{column}_median",
+                histogram_percentile(*arguments, 0.5, *bounds))
+        setattr(statistic, f"{column}_p90",
+                histogram_percentile(*arguments, 0.9, *bounds))
+
+
+def summarize(statistic) -> dict:
+    count = statistic.count
+    summary = {"key": statistic.key, "count": count}
+    for column, _ in COLUMNS:
+        total = getattr(statistic, f"{column}_sum")
+        summary[column] = {
+            "min": getattr(statistic, f"{column}_min"),
+            "max": getattr(statistic, f"{column}_max"),
+            "mean": round(total / count) if count else None,
+            "median": getattr(statistic, f"{column}_median"),
+            "p90": getattr(statistic, f"{column}_p90"),
+        }
+    return summary
+
+
+def counter_rows():
+    return MarketStatistic.objects.filter(
+        dimension__in=(
+            MarketStatistic.TOTAL,
+            MarketStatistic.USERS,
+            MarketStatistic.MODELS,
+        ),
+        key=0,
+    ).values_list("dimension", "count")
+
+
+def counters_context(counts: dict) -> dict:
+    return {
+        "num_listings": counts.get(MarketStatistic.TOTAL, 0),
+        "num_users": counts.get(MarketStatistic.USERS, 0),
+        "num_models": counts.get(MarketStatistic.MODELS, 0),
+    }
+
+
+def market_counters() -> dict:
+    """
+    Homepage counters, read from the rollup in a single query.
+    """
+    return counters_context(dict(counter_rows()))
+
+
+async def amarket_counters() -> dict:
+    """
+    Async version of :func:`market_counters`.
+    """
+    return counters_context(
+        {dimension: count async for dimension, count in counter_rows()}
+    )
+
+
+def market_statistics() -> dict:
+    """
+    Per model and per year summaries, read from the rollup in a single
+    query.
+    """
+    result = {MarketStatistic.MODEL: [], MarketStatistic.YEAR: []}
+    statistics = (
+        MarketStatistic.objects.filter(dimension__in=result)
+        .defer("price_histogram", "mileage_histogram")
+        .order_by("dimension", "key")
+    )
+    for statistic in statistics:
+        result[statistic.dimension].append(summarize(statistic))
+    return result
+
+
+def accumulate_chunk(statistics: dict, chunk) -> None:
+    columns = np.array(chunk, dtype=np.int64).T
+    model_ids, years, prices, mileages = columns
+    for dimension, keys in (
+        (MarketStatistic.MODEL, model_ids),
+        (MarketStatistic.YEAR, years),
+    ):
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        unique, starts = np.unique(sorted_keys, return_index=True)
+        ends = np.append(starts[1:], len(sorted_keys))
+        for key, start, end in zip(unique.tolist(), starts, ends):
+            rows = order[start:end]
+            statistic = statistics.setdefault(
+                (dimension, key),
+                MarketStatistic(dimension=dimension, key=key),
+            )
+            statistic.count += len(rows)
+            for column, width, values in (
+                ("price", PRICE_BUCKET, prices[rows]),
+                ("mileage", MILEAGE_BUCKET, mileages[rows]),
+            ):
+                merge_column(statistic, column, width, values)
+
+
+def merge_column(statistic, column: str, width: int, values) -> None:
+    low = int(values.min())
+    high = int(values.max())
+    current_low = getattr(statistic, f"{column}_min")
+    current_high = getattr(statistic, f"{column}_max")
+    setattr(statistic, f"{column}_min",
+            low if current_low is None else min(low, current_low))
+    setattr(statistic, f"{column}_max",
+            high if current_high is None else max(high, current_high))
+    setattr(statistic, f"{column}_sum",
+            getattr(statistic, f"{column}_sum") + int(values.sum()))
+    histogram = getattr(statistic, f"{column}_histogram")
+    buckets, counts = np.unique(values // width, return_counts=True)
+    for bucket, count in zip(buckets.tolist(), counts.tolist()):
+        histogram[str(bucket)] = histogram.get(str(bucket), 0) + count
+
+
+def rebuild_statistics(chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """
+    Recompute the whole rollup from the live tables in one pass over the
+    listings and swap it in atomically. Returns the number of rows.
+    """
+    statistics = {}
+    chunk = []
+    rows = Listing.objects.order_by().values_list(
+        "car_model_id", "year", "price", "mileage"
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            accumulate_chunk(statistics, chunk)
+            chunk = []
+    if chunk:
+        accumulate_chunk(statistics, chunk)
+
+    models = [
+        statistic for (dimension, _), statistic in statistics.items()
+        if dimension == MarketStatistic.MODEL
+    ]
+    statistics[(MarketStatistic.TOTAL, 0)] = MarketStatistic(
+        dimension=MarketStatistic.TOTAL,
+        key=0,
+        count=sum(statistic.count for statistic in models),
+        price_sum=sum(statistic.price_sum for statistic in models),
+        mileage_sum=sum(statistic.mileage_sum for statistic in models),
+    )
+    for dimension, model in (
+        (MarketStatistic.USERS, MarketUser),
+        (MarketStatistic.MODELS, Model),
+    ):
+        statistics[(dimension, 0)] = MarketStatistic(
+            dimension=dimension, key=0, count=model.objects.count()
+        )
+
+    for statistic in statistics.values():
+        refresh_percentiles(statistic)
+
+    with transaction.atomic():
+        MarketStatistic.objects.all().delete()
+        MarketStatistic.objects.bulk_create(
+            statistics.values(), batch_size=1000
+        )
+    return len(statistics)
@@ -0,0 +1,118 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from marketplace.caching import (
+    get_fragments_generation,
+    listing_card_key,
+    similar_listings_key,
+)
+from marketplace.models import Listing
+from marketplace.pricing import get_price_table, price_badge
+from marketplace.similar import engine as similar_engine
+
+register = template.Library()
+
+CARD_TEMPLATE = "includes/listing_card.html"
+SIMILAR_TEMPLATE = "includes/similar_listings.html"
+FAVOURITE_PLACEHOLDER = "<!--favourite-->"
+PRICE_BADGE_PLACEHOLDER = "<!--price-badge-->"
+
+
+def render_listing_cards(listings) -> list:
+    """
+    Return the rendered card of every listing, reading the whole page
+    from the cache with one ``get_many`` and storing the misses with one
+    ``set_many``.
+    """
+    if not settings.LISTING_CARD_CACHE_TIMEOUT:
+        return [
+            render_to_string(CARD_TEMPLATE, {"listing": listing})
+            for listing in listings
+        ]
+    listings = list(listings)
+    generation = get_fragments_generation()
+    keys = [listing_card_key(listing.id, generation) for listing in listings]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    cards = []
+    for key, listing in zip(keys, listings):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(CARD_TEMPLATE, {"listing": listing})
+            missing[key] = card
+        cards.append(card)
+    if missing:
+        cache.set_many(missing, settings.LISTING_CARD_CACHE_TIMEOUT)
+    return cards
+
+
+def favourite_button(request, listing_id: int, is_favourite: bool) -> str:
+    return format_html(
+        '<form method="post" action="{}">'
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">'
+        '<button type="submit" class="btn btn-link p-0 m-0" title="{}">'
+        '<i class="{} fa-heart text-danger"></i></button></form>',
+        reverse(
+            "marketplace:toggle-assign-to-listing", kwargs={"pk": listing_id}
+        ),
+        get_token(request),
+        "Delete from favourites" if is_favourite else "Add to favourites",
+        "fas" if is_favourite else "far",
+    )
+
+
+@register.simple_tag(takes_context=True)
+def listing_cards(context, listings):
+    """
+    Render cached listing cards, filling in the per-user favourite
+    button from ``favourite_ids`` and the deal badge from the in-memory
+    price table outside of the cached markup.
+    """
+    listings = list(listings)
+    cards = render_listing_cards(listings)
+    price_table = get_price_table()
+    request = context.get("request")
+    signed_in = request is not None and request.user.is_authenticated
+    favourite_ids = context.get("favourite_ids", set())
+
+    rendered = []
+    for listing, card in zip(listings, cards):
+        card = card.replace(
+            PRICE_BADGE_PLACEHOLDER, price_badge(price_table, listing)
+        )
+        rendered.append(card.replace(
+            FAVOURITE_PLACEHOLDER,
+            favourite_button(
+                request, listing.id, listing.id in favourite_ids
+            ) if signed_in else "",
+        ))
+    return mark_safe("".join(rendered))
+
+
+@register.simple_tag
+def similar_listings(listing):
+    """
+    Render the listings nearest to ``listing`` from the similar listings
+    index, cached per listing for ``SIMILAR_LISTINGS_CACHE_TIMEOUT``.
+    """
+    key = similar_listings_key(listing.id, get_fragments_generation())
+    block = cache.get(key)
+    if block is None:
+        ids = similar_engine.similar(listing, settings.SIMILAR_LISTINGS_COUNT)
+        rows = Listing.objects.select_related(
+            "car_model__brand", "cover_image"
+        ).in_bulk(ids)
+        listings = [rows[pk] for pk in ids if pk in rows]
+        block = (
+            render_to_string(SIMILAR_TEMPLATE, {"listings": listings})
+            if listings else ""
+        )
+        cache.set(key, block, settings.SIMILAR_LISTINGS_CACHE_TIMEOUT)
+    return mark_safe(block)
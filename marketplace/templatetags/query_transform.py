@@ -1,8 +1,21 @@
+from urllib.parse import urlencode
+
 from django import template
 
 register = template.Library()
 
 
+def canonical_query(query, exclude=()) -> str:
+    items = [
+        (key, value)
+        for key in query
+        if key not in exclude
+        for value in query.getlist(key)
+        if value != ""
+    ]
+    return urlencode(sorted(items))
+
+
 @register.simple_tag
 def query_transform(request, **kwargs):
     updated = request.GET.copy()
@@ -0,0 +1,56 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from marketplace.images import VARIANT_FORMATS
+
+register = template.Library()
+
+
+def build_srcset(field_file, names: dict) -> str:
+    storage = field_file.storage
+    return ", ".join(
+        f"{storage.url(name)} {width}w"
+        for width, name in sorted(
+            names.items(), key=lambda item: int(item[0])
+        )
+    )
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, sizes="100vw", **attrs):
+    """
+    Render ``field_file`` as a ``<picture>`` with a ``srcset`` per
+    generated format, or as a plain ``<img>`` of the original upload
+    until its variants exist.
+    """
+    if not field_file:
+        return ""
+    attributes = format_html_join(
+        " ", '{}="{}"', [
+            (name.replace("_", "-"), value) for name, value in attrs.items()
+        ]
+    )
+    if not variants or variants.get("source") != field_file.name:
+        return format_html(
+            '<img src="{}" {}>', field_file.url, attributes
+        )
+
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        [
+            (mime_type, build_srcset(field_file, variants[extension]), sizes)
+            for extension, (_, mime_type) in VARIANT_FORMATS.items()
+            if extension != "jpeg" and variants.get(extension)
+        ],
+    )
+    fallback = variants.get("jpeg") or {}
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" '
+        'loading="lazy" {}></picture>',
+        sources,
+        field_file.url,
+        build_srcset(field_file, fallback),
+        sizes,
+        attributes,
+    )
@@ -0,0 +1,13 @@
+from django.urls import include, path
+
+from marketplace.urls import async_urlpatterns
+from marketplace.urls import urlpatterns as marketplace_urlpatterns
+
+# The project URLs with the async views enabled, as under ASGI.
+urlpatterns = [
+    path(
+        "",
+        include((async_urlpatterns + marketplace_urlpatterns, "marketplace")),
+    ),
+    path("accounts/", include("django.contrib.auth.urls")),
+]
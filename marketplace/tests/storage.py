@@ -0,0 +1,34 @@
+import threading
+import time
+
+from django.core.files.storage import InMemoryStorage
+
+
+class SlowInMemoryStorage(InMemoryStorage):
+    """
+    In-memory storage that sleeps on every save to stand in for the
+    round trip to S3, and records how many saves ran at the same time.
+    """
+
+    latency = 0.2
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.active = 0
+            cls.max_active = 0
+
+    def _save(self, name, content):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(self.latency)
+            return super()._save(name, content)
+        finally:
+            with cls.lock:
+                cls.active -= 1
@@ -0,0 +1,349 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.alerts import (
+    NO_HIGH,
+    NO_LOW,
+    IntervalTree,
+    get_search_index,
+    keyword_set,
+    search_index_cache,
+)
+from marketplace.benchmarks.dataset import (
+    generate_dataset,
+    generate_saved_searches,
+)
+from marketplace.importing import import_listings
+from marketplace.models import (
+    Brand,
+    Listing,
+    MarketUser,
+    Model,
+    Notification,
+    SavedSearch,
+)
+
+
+class IntervalTreeTests(TestCase):
+    def test_stab_matches_a_linear_scan(self):
+        rng = np.random.default_rng(0)
+        lows = rng.integers(0, 1000, 500)
+        highs = lows + rng.integers(0, 100, 500)
+        lows[:20] = NO_LOW
+        highs[20:40] = NO_HIGH
+        tree = IntervalTree(lows, highs, np.arange(500))
+        points = np.concatenate([
+            rng.integers(-50, 1150, 200), lows[40:60], highs[60:80]
+        ])
+
+        found_points, found_items = tree.stab(points)
+
+        inside = (lows <= points[:, None]) & (points[:, None] <= highs)
+        expected = set(zip(*(axis.tolist() for axis in np.nonzero(inside))))
+        self.assertEqual(
+            set(zip(found_points.tolist(), found_items.tolist())), expected
+        )
+        self.assertEqual(len(found_points), len(expected))
+        for position in (0, 1, 200):
+            self.assertEqual(
+                sorted(tree.stab_point(points[position]).tolist()),
+                np.flatnonzero(inside[position]).tolist(),
+            )
+
+    def test_empty_tree(self):
+        tree = IntervalTree([], [], [])
+
+        self.assertEqual(len(tree.stab(np.array([1, 2]))[0]), 0)
+        self.assertEqual(len(tree.stab_point(1)), 0)
+
+
+class SavedSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        search_index_cache.invalidate()
+        self.seller = MarketUser.objects.create_user(
+            username="seller", password="pass12345", phone_number="+1"
+        )
+        self.buyer = MarketUser.objects.create_user(
+            username="buyer", password="pass12345", phone_number="+2"
+        )
+        self.toyota = Brand.objects.create(name="Toyota")
+        self.corolla = Model.objects.create(brand=self.toyota, name="Corolla")
+        self.yaris = Model.objects.create(brand=self.toyota, name="Yaris")
+
+    def create_listing(self, price=10000, year=2015, mileage=100000,
+                       model=None, seller=None, description="Test"):
+        return Listing.objects.create(
+            seller=seller or self.seller,
+            car_model=model or self.corolla,
+            year=year,
+            price=price,
+            mileage=mileage,
+            description=description,
+        )
+
+    def notified(self, user=None) -> set:
+        return set(
+            Notification.objects.filter(
+                user=user or self.buyer
+            ).values_list("saved_search_id", "listing_id")
+        )
+
+    def test_new_listings_notify_matching_searches(self):
+        corolla = SavedSearch.objects.create(
+            user=self.buyer, car_model=self.corolla, price_end=12000
+        )
+        toyota = SavedSearch.objects.create(
+            user=self.buyer, brand=self.toyota, year_start=2018
+        )
+        anything = SavedSearch.objects.create(
+            user=self.buyer, keywords="Leather seats"
+        )
+        own = SavedSearch.objects.create(user=self.seller, price_end=50000)
+
+        cheap = self.create_listing(price=9000)
+        new_yaris = self.create_listing(
+            price=20000, year=2020, model=self.yaris,
+            description="Heated leather seats",
+        )
+        self.create_listing(price=15000, year=2016)
+
+        self.assertEqual(
+            self.notified(),
+            {
+                (corolla.id, cheap.id),
+                (toyota.id, new_yaris.id),
+                (anything.id, new_yaris.id),
+            },
+        )
+        self.assertFalse(self.notified(self.seller))
+        self.assertFalse(own.notifications.exists())
+
+    def test_editing_a_listing_does_not_notify_again(self):
+        SavedSearch.objects.create(user=self.buyer, car_model=self.corolla)
+        listing = self.create_listing()
+
+        listing.price = 9000
+        listing.save()
+
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_searches_deleted_by_another_worker_are_skipped(self):
+        search = SavedSearch.objects.create(
+            user=self.buyer, car_model=self.corolla
+        )
+        get_search_index()
+        # Without the commit callback, as if the deletion happened in
+        # another process.
+        with self.captureOnCommitCallbacks():
+            search.delete()
+
+        self.create_listing()
+
+        self.assertFalse(Notification.objects.exists())
+
+    def test_new_searches_do_not_reload_the_index(self):
+        main = get_search_index().main
+        with self.captureOnCommitCallbacks(execute=True):
+            search = SavedSearch.objects.create(
+                user=self.buyer, car_model=self.corolla
+            )
+
+        listing = self.create_listing()
+
+        self.assertEqual(self.notified(), {(search.id, listing.id)})
+        self.assertIs(get_search_index().main, main)
+
+    @override_settings(SAVED_SEARCH_CHECK_SECONDS=0)
+    def test_searches_of_other_workers_are_read_on_the_next_check(self):
+        get_search_index()
+        with self.captureOnCommitCallbacks():
+            search = SavedSearch.objects.create(
+                user=self.buyer, car_model=self.corolla
+            )
+
+        listing = self.create_listing()
+
+        self.assertEqual(self.notified(), {(search.id, listing.id)})
+
+    @override_settings(SAVED_SEARCH_CHECK_SECONDS=0)
+    def test_old_index_is_reloaded_in_the_background(self):
+        get_search_index()
+        search_index_cache.built_at = 0.0
+
+        with mock.patch("marketplace.alerts.executor") as executor:
+            get_search_index()
+            get_search_index()
+        search_index_cache.rebuilding = False
+
+        executor.submit.assert_called_once_with(
+            search_index_cache.rebuild_in_background
+        )
+
+    def test_index_matches_a_linear_scan(self):
+        generate_dataset(
+            300, brands=3, models_per_brand=3, users=20, seed=1
+        )
+        generate_saved_searches(500, seed=1)
+        listings = list(Listing.objects.all())
+        brands = dict(Model.objects.values_list("id", "brand_id"))
+
+        positions, search_ids, user_ids = get_search_index().match(listings)
+
+        expected = set()
+        for search in SavedSearch.objects.all():
+            words = keyword_set(search.keywords)
+            for position, listing in enumerate(listings):
+                if (
+                    search.car_model_id not in (None, listing.car_model_id)
+                    or search.brand_id not in (
+                        None, brands[listing.car_model_id]
+                    )
+                    or search.user_id == listing.seller_id
+                    or not words <= keyword_set(listing.description)
+                ):
+                    continue
+                if all(
+                    (low is None or low <= value)
+                    and (high is None or value <= high)
+                    for low, high, value in (
+                        (search.year_start, search.year_end, listing.year),
+                        (search.price_start, search.price_end,
+                         listing.price),
+                        (search.mileage_start, search.mileage_end,
+                         listing.mileage),
+                    )
+                ):
+                    expected.add((position, search.id, search.user_id))
+        self.assertTrue(expected)
+        self.assertEqual(
+            set(zip(
+                positions.tolist(), search_ids.tolist(), user_ids.tolist()
+            )),
+            expected,
+        )
+        self.assertEqual(len(positions), len(expected))
+
+    def test_imports_notify_in_batches(self):
+        search = SavedSearch.objects.create(
+            user=self.buyer, car_model=self.corolla, mileage_end=50000
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "feed.csv")
+            with open(path, "w", encoding="utf-8") as source:
+                source.write(
+                    "brand,model,year,price,mileage,description,seller\n"
+                    + "".join(
+                        f"Toyota,Corolla,2018,{9000 + number},"
+                        f"{number * 10000},Clean,seller\n"
+                        for number in range(10)
+                    )
+                )
+
+            import_listings(path, batch_size=3)
+
+        self.assertEqual(
+            sorted(Listing.objects.filter(
+                id__in=search.notifications.values("listing_id")
+            ).values_list("mileage", flat=True)),
+            [0, 10000, 20000, 30000, 40000, 50000],
+        )
+
+    def test_save_search_from_the_listing_page(self):
+        self.client.force_login(self.buyer)
+        params = {"brand": self.toyota.id, "price_end": 15000, "page": 1}
+
+        response = self.client.get(
+            reverse("marketplace:listings-list"), params
+        )
+        self.assertContains(response, "Notify me about new matching cars")
+        self.assertContains(response, 'name="price_end" value="15000"')
+        self.assertNotContains(response, 'name="page"')
+
+        response = self.client.post(
+            reverse("marketplace:saved-search-create"), params
+        )
+        self.assertRedirects(response, reverse("marketplace:saved-searches"))
+        search = SavedSearch.objects.get(user=self.buyer)
+        self.assertEqual(search.brand, self.toyota)
+        self.assertEqual(search.price_end, 15000)
+        self.assertIsNone(search.year_start)
+        self.assertEqual(
+            search.query_string(), f"brand={self.toyota.id}&price_end=15000"
+        )
+
+        # The new search is matched from the next listing on.
+        listing = self.create_listing(model=self.yaris)
+        self.assertEqual(self.notified(), {(search.id, listing.id)})
+
+    def test_save_search_requires_a_filter(self):
+        self.client.force_login(self.buyer)
+
+        response = self.client.post(
+            reverse("marketplace:saved-search-create"), {"page": 2}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SavedSearch.objects.exists())
+
+    def test_anonymous_visitors_cannot_save_searches(self):
+        response = self.client.get(reverse("marketplace:listings-list"))
+
+        self.assertNotContains(response, "Notify me about new matching cars")
+
+    def test_saved_searches_page_marks_notifications_seen(self):
+        search = SavedSearch.objects.create(
+            user=self.buyer, car_model=self.corolla
+        )
+        listing = self.create_listing(price=12345)
+        self.client.force_login(self.buyer)
+        url = reverse("marketplace:saved-searches")
+
+        response = self.client.get(url)
+
+        self.assertContains(response, "12 345")
+        self.assertContains(response, ">New<")
+        self.assertContains(response, f"?model={self.corolla.id}")
+        self.assertEqual(response.context["saved_searches"][0], search)
+        self.assertTrue(
+            Notification.objects.get(listing=listing).seen
+        )
+        self.assertNotContains(self.client.get(url), ">New<")
+
+    def test_delete_saved_search(self):
+        search = SavedSearch.objects.create(
+            user=self.buyer, car_model=self.corolla
+        )
+        url = reverse(
+            "marketplace:saved-search-delete", kwargs={"pk": search.pk}
+        )
+
+        self.client.force_login(self.seller)
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.post(url)
+
+        self.assertFalse(SavedSearch.objects.exists())
+        self.create_listing()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_benchmark_command(self):
+        for number in range(5):
+            self.create_listing(price=9000 + number)
+        out = StringIO()
+
+        call_command(
+            "benchmark_saved_searches", generate=50, listings=5, stdout=out
+        )
+
+        self.assertIn("Index of 50 saved searches", out.getvalue())
+        self.assertIn("Batch of", out.getvalue())
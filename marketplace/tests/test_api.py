@@ -0,0 +1,85 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from marketplace.models import Brand, Image, Listing, MarketUser, Model
+from marketplace.tests.utils import QueryBudgetMixin
+
+API_URL = reverse("marketplace:api-listing-list")
+
+
+class ListingApiTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        seller = MarketUser.objects.create(
+            username="test_username", password="test$23456789"
+        )
+        brand = Brand.objects.create(name="test_brand")
+        self.model = Model.objects.create(brand=brand, name="test_model")
+        other_model = Model.objects.create(brand=brand, name="other_model")
+        self.listings = [
+            Listing.objects.create(
+                seller=seller,
+                car_model=self.model if number % 2 else other_model,
+                year=2010 + number,
+                price=10000 + number,
+                mileage=50000,
+                description=f"test_description_{number}",
+            )
+            for number in range(5)
+        ]
+        Image.objects.create(listing=self.listings[1], image="photo.jpg")
+
+    def test_filters_and_sparse_fields(self):
+        response = self.client.get(
+            API_URL, {"model": self.model.id, "fields": "id,price,model"}
+        )
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": listing.id, "price": listing.price,
+                 "model": "test_model"}
+                for listing in (self.listings[3], self.listings[1])
+            ],
+        )
+
+    def test_cursor_pagination_walks_every_listing(self):
+        ids = []
+        url = f"{API_URL}?limit=2&fields=id"
+        pages = 0
+        while url:
+            with self.assertMaxQueries(1):
+                data = self.client.get(url).json()
+            ids.extend(row["id"] for row in data["results"])
+            url = data["next"]
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            ids, [listing.id for listing in reversed(self.listings)]
+        )
+
+    def test_rejects_bad_parameters(self):
+        for params in ({"fields": "id,secret"}, {"brand": "abc"},
+                       {"cursor": "garbage"}, {"limit": "x"}):
+            response = self.client.get(API_URL, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+    def test_detail_includes_cover_image_url(self):
+        listing = self.listings[1]
+        url = reverse(
+            "marketplace:api-listing-detail", kwargs={"pk": listing.id}
+        )
+
+        data = self.client.get(url).json()
+
+        self.assertEqual(data["id"], listing.id)
+        self.assertEqual(data["brand"], "test_brand")
+        self.assertTrue(data["cover_image"].endswith("photo.jpg"))
+        self.assertEqual(data["created_at"][:4], str(listing.created_at.year))
+
+    def test_detail_not_found(self):
+        url = reverse("marketplace:api-listing-detail", kwargs={"pk": 0})
+
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,257 @@
+import asyncio
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (
+    AsyncClient,
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from marketplace.catalog import catalog_cache
+from marketplace.models import Brand, Listing, MarketUser, Model
+from marketplace.similar import engine as similar_engine
+from used_car_marketplace.asgi import with_static_files
+
+ASYNC_URLCONF = "marketplace.tests.async_urls"
+
+
+def create_listings(count: int) -> tuple:
+    user = MarketUser.objects.create_user(
+        username="test_username", password="test$23456789"
+    )
+    toyota = Brand.objects.create(name="Toyota")
+    corolla = Model.objects.create(brand=toyota, name="Corolla")
+    yaris = Model.objects.create(brand=toyota, name="Yaris")
+    listings = [
+        Listing.objects.create(
+            seller=user,
+            car_model=corolla if number % 2 else yaris,
+            year=2010 + number,
+            price=10000 + number * 1000,
+            mileage=100000 - number * 5000,
+            description=f"description_{number}",
+        )
+        for number in range(count)
+    ]
+    return user, toyota, listings
+
+
+def page_summary(response) -> dict:
+    return {
+        "listings": [listing.id for listing in response.context["listings"]],
+        "count": response.context["paginator"].count,
+        "facets": response.context["facets"],
+        "favourite_ids": response.context["favourite_ids"],
+    }
+
+
+class StaticFilesTests(SimpleTestCase):
+    async def get(self, application, path):
+        communicator = ApplicationCommunicator(application, {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [],
+        })
+        await communicator.send_input({"type": "http.request"})
+        start = await communicator.receive_output()
+        await communicator.wait()
+        return start
+
+    @override_settings(WHITENOISE_USE_FINDERS=True)
+    async def test_static_files_are_served_by_whitenoise(self):
+        paths = []
+
+        async def application(scope, receive, send):
+            paths.append(scope["path"])
+            await send({"type": "http.response.start", "status": 204})
+            await send({"type": "http.response.body"})
+
+        application = with_static_files(application)
+
+        start = await self.get(application, "/static/css/nucleo-icons.css")
+        self.assertEqual(start["status"], 200)
+        self.assertIn(
+            (b"cache-control", b"max-age=60, public"), start["headers"]
+        )
+        start = await self.get(application, "/static/missing.css")
+        self.assertEqual(start["status"], 404)
+        start = await self.get(application, "/listings/")
+        self.assertEqual(start["status"], 204)
+        self.assertEqual(paths, ["/listings/"])
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF, ASYNC_QUERY_WORKERS=0)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.invalidate()
+        similar_engine.invalidate()
+        self.user, self.toyota, self.listings = create_listings(8)
+        self.user.favourite_listings.add(self.listings[-1])
+        self.async_client.force_login(self.user)
+        self.anonymous_client = AsyncClient()
+
+    def detail_url(self, listing) -> str:
+        return reverse("marketplace:listing-detail", kwargs={"pk": listing.pk})
+
+    def toggle_url(self, listing) -> str:
+        return reverse(
+            "marketplace:toggle-assign-to-listing", kwargs={"pk": listing.pk}
+        )
+
+    def test_views_are_async(self):
+        for url in (
+            reverse("marketplace:index"),
+            reverse("marketplace:listings-list"),
+            self.detail_url(self.listings[0]),
+            self.toggle_url(self.listings[0]),
+        ):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func))
+
+    async def test_index_is_cached_for_anonymous_visitors(self):
+        url = reverse("marketplace:index")
+
+        first = await self.anonymous_client.get(url)
+        second = await self.anonymous_client.get(url)
+
+        self.assertEqual(first.context["num_listings"], 8)
+        self.assertIn("search_form", first.context)
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.content, second.content)
+
+    async def test_listing_list_matches_the_sync_view(self):
+        url = reverse("marketplace:listings-list")
+        self.assertContains(
+            await self.async_client.get(url), "fas fa-heart", count=1
+        )
+        for params in (
+            {},
+            {"page": 2},
+            {"brand": self.toyota.id, "price_end": 15000},
+        ):
+            response = await self.async_client.get(url, params)
+            with override_settings(ROOT_URLCONF="used_car_marketplace.urls"):
+                await sync_to_async(self.client.force_login)(self.user)
+                expected = await sync_to_async(self.client.get)(url, params)
+
+            self.assertEqual(page_summary(response), page_summary(expected))
+            self.assertEqual(
+                response.context["saved_search_params"],
+                expected.context["saved_search_params"],
+            )
+
+    async def test_anonymous_listing_list_is_cached(self):
+        url = reverse("marketplace:listings-list")
+
+        first = await self.anonymous_client.get(url, {"page": 2})
+        second = await self.anonymous_client.get(url, {"page": 2})
+
+        self.assertEqual(len(first.context["listings"]), 3)
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertNotContains(first, "fa-heart")
+
+    async def test_listing_detail(self):
+        favourite = self.listings[-1]
+
+        response = await self.async_client.get(self.detail_url(favourite))
+        self.assertContains(response, "Delete from favourites")
+        self.assertTrue(response.context["is_author"])
+
+        # Served from the detail cache, with the flag of this user.
+        response = await self.anonymous_client.get(self.detail_url(favourite))
+        self.assertNotContains(response, "Delete from favourites")
+        self.assertEqual(response.context["object"], favourite)
+        response = await self.async_client.get(
+            self.detail_url(self.listings[0])
+        )
+        self.assertContains(response, "Add to favourites")
+
+    async def test_listing_detail_not_found(self):
+        response = await self.async_client.get(
+            reverse("marketplace:listing-detail", kwargs={"pk": 0})
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_toggle_adds_and_removes(self):
+        listing = self.listings[0]
+        url = self.detail_url(listing)
+
+        response = await self.async_client.post(self.toggle_url(listing))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertContains(
+            await self.async_client.get(url), "Delete from favourites"
+        )
+
+        await self.async_client.post(self.toggle_url(listing))
+        self.assertContains(
+            await self.async_client.get(url), "Add to favourites"
+        )
+
+    async def test_toggle_checks_the_request(self):
+        listing = self.listings[0]
+
+        response = await self.anonymous_client.post(self.toggle_url(listing))
+        self.assertRedirects(
+            response,
+            f"/accounts/login/?next={self.toggle_url(listing)}",
+            fetch_redirect_response=False,
+        )
+        response = await self.async_client.get(self.toggle_url(listing))
+        self.assertEqual(response.status_code, 405)
+        response = await self.async_client.post(
+            reverse("marketplace:toggle-assign-to-listing", kwargs={"pk": 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF, ASYNC_QUERY_WORKERS=2)
+class AsyncQueryWorkerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.invalidate()
+        similar_engine.invalidate()
+        self.user, self.toyota, self.listings = create_listings(8)
+
+    async def test_pages_load_on_query_threads(self):
+        url = reverse("marketplace:listings-list")
+
+        response = await self.async_client.get(url, {"brand": self.toyota.id})
+
+        self.assertEqual(response.context["paginator"].count, 8)
+        self.assertEqual(
+            [brand["count"] for brand in response.context["facets"]["brands"]],
+            [8],
+        )
+        response = await self.async_client.get(
+            reverse("marketplace:index"), {"brand": self.toyota.id}
+        )
+        self.assertEqual(response.context["num_listings"], 8)
+
+
+class BenchmarkHttpTests(LiveServerTestCase):
+    def test_benchmark_command(self):
+        cache.clear()
+        create_listings(3)
+        out = StringIO()
+
+        call_command(
+            "benchmark_http", self.live_server_url, requests=20,
+            concurrency=4, stdout=out,
+        )
+
+        self.assertIn("20 requests, 4 at a time", out.getvalue())
+        self.assertIn("errors 0", out.getvalue())
@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.benchmarks.suite import compare_results
+from marketplace.favourites import Favourite
+from marketplace.models import Image, Listing
+
+
+class GenerateDatasetTests(TestCase):
+    def test_generates_images_covers_and_favourites(self):
+        dataset = generate_dataset(
+            40,
+            brands=2,
+            models_per_brand=2,
+            users=5,
+            images_per_listing=1,
+            favourites_per_user=3,
+        )
+
+        self.assertEqual(Image.objects.count(), dataset["images"])
+        self.assertEqual(Favourite.objects.count(), dataset["favourites"])
+        self.assertGreater(dataset["images"], 0)
+        self.assertGreater(dataset["favourites"], 0)
+        self.assertFalse(
+            Listing.objects.filter(
+                images__isnull=False, cover_image__isnull=True
+            ).exists()
+        )
+
+    def test_is_deterministic(self):
+        first = generate_dataset(20, brands=1, models_per_brand=2, users=3)
+        prices = list(
+            Listing.objects.order_by("id").values_list("price", flat=True)
+        )
+        Listing.objects.all().delete()
+
+        generate_dataset(
+            20, brands=1, models_per_brand=2, users=3, prefix="again"
+        )
+
+        self.assertEqual(first["listings"], 20)
+        self.assertEqual(
+            list(
+                Listing.objects.order_by("id")
+                .values_list("price", flat=True)
+            ),
+            prices,
+        )
+
+
+class RunBenchmarkSuiteCommandTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, "results.json")
+
+    def test_reports_every_scenario_and_writes_results(self):
+        generate_dataset(
+            30,
+            brands=2,
+            models_per_brand=2,
+            users=3,
+            images_per_listing=1,
+            favourites_per_user=2,
+        )
+        out = StringIO()
+
+        call_command(
+            "run_benchmark_suite", iterations=2, output=self.output,
+            stdout=out,
+        )
+
+        with open(self.output, encoding="utf-8") as source:
+            results = json.load(source)
+        self.assertEqual(results["listings"], 30)
+        for name in (
+            "index",
+            "listings_brand",
+            "listings_deep_page",
+            "listings_deep_cursor",
+            "detail",
+            "favourites",
+            "sale",
+        ):
+            self.assertIn(name, out.getvalue())
+            self.assertEqual(
+                set(results["scenarios"][name]),
+                {"p50_ms", "p95_ms", "queries", "peak_memory_kib"},
+            )
+
+        call_command(
+            "run_benchmark_suite",
+            iterations=2,
+            scenario=["detail"],
+            baseline=self.output,
+            tolerance=1000,
+            stdout=out,
+        )
+        self.assertIn("No regressions.", out.getvalue())
+
+    def test_requires_data(self):
+        with self.assertRaisesMessage(CommandError, "Use --generate"):
+            call_command("run_benchmark_suite", stdout=StringIO())
+
+
+class CompareResultsTests(TestCase):
+    def test_flags_slower_p95_and_extra_queries(self):
+        baseline = {
+            "scenarios": {
+                "index": {"p95_ms": 10.0, "queries": 3},
+                "detail": {"p95_ms": 5.0, "queries": 2},
+            }
+        }
+        results = {
+            "scenarios": {
+                "index": {"p95_ms": 11.0, "queries": 3},
+                "detail": {"p95_ms": 7.0, "queries": 3},
+                "sale": {"p95_ms": 100.0, "queries": 9},
+            }
+        }
+
+        regressions = compare_results(results, baseline, tolerance=0.2)
+
+        self.assertEqual(
+            regressions,
+            [
+                "detail: p95 7.00 ms, baseline 5.00 ms",
+                "detail: 3 queries, baseline 2",
+            ],
+        )
@@ -0,0 +1,197 @@
+import pickle
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.caching import get_fragments_generation, listing_detail_key
+from marketplace.models import Brand, Image, Listing, MarketUser, Model
+from marketplace.templatetags.listing_cards import render_listing_cards
+
+LISTINGS_URL = reverse("marketplace:listings-list")
+CARD_TEMPLATE = "includes/listing_card.html"
+
+
+@override_settings(LISTING_CARD_CACHE_TIMEOUT=3600)
+class ListingCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller = MarketUser.objects.create(
+            username="test_username", password="test$23456789"
+        )
+        brand = Brand.objects.create(name="test_brand")
+        self.model = Model.objects.create(brand=brand, name="test_model")
+        self.listings = [
+            Listing.objects.create(
+                seller=seller,
+                car_model=self.model,
+                year=2020,
+                price=15000 + number,
+                mileage=50000,
+                description=f"test_description_{number}",
+            )
+            for number in range(3)
+        ]
+
+    def test_second_request_uses_cached_cards(self):
+        response = self.client.get(LISTINGS_URL)
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, "test_description_2")
+
+        response = self.client.get(LISTINGS_URL)
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, "test_description_2")
+
+    def test_page_is_read_with_one_cache_round_trip(self):
+        render_listing_cards(self.listings)
+
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get:
+            cards = render_listing_cards(self.listings)
+
+        get.assert_called_once()
+        self.assertEqual(len(cards), 3)
+        self.assertIn("test_description_0", cards[0])
+
+    def test_listing_save_invalidates_its_card(self):
+        self.client.get(LISTINGS_URL)
+        listing = self.listings[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.price = 99999
+            listing.save()
+
+        response = self.client.get(LISTINGS_URL)
+
+        self.assertContains(response, "99 999")
+
+    def test_model_rename_invalidates_every_card(self):
+        self.client.get(LISTINGS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.model.name = "renamed_model"
+            self.model.save()
+
+        response = self.client.get(LISTINGS_URL)
+
+        self.assertContains(response, "test_brand renamed_model 2020", count=3)
+
+    def test_image_delete_invalidates_card(self):
+        image = Image.objects.create(listing=self.listings[0], image="a.jpg")
+        response = self.client.get(LISTINGS_URL)
+        self.assertContains(response, "a.jpg")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        response = self.client.get(LISTINGS_URL)
+
+        self.assertNotContains(response, "a.jpg")
+
+    def test_invalidation_waits_for_the_commit(self):
+        render_listing_cards(self.listings)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.listings[0].description = "changed"
+            self.listings[0].save()
+            # A request before the commit still sees the old card.
+            self.assertIn(
+                "test_description_0", render_listing_cards(self.listings)[0]
+            )
+        for callback in callbacks:
+            callback()
+
+        self.assertIn("changed", render_listing_cards(self.listings)[0])
+
+    @override_settings(LISTING_CARD_CACHE_TIMEOUT=0)
+    def test_cards_are_not_cached_without_a_shared_cache(self):
+        with mock.patch.object(cache, "get_many") as get:
+            cards = render_listing_cards(self.listings)
+
+        get.assert_not_called()
+        self.assertIn("test_description_0", cards[0])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_deploy_check_warns_about_a_local_cache(self):
+        messages = run_checks(include_deployment_checks=True)
+
+        self.assertIn("marketplace.W001", [message.id for message in messages])
+
+
+@override_settings(LISTING_DETAIL_CACHE_TIMEOUT=3600)
+class ListingDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = MarketUser.objects.create_user(
+            username="test_username",
+            password="test$23456789",
+            first_name="Seller",
+        )
+        brand = Brand.objects.create(name="test_brand")
+        self.model = Model.objects.create(brand=brand, name="test_model")
+        self.listing = Listing.objects.create(
+            seller=self.seller,
+            car_model=self.model,
+            year=2020,
+            price=15000,
+            mileage=50000,
+            description="test_description",
+        )
+        self.url = reverse(
+            "marketplace:listing-detail", kwargs={"pk": self.listing.pk}
+        )
+
+    def test_detail_is_served_from_cache(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertContains(response, "test_brand test_model 2020")
+
+    def test_edits_invalidate_detail(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.price = 99999
+            self.listing.save()
+        self.assertContains(self.client.get(self.url), "99 999")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Image.objects.create(listing=self.listing, image="b.jpg")
+        self.assertContains(self.client.get(self.url), "b.jpg", count=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.first_name = "Renamed"
+            self.seller.save()
+        self.assertContains(self.client.get(self.url), "Renamed")
+
+    def test_cache_entry_has_no_seller_credentials(self):
+        self.seller.email = "seller@example.com"
+        self.seller.save()
+        self.client.get(self.url)
+
+        listing = cache.get(
+            listing_detail_key(self.listing.pk, get_fragments_generation())
+        )
+
+        self.assertEqual(listing.seller.first_name, "Seller")
+        self.assertLessEqual(
+            {"password", "email", "last_login"},
+            listing.seller.get_deferred_fields(),
+        )
+        entry = pickle.dumps(listing)
+        self.assertNotIn(self.seller.password.encode(), entry)
+        self.assertNotIn(b"seller@example.com", entry)
+
+    def test_favourite_flag_is_not_shared(self):
+        fan = MarketUser.objects.create_user(
+            username="fan", password="test$23456789"
+        )
+        fan.favourite_listings.add(self.listing)
+
+        self.client.force_login(fan)
+        self.assertContains(
+            self.client.get(self.url), "Delete from favourites"
+        )
+
+        self.client.force_login(self.seller)
+        self.assertContains(self.client.get(self.url), "Add to favourites")
@@ -0,0 +1,138 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.caching import bump_catalog_version, get_catalog_version
+from marketplace.catalog import catalog_cache, get_catalog
+from marketplace.forms import ListingForm, SearchForm
+from marketplace.models import Brand, Model
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(name="test_brand")
+        self.model = Model.objects.create(brand=self.brand, name="test_model")
+
+    def test_forms_render_without_catalog_queries(self):
+        get_catalog()
+
+        with self.assertNumQueries(0):
+            search_html = SearchForm().as_p()
+            listing_html = ListingForm().as_p()
+
+        self.assertIn(
+            f'<option value="{self.brand.id}">test_brand</option>',
+            search_html,
+        )
+        self.assertIn("test_brand test_model", listing_html)
+
+    def test_selected_value_is_rendered(self):
+        form = SearchForm({"model": str(self.model.id)})
+
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["model"], self.model)
+        self.assertIn(
+            f'<option value="{self.model.id}" selected>',
+            str(form["model"]),
+        )
+
+    def test_local_changes_invalidate_immediately(self):
+        get_catalog()
+        self.model.name = "renamed_model"
+        self.model.save()
+
+        self.assertIn(
+            "test_brand renamed_model", str(ListingForm()["car_model"])
+        )
+
+    @override_settings(CATALOG_CHECK_SECONDS=60)
+    def test_other_workers_notice_version_bump(self):
+        get_catalog()
+        Model.objects.filter(pk=self.model.pk).update(name="renamed_model")
+        bump_catalog_version()
+
+        self.assertIn("test_model", str(ListingForm()["car_model"]))
+
+        catalog_cache.checked_at = 0.0
+        self.assertIn("renamed_model", str(ListingForm()["car_model"]))
+
+    def test_version_is_bumped_after_the_commit(self):
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.model.name = "renamed_model"
+            self.model.save()
+            self.assertEqual(get_catalog_version(), version)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(get_catalog_version(), version)
+
+
+class BrandModelsEndpointTests(TestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(name="test_brand")
+        self.other_brand = Brand.objects.create(name="other_brand")
+        self.model = Model.objects.create(brand=self.brand, name="test_model")
+        Model.objects.create(brand=self.other_brand, name="other_model")
+        self.url = reverse(
+            "marketplace:brand-models", kwargs={"pk": self.brand.pk}
+        )
+
+    def test_returns_models_of_brand(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.json(),
+            {
+                "brand": self.brand.pk,
+                "models": [
+                    {"id": self.model.pk, "name": "test_brand test_model"}
+                ],
+            },
+        )
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=", response["Cache-Control"])
+
+    def test_etag_revalidation(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Model.objects.create(brand=self.brand, name="new_model")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["models"]), 2)
+
+    def test_etag_depends_on_the_models_only(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        # As in a restarted worker whose catalog version starts over.
+        catalog_cache.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            Model.objects.create(brand=self.other_brand, name="new_model")
+        self.assertEqual(self.client.get(self.url)["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.model.name = "renamed_model"
+            self.model.save()
+        self.assertNotEqual(self.client.get(self.url)["ETag"], etag)
+
+    def test_unknown_brand(self):
+        url = reverse("marketplace:brand-models", kwargs={"pk": 0})
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_search_form_renders_only_selected_brand_models(self):
+        unbound = str(SearchForm()["model"])
+        self.assertNotIn("test_model", unbound)
+
+        by_brand = str(SearchForm({"brand": str(self.brand.pk)})["model"])
+        self.assertIn("test_model", by_brand)
+        self.assertNotIn("other_model", by_brand)
+
+        by_model = str(SearchForm({"model": str(self.model.pk)})["model"])
+        self.assertIn(f'value="{self.model.pk}" selected', by_model)
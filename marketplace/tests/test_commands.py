@@ -0,0 +1,25 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from marketplace.models import Listing
+
+
+class ExplainListingSearchCommandTests(TestCase):
+    def test_generates_dataset_and_explains_every_scenario(self):
+        out = StringIO()
+        call_command("explain_listing_search", generate=50, stdout=out)
+
+        output = out.getvalue()
+        self.assertEqual(Listing.objects.count(), 50)
+        self.assertIn("Generated 50 listings.", output)
+        for scenario in ("all", "brand", "model_years_price", "mileage"):
+            self.assertIn(scenario, output)
+        self.assertIn("scenario(s) use a full table scan.", output)
+
+    def test_reports_missing_data(self):
+        err = StringIO()
+        call_command("explain_listing_search", stdout=StringIO(), stderr=err)
+
+        self.assertIn("use --generate", err.getvalue())
@@ -0,0 +1,256 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from marketplace import exporting
+from marketplace.exporting import (
+    SnapshotError,
+    export_table,
+    export_tables,
+    load_snapshot,
+)
+from marketplace.importing import import_listings
+from marketplace.models import Brand, Image, Listing, MarketUser, Model
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.seller = MarketUser.objects.create_user(
+            username="dealer", password="pass12345"
+        )
+        brand = Brand.objects.create(name="Toyota")
+        self.model = Model.objects.create(brand=brand, name="Corolla")
+        self.listing = Listing.objects.create(
+            seller=self.seller,
+            car_model=self.model,
+            year=2015,
+            price=9000,
+            mileage=120000,
+            description="One owner",
+        )
+        Image.objects.create(listing=self.listing, image="photos/car.jpg")
+
+    def read_jsonl(self, path):
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            return [json.loads(line) for line in source]
+
+    def test_exports_listing_rows_in_import_format(self):
+        result = export_table("listings", self.directory, chunk_size=1)
+
+        self.assertEqual(result["rows"], 1)
+        self.assertTrue(result["path"].endswith("listings.jsonl.gz"))
+        row = self.read_jsonl(result["path"])[0]
+        self.assertEqual(row["id"], self.listing.id)
+        self.assertEqual(row["seller"], "dealer")
+        self.assertEqual(row["brand"], "Toyota")
+        self.assertEqual(row["model"], "Corolla")
+        self.assertEqual(row["price"], 9000)
+        self.assertEqual(
+            row["created_at"], self.listing.created_at.isoformat()
+        )
+
+    def test_exports_plain_csv(self):
+        result = export_table(
+            "images", self.directory, fmt="csv", compress=False
+        )
+
+        with open(result["path"], encoding="utf-8", newline="") as source:
+            rows = list(csv.DictReader(source))
+        self.assertEqual(
+            rows,
+            [{
+                "id": str(Image.objects.get().id),
+                "listing": str(self.listing.id),
+                "image": "photos/car.jpg",
+            }],
+        )
+
+    def test_exported_listings_can_be_imported_back(self):
+        for fmt in ("jsonl", "csv"):
+            path = export_table("listings", self.directory, fmt=fmt)["path"]
+            Listing.objects.all().delete()
+
+            stats = import_listings(path)
+
+            self.assertEqual(stats["imported"], 1)
+            self.assertEqual(
+                list(Listing.objects.values_list(
+                    "seller", "car_model", "year", "price", "mileage",
+                    "description",
+                )),
+                [(self.seller.id, self.model.id, 2015, 9000, 120000,
+                  "One owner")],
+            )
+
+    def test_command_exports_selected_tables(self):
+        out = StringIO()
+
+        call_command(
+            "export_marketplace", self.directory, table=["models", "users"],
+            format="csv", stdout=out,
+        )
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ["models.csv.gz", "users.csv.gz"],
+        )
+        with gzip.open(
+            os.path.join(self.directory, "models.csv.gz"), "rb"
+        ) as source:
+            rows = list(csv.DictReader(io.TextIOWrapper(source, "utf-8")))
+        self.assertEqual(rows[0]["brand"], "Toyota")
+        self.assertEqual(rows[0]["model"], "Corolla")
+        self.assertIn("Exported 2 rows", out.getvalue())
+
+
+class SnapshotLoadTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.seller = MarketUser.objects.create_user(
+            username="dealer", password="pass12345", first_name="Dealer",
+            phone_number="+380123",
+        )
+        self.buyer = MarketUser.objects.create_user(
+            username="buyer", password="pass12345"
+        )
+        brand = Brand.objects.create(name="Toyota")
+        # A brand without models only survives as its own table.
+        Brand.objects.create(name="Lada")
+        self.models = [
+            Model.objects.create(brand=brand, name=name)
+            for name in ("Corolla", "Yaris")
+        ]
+        self.listings = [
+            Listing.objects.create(
+                seller=self.seller,
+                car_model=model,
+                year=2015,
+                price=9000 + number,
+                mileage=120000,
+                description=f"Listing {number}",
+            )
+            for number, model in enumerate(self.models)
+        ]
+        Listing.objects.filter(pk=self.listings[0].pk).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        self.image = Image.objects.create(
+            listing=self.listings[1], image="photos/car.jpg"
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "brands": list(Brand.objects.order_by("id").values_list(
+                "id", "name"
+            )),
+            "users": list(MarketUser.objects.order_by("id").values_list(
+                "id", "username", "first_name", "phone_number",
+                "date_joined",
+            )),
+            "models": list(Model.objects.order_by("id").values_list(
+                "id", "brand__name", "name"
+            )),
+            "listings": list(Listing.objects.order_by("id").values_list(
+                "id", "seller_id", "car_model_id", "price", "description",
+                "created_at", "cover_image_id",
+            )),
+            "images": list(Image.objects.values_list(
+                "id", "listing_id", "image"
+            )),
+        }
+
+    def test_snapshot_round_trip(self):
+        expected = self.snapshot()
+        for fmt in ("jsonl", "csv"):
+            export_tables(self.directory, fmt=fmt, compress=fmt == "csv")
+            for model in (Image, Listing, MarketUser, Model, Brand):
+                model.objects.all().delete()
+
+            results = load_snapshot(self.directory)
+
+            self.assertEqual(
+                [result["rows"] for result in results], [2, 2, 2, 2, 1]
+            )
+            self.assertEqual(self.snapshot(), expected)
+            self.assertFalse(
+                MarketUser.objects.get(username="dealer").has_usable_password()
+            )
+            for path in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, path))
+
+    def test_load_rebuilds_statistics(self):
+        export_tables(self.directory)
+        for model in (Image, Listing, MarketUser, Model, Brand):
+            model.objects.all().delete()
+        out = StringIO()
+
+        call_command("load_marketplace", self.directory, stdout=out)
+
+        self.assertIn("Loaded 9 rows", out.getvalue())
+        response = self.client.get("/")
+        self.assertEqual(response.context["num_listings"], 2)
+        self.assertEqual(response.context["num_users"], 2)
+
+    def test_load_requires_an_empty_database(self):
+        export_tables(self.directory)
+
+        with self.assertRaisesMessage(SnapshotError, "empty database"):
+            load_snapshot(self.directory)
+
+    def test_load_requires_every_table(self):
+        export_tables(self.directory, tables=["listings"])
+
+        with self.assertRaisesMessage(
+            SnapshotError, "brands, models, users"
+        ):
+            load_snapshot(self.directory)
+
+
+class ParallelExportTests(TransactionTestCase):
+    def test_exports_tables_as_of_one_moment(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        brand = Brand.objects.create(name="Honda")
+        Model.objects.bulk_create(
+            [Model(brand=brand, name=f"Model {i}") for i in range(3)]
+        )
+        calls = []
+
+        def record(*arguments):
+            calls.append(
+                (threading.current_thread(), connection.in_atomic_block)
+            )
+            return export_table(*arguments)
+
+        with mock.patch.object(exporting, "export_table", record):
+            results = export_tables(directory.name, workers=4)
+
+        self.assertEqual(
+            {result["table"]: result["rows"] for result in results},
+            {
+                "listings": 0, "users": 0, "brands": 1, "models": 3,
+                "images": 0,
+            },
+        )
+        # SQLite connections cannot share a snapshot, so the tables are
+        # read one after another in a single transaction.
+        self.assertEqual(
+            set(calls), {(threading.current_thread(), True)}
+        )
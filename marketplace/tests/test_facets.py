@@ -0,0 +1,102 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.catalog import catalog_cache
+from marketplace.facets import compute_facets, listing_facets
+from marketplace.models import Brand, Listing
+from marketplace.search import engine
+
+
+class FacetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = generate_dataset(
+            200, brands=3, models_per_brand=3, users=2, seed=3
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_match_filtered_listings(self):
+        params = {"year_start": "2000", "price_end": "60000"}
+        listings = Listing.objects.filter(
+            year__gte=2000, price__lte=60000
+        ).select_related("car_model")
+
+        with self.assertNumQueries(1):
+            facets = compute_facets(params)
+
+        self.assertEqual(
+            {brand["id"]: brand["count"] for brand in facets["brands"]},
+            Counter(listing.car_model.brand_id for listing in listings),
+        )
+        self.assertEqual(
+            {model["id"]: model["count"] for model in facets["models"]},
+            Counter(listing.car_model_id for listing in listings),
+        )
+        self.assertEqual(
+            {year["value"]: year["count"] for year in facets["years"]},
+            Counter(listing.year for listing in listings),
+        )
+        self.assertEqual(
+            {bucket["start"]: bucket["count"] for bucket in facets["price"]},
+            Counter(listing.price // 5000 * 5000 for listing in listings),
+        )
+        self.assertEqual(
+            sum(bucket["count"] for bucket in facets["mileage"]),
+            len(listings),
+        )
+
+    def test_facets_are_cached_by_normalized_query(self):
+        listing_facets(QueryDict("year_start=2000&brand="))
+
+        with self.assertNumQueries(0):
+            listing_facets(QueryDict("page=2&year_start=2000"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.order_by("id").first().delete()
+        with self.assertNumQueries(0):
+            listing_facets(QueryDict("year_start=2000"))
+
+        brand = Brand.objects.order_by("id").first()
+        with self.captureOnCommitCallbacks(execute=True):
+            brand.name = "Renamed"
+            brand.save()
+        with self.assertNumQueries(1):
+            listing_facets(QueryDict("year_start=2000"))
+
+    @override_settings(
+        LISTING_SEARCH_BACKEND="marketplace.search.ColumnarSearchBackend"
+    )
+    def test_columnar_backend_counts_in_memory(self):
+        engine.invalidate()
+        catalog_cache.invalidate()
+        params = {"brand": str(self.dataset["brand_ids"][0]),
+                  "price_start": "10000"}
+        listing_facets(params)
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = Listing.objects.filter(
+                car_model__brand_id=self.dataset["brand_ids"][0]
+            ).order_by("id").first()
+            listing.price = 99000
+            listing.save()
+            Listing.objects.order_by("id").last().delete()
+
+        with self.assertNumQueries(0):
+            facets = listing_facets(params)
+
+        self.assertIn(listing.id, engine.delta)
+        self.assertEqual(facets, compute_facets(params))
+
+    def test_listing_list_renders_facets(self):
+        response = self.client.get(reverse("marketplace:listings-list"))
+
+        brand = response.context["facets"]["brands"][0]
+        self.assertContains(
+            response, f"{brand['name']} ({brand['count']})"
+        )
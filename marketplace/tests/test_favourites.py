@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.caching import get_listings_generation
+from marketplace.favourites import favourite_ids, toggle_favourite
+from marketplace.models import Brand, Listing, MarketUser, Model
+from marketplace.tests.utils import QueryBudgetMixin
+
+
+class FavouriteTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            username="test_username", password="test$23456789"
+        )
+        brand = Brand.objects.create(name="test_brand")
+        model = Model.objects.create(brand=brand, name="test_model")
+        self.listings = [
+            Listing.objects.create(
+                seller=self.user,
+                car_model=model,
+                year=2020,
+                price=15000,
+                mileage=50000,
+                description=f"test_description_{number}",
+            )
+            for number in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def toggle_url(self, listing):
+        return reverse(
+            "marketplace:toggle-assign-to-listing", kwargs={"pk": listing.pk}
+        )
+
+    def test_toggle_adds_and_removes(self):
+        listing = self.listings[0]
+
+        with self.assertMaxQueries(2):
+            self.assertTrue(toggle_favourite(self.user, listing.id))
+        self.assertIn(listing, self.user.favourite_listings.all())
+
+        with self.assertMaxQueries(2):
+            self.assertFalse(toggle_favourite(self.user, listing.id))
+        self.assertNotIn(listing, self.user.favourite_listings.all())
+
+    def test_toggle_requires_post(self):
+        response = self.client.get(self.toggle_url(self.listings[0]))
+
+        self.assertEqual(response.status_code, 405)
+
+    def test_toggle_unknown_listing(self):
+        response = self.client.post(
+            reverse("marketplace:toggle-assign-to-listing", kwargs={"pk": 0})
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_shows_favourite_state(self):
+        listing = self.listings[0]
+        url = reverse("marketplace:listing-detail", kwargs={"pk": listing.pk})
+        self.assertContains(self.client.get(url), "Add to favourites")
+
+        self.client.post(self.toggle_url(listing))
+
+        self.assertContains(self.client.get(url), "Delete from favourites")
+
+    @override_settings(LISTING_COUNT_CACHE_TIMEOUT=60)
+    def test_favourites_only_invalidate_the_users_count(self):
+        url = reverse(
+            "marketplace:my-favourite-listings", kwargs={"pk": self.user.pk}
+        )
+        generation = get_listings_generation()
+        self.assertEqual(self.client.get(url).context["num_listings"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.toggle_url(self.listings[0]))
+        self.assertEqual(self.client.get(url).context["num_listings"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listings[1].users.add(self.user)
+        self.assertEqual(self.client.get(url).context["num_listings"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listings[1].users.clear()
+        self.assertEqual(self.client.get(url).context["num_listings"], 1)
+        self.assertEqual(get_listings_generation(), generation)
+
+    def test_favourite_ids_for_page(self):
+        self.user.favourite_listings.add(self.listings[1])
+
+        with self.assertNumQueries(1):
+            ids = favourite_ids(self.user, self.listings)
+
+        self.assertEqual(ids, {self.listings[1].id})
+
+    def test_list_cards_show_hearts(self):
+        self.user.favourite_listings.add(self.listings[1])
+        list_url = reverse("marketplace:listings-list")
+
+        response = self.client.get(list_url)
+
+        self.assertContains(response, "fas fa-heart", count=1)
+        self.assertContains(response, "far fa-heart", count=2)
+
+        self.client.logout()
+        response = self.client.get(list_url)
+        self.assertNotContains(response, "fa-heart")
+        self.assertNotContains(response, "<!--favourite-->")
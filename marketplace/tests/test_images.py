@@ -0,0 +1,244 @@
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image as PillowImage
+
+from marketplace.images import (
+    generate_variants,
+    save_with_concurrent_uploads,
+    store_variants_in_background,
+    variant_names,
+)
+from marketplace.models import Brand, Image, Listing, MarketUser, Model
+from marketplace.tests.storage import SlowInMemoryStorage
+
+
+def image_file(width: int = 1600, height: int = 1200) -> ContentFile:
+    buffer = BytesIO()
+    PillowImage.new("RGB", (width, height), "red").save(buffer, "JPEG")
+    return ContentFile(buffer.getvalue(), name="photo.jpg")
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE="django.core.files.storage.InMemoryStorage",
+    IMAGE_VARIANTS_ASYNC=False,
+)
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        self.seller = MarketUser.objects.create(
+            username="test_username",
+            password="test$23456789",
+        )
+        brand = Brand.objects.create(name="test_brand")
+        model = Model.objects.create(brand=brand, name="test_model")
+        self.listing = Listing.objects.create(
+            seller=self.seller,
+            car_model=model,
+            year=2020,
+            price=15000,
+            mileage=50000,
+            description="test_description",
+        )
+
+    def test_generate_variants(self):
+        image = Image(listing=self.listing)
+        image.image.save("photo.jpg", image_file(), save=False)
+
+        variants = generate_variants(image.image)
+
+        self.assertEqual(variants["source"], image.image.name)
+        self.assertEqual(sorted(variants["webp"]), ["1280", "320", "640"])
+        for name in variants["webp"].values():
+            self.assertTrue(default_storage.exists(name))
+        with default_storage.open(variants["jpeg"]["320"]) as thumbnail:
+            self.assertEqual(PillowImage.open(thumbnail).size, (320, 240))
+
+    def test_small_original_gets_a_single_variant(self):
+        image = Image(listing=self.listing)
+        image.image.save("photo.jpg", image_file(200, 100), save=False)
+
+        variants = generate_variants(image.image)
+
+        self.assertEqual(list(variants["webp"]), ["200"])
+
+    def test_variants_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = Image(listing=self.listing)
+            image.image.save("photo.jpg", image_file())
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants["source"], image.image.name)
+
+    def test_profile_picture_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.profile_picture.save("me.jpg", image_file())
+
+        self.seller.refresh_from_db()
+        self.assertIn("webp", self.seller.profile_picture_variants)
+
+    def test_unreadable_upload_is_not_retried(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = Image.objects.create(
+                listing=self.listing, image="missing.jpg"
+            )
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants, {"source": "missing.jpg"})
+
+    def test_oversized_upload_is_not_retried(self):
+        with mock.patch.object(PillowImage, "MAX_IMAGE_PIXELS", 1000):
+            with self.assertLogs("marketplace.images", "WARNING"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    image = Image(listing=self.listing)
+                    image.image.save("photo.jpg", image_file())
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants, {"source": image.image.name})
+
+    def test_background_errors_are_logged(self):
+        with mock.patch("marketplace.images.close_old_connections"), \
+                mock.patch("marketplace.images.store_variants",
+                           side_effect=RuntimeError):
+            with self.assertLogs("marketplace.images", "ERROR"):
+                store_variants_in_background(
+                    Image, 1, "image", "variants"
+                )
+
+    def test_deleted_image_drops_its_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = Image(listing=self.listing)
+            image.image.save("photo.jpg", image_file())
+        image.refresh_from_db()
+        names = variant_names(image.variants)
+        self.assertTrue(names)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_replaced_profile_picture_drops_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.profile_picture.save("me.jpg", image_file())
+        self.seller.refresh_from_db()
+        old_names = variant_names(self.seller.profile_picture_variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.profile_picture.save("new.jpg", image_file())
+        self.seller.refresh_from_db()
+
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        for name in variant_names(self.seller.profile_picture_variants):
+            self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_names = variant_names(self.seller.profile_picture_variants)
+            self.seller.profile_picture = None
+            self.seller.save()
+        self.seller.refresh_from_db()
+
+        self.assertIsNone(self.seller.profile_picture_variants)
+        for name in new_names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_backfill_command(self):
+        image = Image(listing=self.listing)
+        image.image.save("photo.jpg", image_file())
+
+        call_command("generate_image_variants", stdout=StringIO())
+
+        image.refresh_from_db()
+        self.assertIn("webp", image.variants)
+
+    def test_template_tag_falls_back_to_original(self):
+        image = Image(listing=self.listing)
+        image.image.save("photo.jpg", image_file(), save=False)
+        template = Template(
+            "{% load responsive_images %}"
+            '{% responsive_image image.image image.variants class="w-100" %}'
+        )
+
+        html = template.render(Context({"image": image}))
+        self.assertNotIn("srcset", html)
+        self.assertIn(f'src="{image.image.url}"', html)
+
+        image.variants = generate_variants(image.image)
+        html = template.render(Context({"image": image}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn("_320w.webp 320w", html)
+        self.assertIn('class="w-100"', html)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE="marketplace.tests.storage.SlowInMemoryStorage",
+    IMAGE_VARIANTS_ASYNC=False,
+    MEDIA_UPLOAD_WORKERS=4,
+)
+class ConcurrentUploadTests(TestCase):
+    def setUp(self):
+        self.seller = MarketUser.objects.create_user(
+            username="test_username",
+            password="test$23456789",
+        )
+        brand = Brand.objects.create(name="test_brand")
+        self.model = Model.objects.create(brand=brand, name="test_model")
+        self.listing = Listing.objects.create(
+            seller=self.seller,
+            car_model=self.model,
+            year=2020,
+            price=15000,
+            mileage=50000,
+            description="test_description",
+        )
+        SlowInMemoryStorage.reset()
+
+    def test_uploads_run_in_parallel(self):
+        images = [
+            Image(listing=self.listing, image=image_file(64, 48))
+            for _ in range(4)
+        ]
+
+        save_with_concurrent_uploads(images, "image")
+
+        self.assertGreater(SlowInMemoryStorage.max_active, 1)
+        self.assertEqual(self.listing.images.count(), 4)
+        names = [image.image.name for image in self.listing.images.all()]
+        self.assertEqual(len(set(names)), 4)
+        for name in names:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_create_view_uploads_every_image(self):
+        self.client.force_login(self.seller)
+        form_data = {
+            "car_model": self.model.id,
+            "year": 2021,
+            "price": 20000,
+            "mileage": 10000,
+            "description": "with photos",
+            "images-TOTAL_FORMS": 3,
+            "images-INITIAL_FORMS": 0,
+        }
+        for index in range(3):
+            form_data[f"images-{index}-image"] = SimpleUploadedFile(
+                f"photo{index}.jpg",
+                image_file(64, 48).read(),
+                content_type="image/jpeg",
+            )
+
+        response = self.client.post(
+            reverse("marketplace:listing-create"), data=form_data
+        )
+
+        self.assertEqual(response.status_code, 302)
+        listing = Listing.objects.get(description="with photos")
+        self.assertEqual(listing.images.count(), 3)
+        self.assertIsNotNone(listing.cover_image)
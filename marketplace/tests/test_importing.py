@@ -0,0 +1,133 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from marketplace.importing import import_listings
+from marketplace.models import Brand, Listing, MarketUser, Model
+from marketplace.similar import engine as similar_engine
+
+CSV_HEADER = "brand,model,year,price,mileage,description,seller\n"
+
+
+class ImportListingsTests(TestCase):
+    def setUp(self):
+        self.seller = MarketUser.objects.create_user(
+            username="dealer", password="test$23456789"
+        )
+        brand = Brand.objects.create(name="Audi")
+        self.model = Model.objects.create(brand=brand, name="A4")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content, compress=False):
+        path = os.path.join(self.directory.name, name)
+        opener = gzip.open if compress else open
+        with opener(path, "wt", encoding="utf-8") as source:
+            source.write(content)
+        return path
+
+    def test_imports_csv_rows(self):
+        path = self.write(
+            "feed.csv",
+            CSV_HEADER
+            + "audi,a4,2018,15000,90000,Clean car,dealer\n"
+            + "Audi,A4,2019,17000,60000,One owner,dealer\n",
+        )
+
+        similar_engine.stale = False
+        stats = import_listings(path)
+
+        self.assertEqual(stats, {"rows": 2, "imported": 2, "errors": 0})
+        self.assertTrue(similar_engine.stale)
+        listing = Listing.objects.get(year=2018)
+        self.assertEqual(listing.car_model, self.model)
+        self.assertEqual(listing.seller, self.seller)
+        self.assertEqual(listing.price, 15000)
+
+    def test_imports_gzipped_jsonl_with_default_seller(self):
+        rows = [
+            {"brand": "Audi", "model": "A4", "year": 2020, "price": 21000,
+             "mileage": 30000, "description": "Like new"},
+        ]
+        path = self.write(
+            "feed.jsonl.gz",
+            "\n".join(json.dumps(row) for row in rows),
+            compress=True,
+        )
+
+        stats = import_listings(path, default_seller="dealer")
+
+        self.assertEqual(stats["imported"], 1)
+        self.assertEqual(Listing.objects.get().seller, self.seller)
+
+    def test_rejects_rows_breaking_form_rules(self):
+        path = self.write(
+            "feed.csv",
+            CSV_HEADER
+            + "Audi,A4,1900,15000,90000,Too old,dealer\n"
+            + "Audi,A4,2018,-1,90000,Negative price,dealer\n"
+            + "Audi,Q7,2018,15000,90000,Unknown model,dealer\n"
+            + "Audi,A4,2018,15000,90000,Unknown seller,nobody\n"
+            + "Audi,A4,2018,15000,90000,Valid,dealer\n",
+        )
+        errors = []
+
+        stats = import_listings(
+            path, on_error=lambda number, error: errors.append(number)
+        )
+
+        self.assertEqual(stats["imported"], 1)
+        self.assertEqual(stats["errors"], 4)
+        self.assertEqual(errors, [1, 2, 3, 4])
+        self.assertEqual(Listing.objects.get().description, "Valid")
+
+    def test_creates_missing_catalog_entries(self):
+        path = self.write(
+            "feed.csv",
+            CSV_HEADER
+            + "Skoda,Octavia,2017,9000,120000,Estate,dealer\n"
+            + "skoda,octavia,2016,8000,150000,Sedan,dealer\n",
+        )
+
+        import_listings(path, create_missing=True)
+
+        self.assertEqual(Model.objects.filter(name="Octavia").count(), 1)
+        self.assertEqual(
+            Listing.objects.filter(car_model__brand__name="Skoda").count(), 2
+        )
+
+    def test_resumes_from_checkpoint(self):
+        lines = [
+            f"Audi,A4,2018,{10000 + number},90000,Car {number},dealer\n"
+            for number in range(5)
+        ]
+        path = self.write("feed.csv", CSV_HEADER + "".join(lines))
+        checkpoint = os.path.join(self.directory.name, "feed.checkpoint")
+        with open(checkpoint, "w", encoding="utf-8") as state:
+            json.dump({"source": os.path.abspath(path), "rows": 3}, state)
+
+        stats = import_listings(path, batch_size=1, checkpoint=checkpoint)
+
+        self.assertEqual(stats["imported"], 2)
+        self.assertEqual(
+            sorted(Listing.objects.values_list("price", flat=True)),
+            [10003, 10004],
+        )
+        with open(checkpoint, encoding="utf-8") as state:
+            self.assertEqual(json.load(state)["rows"], 5)
+
+    def test_command_reports_throughput(self):
+        path = self.write(
+            "feed.csv", CSV_HEADER + "Audi,A4,2018,15000,90000,Car,dealer\n"
+        )
+        out = StringIO()
+
+        call_command("import_listings", path, stdout=out)
+
+        self.assertIn("Imported 1 listings", out.getvalue())
+        self.assertIn("rows/sec", out.getvalue())
@@ -148,3 +148,50 @@ class ModelsTests(TestCase):
 
         self.assertIn(listing_1, user.favourite_listings.all())
         self.assertIn(listing_2, user.favourite_listings.all())
+
+
+class ListingCoverImageTests(TestCase):
+    def setUp(self):
+        seller = MarketUser.objects.create(
+            username="test_username",
+            password="test$23456789",
+        )
+        brand = Brand.objects.create(name="test_brand")
+        model = Model.objects.create(brand=brand, name="test_model")
+        self.listing = Listing.objects.create(
+            seller=seller,
+            car_model=model,
+            year=2020,
+            price=15000,
+            mileage=50000,
+            description="test_description",
+        )
+
+    def test_first_added_image_becomes_cover(self):
+        first = Image.objects.create(listing=self.listing, image="first.jpg")
+        Image.objects.create(listing=self.listing, image="second.jpg")
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.cover_image, first)
+        self.assertEqual(self.listing.first_photo, first)
+
+    def test_deleting_cover_promotes_next_image(self):
+        first = Image.objects.create(listing=self.listing, image="first.jpg")
+        second = Image.objects.create(
+            listing=self.listing, image="second.jpg"
+        )
+
+        first.delete()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.cover_image, second)
+
+        second.delete()
+        self.listing.refresh_from_db()
+        self.assertIsNone(self.listing.cover_image)
+
+    def test_deleting_listing_with_images(self):
+        Image.objects.create(listing=self.listing, image="first.jpg")
+
+        self.listing.delete()
+
+        self.assertFalse(Image.objects.exists())
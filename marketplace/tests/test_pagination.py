@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from marketplace.models import Brand, Listing, Model
+from marketplace.pagination import (
+    CursorPaginator,
+    InvalidCursor,
+    count_queryset,
+    decode_cursor,
+    encode_cursor,
+)
+
+LISTINGS_URL = reverse("marketplace:listings-list")
+
+
+class CursorTokenTests(TestCase):
+    def test_round_trip(self):
+        created_at = timezone.now()
+        token = encode_cursor(created_at, 42, "next")
+
+        self.assertEqual(decode_cursor(token), (created_at, 42, "next"))
+
+    def test_invalid_token(self):
+        for token in ("garbage", "e30", ""):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(token)
+
+
+class CursorListingsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_username",
+            password="test$23456789",
+        )
+        brand = Brand.objects.create(name="test_brand")
+        model = Model.objects.create(brand=brand, name="test_model")
+        for listing_id in range(12):
+            Listing.objects.create(
+                seller=cls.user,
+                car_model=model,
+                year=2010,
+                price=10000 + listing_id,
+                mileage=1000,
+                description=f"test_description_{listing_id}",
+            )
+        # Equal timestamps must still paginate deterministically by id.
+        Listing.objects.filter(price__lt=10006).update(
+            created_at=Listing.objects.order_by("id").first().created_at
+        )
+        cls.expected = list(
+            Listing.objects.order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+
+class CursorPaginatorTests(CursorListingsTestCase):
+    def test_walks_forward_and_backward(self):
+        paginator = CursorPaginator(Listing.objects.all(), 5)
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        back = paginator.page(third.previous_cursor)
+
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        self.assertEqual(
+            [
+                listing.id
+                for page in (first, second, third)
+                for listing in page
+            ],
+            self.expected,
+        )
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            [listing.id for listing in back],
+            [listing.id for listing in second],
+        )
+        self.assertTrue(back.has_previous())
+        self.assertFalse(paginator.page(back.previous_cursor).has_previous())
+
+
+@override_settings(LISTING_CURSOR_PAGINATION=True)
+class CursorPaginationViewTests(CursorListingsTestCase):
+    def test_listing_list_uses_cursor(self):
+        response = self.client.get(LISTINGS_URL)
+
+        self.assertTrue(response.context["cursor_pagination"])
+        self.assertTrue(response.context["is_paginated"])
+        next_cursor = response.context["page_obj"].next_cursor
+        self.assertContains(response, f"cursor={next_cursor}")
+
+        response = self.client.get(LISTINGS_URL, {"cursor": next_cursor})
+        self.assertEqual(
+            [listing.id for listing in response.context["listings"]],
+            self.expected[5:10],
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(LISTINGS_URL, {"cursor": "garbage"})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_sale_listings_use_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("marketplace:sale-listings", kwargs={"pk": self.user.id})
+        )
+
+        self.assertEqual(len(response.context["listings"]), 5)
+        self.assertTrue(response.context["page_obj"].has_next())
+
+
+@override_settings(LISTING_COUNT_THRESHOLD=10, LISTING_COUNT_CACHE_TIMEOUT=60)
+class CountQuerysetTests(CursorListingsTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_count_below_threshold_is_exact(self):
+        self.assertEqual(
+            count_queryset(Listing.objects.filter(price__lt=10005)),
+            (5, False),
+        )
+
+    def test_count_above_threshold_is_capped(self):
+        self.assertEqual(count_queryset(Listing.objects.all()), (10, True))
+
+    def test_count_is_cached_until_listings_change(self):
+        queryset = Listing.objects.all()
+        count_queryset(queryset, "all")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(count_queryset(queryset, "all"), (10, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.filter(price__gte=10003).delete()
+        self.assertEqual(count_queryset(queryset, "all"), (3, False))
+
+    def test_capped_count_is_rendered_with_plus(self):
+        response = self.client.get(LISTINGS_URL, {"brand": ""})
+
+        self.assertTrue(response.context["paginator"].count_is_capped)
+        self.assertContains(response, "10+ cars found")
+
+    def test_capped_count_does_not_limit_pages(self):
+        response = self.client.get(LISTINGS_URL, {"page": 2})
+        self.assertTrue(response.context["page_obj"].has_next())
+        self.assertNotContains(response, 'page=2">2</a>')
+
+        response = self.client.get(LISTINGS_URL, {"page": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [listing.id for listing in response.context["listings"]],
+            self.expected[10:],
+        )
+        self.assertFalse(response.context["page_obj"].has_next())
+        self.assertEqual(response.context["page_obj"].end_index(), 12)
+        self.assertEqual(
+            self.client.get(LISTINGS_URL, {"page": 4}).status_code, 404
+        )
+
+    def test_sale_listings_count_once(self):
+        self.client.force_login(self.user)
+        url = reverse("marketplace:sale-listings", kwargs={"pk": self.user.id})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context["num_listings"], 10)
+        self.assertEqual(
+            sum("COUNT(" in query["sql"] for query in queries), 1
+        )
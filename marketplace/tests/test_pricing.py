@@ -0,0 +1,207 @@
+import random
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.caching import get_pricing_version
+from marketplace.models import Brand, Listing, MarketUser, Model, PriceModel
+from marketplace.pricing import (
+    MILEAGE_UNIT,
+    RIDGE,
+    YEAR_ORIGIN,
+    PriceTableCache,
+    fit_price_models,
+    get_price_table,
+    price_table_cache,
+)
+
+ESTIMATE_URL = reverse("marketplace:price-estimate")
+
+
+class PriceModelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        price_table_cache.invalidate()
+        self.seller = MarketUser.objects.create_user(
+            username="seller", password="pass12345"
+        )
+        brand = Brand.objects.create(name="Toyota")
+        self.corolla = Model.objects.create(brand=brand, name="Corolla")
+        self.yaris = Model.objects.create(brand=brand, name="Yaris")
+        rng = random.Random(0)
+        self.listings = [
+            self.create_listing(
+                year=year,
+                mileage=mileage,
+                price=round(
+                    3000 + 600 * (year - 2000) - 20 * mileage / 1000
+                    + rng.randint(-500, 500)
+                ),
+            )
+            for year, mileage in (
+                (rng.randint(2000, 2020), rng.randrange(0, 200000, 1000))
+                for _ in range(30)
+            )
+        ]
+
+    def create_listing(self, price, year=2015, mileage=100000, model=None):
+        return Listing.objects.create(
+            seller=self.seller,
+            car_model=model or self.corolla,
+            year=year,
+            price=price,
+            mileage=mileage,
+            description="Test",
+        )
+
+    def fits(self):
+        return {
+            car_model_id: (count, intercept, year, mileage, std)
+            for car_model_id, count, intercept, year, mileage, std in (
+                PriceModel.objects.values_list(
+                    "car_model_id", "count", "intercept", "year_coefficient",
+                    "mileage_coefficient", "residual_std",
+                )
+            )
+        }
+
+    def assertFitsAlmostEqual(self, first, second):
+        self.assertEqual(first.keys(), second.keys())
+        for car_model_id in first:
+            np.testing.assert_allclose(
+                first[car_model_id], second[car_model_id], rtol=1e-6
+            )
+
+    def test_fit_matches_ridge_least_squares(self):
+        fit_price_models()
+
+        rows = np.array(
+            Listing.objects.values_list("year", "mileage", "price"),
+            dtype=np.float64,
+        )
+        features = np.column_stack([
+            np.ones(len(rows)),
+            rows[:, 0] - YEAR_ORIGIN,
+            rows[:, 1] / MILEAGE_UNIT,
+        ])
+        expected = np.linalg.solve(
+            features.T @ features + np.diag([0, RIDGE, RIDGE]),
+            features.T @ rows[:, 2],
+        )
+        price_model = PriceModel.objects.get(car_model=self.corolla)
+        np.testing.assert_allclose(
+            [
+                price_model.intercept,
+                price_model.year_coefficient,
+                price_model.mileage_coefficient,
+            ],
+            expected,
+            rtol=1e-6,
+        )
+        self.assertEqual(price_model.count, 30)
+
+    def test_signals_keep_the_fit_equal_to_a_full_refit(self):
+        self.create_listing(9000, model=self.yaris)
+        self.listings[0].price += 1000
+        self.listings[0].save()
+        self.listings[1].car_model = self.yaris
+        self.listings[1].save()
+        self.listings[2].delete()
+        incremental = self.fits()
+
+        fit_price_models()
+
+        self.assertFitsAlmostEqual(self.fits(), incremental)
+        self.assertEqual(incremental[self.yaris.id][0], 2)
+
+    def test_single_listing_model_estimates_its_price(self):
+        self.create_listing(9000, year=2010, mileage=50000, model=self.yaris)
+
+        estimate = get_price_table().estimate(self.yaris.id, 2010, 50000)
+
+        self.assertAlmostEqual(estimate["estimate"], 9000, delta=1)
+        self.assertEqual(estimate["listings"], 1)
+
+    def test_other_workers_reload_only_refitted_models(self):
+        worker = PriceTableCache()
+        worker.get()
+        version = get_pricing_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = self.create_listing(
+                9000, year=2010, mileage=50000, model=self.yaris
+            )
+        worker.expire()
+        with self.assertNumQueries(1):
+            table = worker.get()
+
+        self.assertEqual(get_pricing_version(), version)
+        self.assertEqual(
+            table.estimate(self.yaris.id, 2010, 50000)["listings"], 1
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.delete()
+        worker.expire()
+
+        self.assertIsNone(worker.get().estimate(self.yaris.id, 2010, 50000))
+        self.assertIsNone(get_price_table().estimate(self.yaris.id, 2010, 0))
+
+    def test_refit_bumps_the_version_on_commit(self):
+        version = get_pricing_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            fit_price_models()
+        self.assertEqual(get_pricing_version(), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_pricing_version(), version + 1)
+
+    def test_estimate_endpoint(self):
+        response = self.client.get(
+            ESTIMATE_URL,
+            {"car_model": self.corolla.id, "year": 2015, "mileage": 100000},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertAlmostEqual(data["estimate"], 10000, delta=500)
+        self.assertLess(data["low"], data["estimate"])
+        self.assertGreater(data["high"], data["estimate"])
+        self.assertEqual(data["listings"], 30)
+
+    def test_estimate_endpoint_rejects_bad_input(self):
+        response = self.client.get(ESTIMATE_URL, {"car_model": "x"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(
+            ESTIMATE_URL,
+            {"car_model": self.yaris.id, "year": 2015, "mileage": 1000},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(PRICE_ESTIMATE_MIN_LISTINGS=10)
+    def test_list_cards_show_deal_badges(self):
+        self.create_listing(1000, year=2015, mileage=100000)
+        self.create_listing(30000, year=2015, mileage=100000)
+
+        response = self.client.get(
+            reverse("marketplace:listings-list"), {"model": self.corolla.id}
+        )
+
+        self.assertContains(response, "Good deal", count=1)
+        self.assertContains(response, "Overpriced", count=1)
+        self.assertNotContains(response, "<!--price-badge-->")
+
+    def test_benchmark_command(self):
+        out = StringIO()
+
+        call_command("benchmark_price_fit", estimates=10, stdout=out)
+
+        self.assertIn("Fitted 1 car models over 30 listings", out.getvalue())
+        self.assertIn("10 estimates", out.getvalue())
@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.catalog import catalog_cache, get_catalog
+from marketplace.models import Brand, Image, Listing, MarketUser, Model
+from marketplace.pricing import get_price_table
+from marketplace.similar import engine as similar_engine
+from marketplace.tests.utils import QueryBudgetMixin
+
+LISTINGS = 5
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            username="test_username",
+            password="test$23456789",
+            phone_number="+380961234576",
+        )
+        self.listings = []
+        for number in range(LISTINGS):
+            brand = Brand.objects.create(name=f"brand_{number}")
+            model = Model.objects.create(brand=brand, name=f"model_{number}")
+            listing = Listing.objects.create(
+                seller=self.user,
+                car_model=model,
+                year=2020,
+                price=15000,
+                mileage=50000,
+                description=f"description_{number}",
+            )
+            for _ in range(2):
+                Image.objects.create(listing=listing, image="photo.jpg")
+            self.listings.append(listing)
+            self.user.favourite_listings.add(listing)
+        get_catalog()
+        get_price_table()
+        similar_engine.rebuild()
+
+    def test_listing_list(self):
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse("marketplace:listings-list"))
+        self.assertEqual(len(response.context["listings"]), LISTINGS)
+
+    @override_settings(LISTING_DETAIL_CACHE_TIMEOUT=3600)
+    def test_listing_detail(self):
+        self.client.force_login(self.user)
+        url = reverse(
+            "marketplace:listing-detail", kwargs={"pk": self.listings[0].pk}
+        )
+        # Session and user, then the listing with its favourite flag and
+        # the images.
+        with self.assertMaxQueries(4):
+            self.client.get(url)
+
+        # Cached: session, user and the favourite flag.
+        with self.assertMaxQueries(3):
+            self.client.get(url)
+
+    def test_listing_create_form(self):
+        self.client.force_login(self.user)
+        with self.assertMaxQueries(2):
+            self.client.get(reverse("marketplace:listing-create"))
+
+    def test_listing_create_form_with_cold_catalog(self):
+        self.client.force_login(self.user)
+        catalog_cache.invalidate()
+        with self.assertMaxQueries(4):
+            self.client.get(reverse("marketplace:listing-create"))
+
+    def test_listing_update_form(self):
+        self.client.force_login(self.user)
+        url = reverse(
+            "marketplace:listing-update", kwargs={"pk": self.listings[0].pk}
+        )
+        with self.assertMaxQueries(4):
+            self.client.get(url)
+
+    def test_sale_listings(self):
+        self.client.force_login(self.user)
+        url = reverse("marketplace:sale-listings", kwargs={"pk": self.user.pk})
+        with self.assertMaxQueries(5):
+            self.client.get(url)
+
+    def test_favourite_listings(self):
+        self.client.force_login(self.user)
+        url = reverse(
+            "marketplace:my-favourite-listings", kwargs={"pk": self.user.pk}
+        )
+        with self.assertMaxQueries(5):
+            self.client.get(url)
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.models import Brand, Listing, Model
+from marketplace.response_cache import response_cache_stats
+
+LISTINGS_URL = reverse("marketplace:listings-list")
+INDEX_URL = reverse("marketplace:index")
+
+
+class AnonymousResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = get_user_model().objects.create_user(
+            username="test_username", password="test$23456789"
+        )
+        brand = Brand.objects.create(name="test_brand")
+        self.model = Model.objects.create(brand=brand, name="test_model")
+
+    def create_listing(self, price=15000):
+        return Listing.objects.create(
+            seller=self.seller,
+            car_model=self.model,
+            year=2020,
+            price=price,
+            mileage=50000,
+            description="test_description",
+        )
+
+    def test_equivalent_queries_share_an_entry(self):
+        self.create_listing()
+
+        first = self.client.get(
+            LISTINGS_URL, {"model": self.model.id, "brand": ""}
+        )
+        second = self.client.get(
+            f"{LISTINGS_URL}?brand=&model={self.model.id}&price_start="
+        )
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(
+            response_cache_stats(),
+            {"hits": 1, "misses": 1, "hit_rate": 0.5},
+        )
+
+    def test_listing_change_invalidates_entries(self):
+        listing = self.create_listing()
+        self.client.get(LISTINGS_URL)
+        self.client.get(INDEX_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.price = 99999
+            listing.save()
+
+        response = self.client.get(LISTINGS_URL)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "99 999")
+        self.assertEqual(self.client.get(INDEX_URL)["X-Cache"], "MISS")
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.client.force_login(self.seller)
+
+        self.client.get(LISTINGS_URL)
+        response = self.client.get(LISTINGS_URL)
+
+        self.assertNotIn("X-Cache", response)
+        self.assertEqual(response_cache_stats()["misses"], 0)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_can_be_disabled(self):
+        response = self.client.get(INDEX_URL)
+
+        self.assertNotIn("X-Cache", response)
+
+    def test_stats_command(self):
+        self.client.get(INDEX_URL)
+        self.client.get(INDEX_URL)
+        out = StringIO()
+
+        call_command("response_cache_stats", reset=True, stdout=out)
+
+        self.assertIn("hit rate: 50.0%", out.getvalue())
+        self.assertEqual(response_cache_stats()["hits"], 0)
@@ -0,0 +1,244 @@
+import random
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.benchmarks.dataset import generate_dataset
+from marketplace.models import Listing, ListingChange
+from marketplace.search import (
+    ColumnarSearchBackend,
+    ListingSnapshot,
+    ORMSearchBackend,
+    engine,
+)
+
+COLUMNAR_BACKEND = "marketplace.search.ColumnarSearchBackend"
+
+
+@override_settings(LISTING_SEARCH_BACKEND=COLUMNAR_BACKEND)
+class ColumnarSearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = generate_dataset(
+            300, brands=3, models_per_brand=4, users=5, seed=1
+        )
+
+    def setUp(self):
+        engine.invalidate()
+
+    def assert_same_results(self, params):
+        orm = ORMSearchBackend().search(Listing.objects.all(), params)
+        orm_ids = list(orm.order_by("-created_at", "-id")
+                       .values_list("id", flat=True))
+        result = ColumnarSearchBackend().search(Listing.objects.all(), params)
+
+        self.assertEqual(result.count(), len(orm_ids), params)
+        self.assertEqual(
+            [listing.id for listing in result[0:len(result)]], orm_ids, params
+        )
+        self.assertEqual(
+            [listing.id for listing in result[5:10]], orm_ids[5:10], params
+        )
+
+    def test_matches_orm_for_filter_combinations(self):
+        rng = random.Random(2)
+        brand_ids = self.dataset["brand_ids"]
+        model_ids = self.dataset["model_ids"]
+        for _ in range(40):
+            params = {}
+            if rng.random() < 0.3:
+                params["brand"] = str(rng.choice(brand_ids))
+            if rng.random() < 0.3:
+                params["model"] = str(rng.choice(model_ids))
+            if rng.random() < 0.5:
+                params["year_start"] = str(rng.randint(1990, 2010))
+            if rng.random() < 0.5:
+                params["year_end"] = str(rng.randint(2005, 2023))
+            if rng.random() < 0.5:
+                params["price_start"] = str(rng.randint(1000, 50000))
+            if rng.random() < 0.5:
+                params["price_end"] = str(rng.randint(20000, 100000))
+            if rng.random() < 0.3:
+                params["mileage_end"] = str(rng.randint(0, 400000))
+            self.assert_same_results(params)
+
+    def test_no_filters_and_empty_values(self):
+        self.assert_same_results({})
+        self.assert_same_results({"brand": "", "price_start": ""})
+
+    def test_applies_saved_and_deleted_listings(self):
+        self.assert_same_results({"price_start": "10000"})
+        with self.captureOnCommitCallbacks(execute=True):
+            new_listing = self.change_listings()
+
+        self.assertIn(new_listing.id, engine.delta)
+        self.assert_same_results({"price_start": "10000"})
+        self.assert_same_results({"price_end": "10"})
+        self.assert_same_results(
+            {"model": str(self.dataset["model_ids"][0])}
+        )
+
+    def change_listings(self):
+        listing = Listing.objects.order_by("id").first()
+        listing.price = 5
+        listing.save()
+        Listing.objects.order_by("id").last().delete()
+        return Listing.objects.create(
+            seller_id=self.dataset["user_ids"][0],
+            car_model_id=self.dataset["model_ids"][0],
+            year=2020,
+            price=15000,
+            mileage=1000,
+            description="new listing",
+        )
+
+    @override_settings(LISTING_SEARCH_REFRESH_SECONDS=0)
+    def test_refresh_applies_changes_of_other_workers(self):
+        self.assert_same_results({"price_start": "10000"})
+        # Without the commit callbacks, only the change log tells this
+        # worker about the edit, the delete and the new listing.
+        with self.captureOnCommitCallbacks():
+            new_listing = self.change_listings()
+
+        self.assert_same_results({"price_start": "10000"})
+        self.assertIn(new_listing.id, engine.delta)
+        self.assert_same_results({"price_end": "10"})
+
+    def test_expired_snapshot_is_rebuilt_in_the_background(self):
+        self.assert_same_results({})
+        engine.built_at = 0.0
+
+        with mock.patch("marketplace.search.executor") as executor:
+            with mock.patch.object(ListingSnapshot, "load") as load:
+                self.assert_same_results({"price_start": "10000"})
+                self.assert_same_results({})
+        engine.rebuilding = False
+
+        load.assert_not_called()
+        executor.submit.assert_called_once_with(engine.rebuild_in_background)
+
+    @override_settings(LISTING_SEARCH_ASYNC_REBUILD=False)
+    def test_changes_during_a_rebuild_are_kept(self):
+        self.assert_same_results({})
+        engine.built_at = 0.0
+        load = ListingSnapshot.load
+        created = []
+
+        def load_then_save():
+            snapshot = load()
+            with self.captureOnCommitCallbacks(execute=True):
+                created.append(self.change_listings())
+            return snapshot
+
+        with mock.patch.object(
+            ListingSnapshot, "load", side_effect=load_then_save
+        ):
+            engine.search({})
+
+        self.assertIn(created[0].id, engine.delta)
+        self.assert_same_results({"price_start": "10000"})
+        self.assert_same_results({"price_end": "10"})
+
+    def test_changes_are_logged_only_for_the_columnar_backend(self):
+        self.change_listings()
+        self.assertEqual(ListingChange.objects.count(), 3)
+
+        with override_settings(
+            LISTING_SEARCH_BACKEND="marketplace.search.ORMSearchBackend"
+        ):
+            self.change_listings()
+        self.assertEqual(ListingChange.objects.count(), 3)
+
+    def test_deleted_listings_do_not_shorten_pages(self):
+        result = ColumnarSearchBackend().search(Listing.objects.all(), {})
+        expected = list(
+            Listing.objects.order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        with self.captureOnCommitCallbacks():
+            Listing.objects.filter(id__in=expected[2:4]).delete()
+
+        self.assertEqual(
+            [listing.id for listing in result[0:5]],
+            expected[:2] + expected[4:7],
+        )
+
+
+@override_settings(LISTING_SEARCH_BACKEND=COLUMNAR_BACKEND)
+class ColumnarListingListViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(12, brands=1, models_per_brand=2, users=1)
+
+    def setUp(self):
+        engine.invalidate()
+
+    def test_listing_list_pages(self):
+        expected = list(
+            Listing.objects.order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+        response = self.client.get(
+            reverse("marketplace:listings-list"), {"page": 2}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["paginator"].count, 12)
+        self.assertEqual(
+            [listing.id for listing in response.context["listings"]],
+            expected[5:10],
+        )
+
+
+class KeywordSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(3, brands=1, models_per_brand=1, users=1)
+        cls.leather, cls.cloth, cls.other = Listing.objects.order_by("id")
+        cls.leather.description = "Heated leather seats, one owner"
+        cls.leather.save()
+        cls.cloth.description = "Cloth seats and a leather steering wheel"
+        cls.cloth.save()
+
+    def search(self, params):
+        return set(
+            ORMSearchBackend()
+            .search(Listing.objects.all(), params)
+            .values_list("id", flat=True)
+        )
+
+    def test_matches_all_words(self):
+        self.assertEqual(
+            self.search({"keywords": "leather seats"}),
+            {self.leather.id, self.cloth.id},
+        )
+        self.assertEqual(self.search({"keywords": "heated LEATHER"}),
+                         {self.leather.id})
+
+    def test_index_follows_updates_and_deletes(self):
+        self.cloth.description = "Panoramic roof"
+        self.cloth.save()
+        self.leather.delete()
+
+        self.assertEqual(self.search({"keywords": "leather"}), set())
+        self.assertEqual(self.search({"keywords": "roof"}), {self.cloth.id})
+
+    def test_combines_with_range_filters(self):
+        Listing.objects.filter(id=self.leather.id).update(price=1)
+
+        self.assertEqual(
+            self.search({"keywords": "leather", "price_start": "100"}),
+            {self.cloth.id},
+        )
+
+    def test_punctuation_only_keywords_are_ignored(self):
+        self.assertEqual(len(self.search({"keywords": '"*()'})), 3)
+
+    def test_columnar_backend_delegates_keywords(self):
+        result = ColumnarSearchBackend().search(
+            Listing.objects.all(), {"keywords": "cloth"}
+        )
+
+        self.assertEqual([listing.id for listing in result], [self.cloth.id])
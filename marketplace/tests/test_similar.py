@@ -0,0 +1,195 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from marketplace.catalog import get_catalog
+from marketplace.models import Brand, Listing, MarketUser, Model
+from marketplace.pricing import get_price_table
+from marketplace.similar import SimilarityIndex, engine
+from marketplace.tests.utils import QueryBudgetMixin
+
+
+class SimilarListingsTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        engine.invalidate()
+        self.seller = MarketUser.objects.create_user(
+            username="seller", password="pass12345"
+        )
+        toyota = Brand.objects.create(name="Toyota")
+        self.corolla = Model.objects.create(brand=toyota, name="Corolla")
+        self.yaris = Model.objects.create(brand=toyota, name="Yaris")
+        self.golf = Model.objects.create(
+            brand=Brand.objects.create(name="Volkswagen"), name="Golf"
+        )
+        self.target = self.create_listing(10000, 2015, 100000)
+        self.close = self.create_listing(10500, 2015, 105000)
+        self.older = self.create_listing(10000, 2012, 100000)
+        self.pricier = self.create_listing(20000, 2015, 100000)
+        self.far = self.create_listing(50000, 2023, 5000)
+        self.yaris_listing = self.create_listing(
+            10000, 2015, 100000, model=self.yaris
+        )
+        self.golf_listing = self.create_listing(
+            10000, 2015, 100000, model=self.golf
+        )
+
+    def create_listing(self, price, year, mileage, model=None):
+        return Listing.objects.create(
+            seller=self.seller,
+            car_model=model or self.corolla,
+            year=year,
+            price=price,
+            mileage=mileage,
+            description="Test",
+        )
+
+    def test_nearest_listings_of_the_same_model_come_first(self):
+        self.assertEqual(
+            engine.similar(self.target, 3),
+            [self.close.id, self.older.id, self.pricier.id],
+        )
+
+    def test_other_models_of_the_brand_fill_up_short_lists(self):
+        self.assertEqual(
+            engine.similar(self.target, 6),
+            [
+                self.close.id,
+                self.older.id,
+                self.yaris_listing.id,
+                self.pricier.id,
+                self.far.id,
+            ],
+        )
+        self.assertEqual(
+            engine.similar(self.yaris_listing, 2),
+            [self.target.id, self.close.id],
+        )
+        self.assertEqual(engine.similar(self.golf_listing, 4), [])
+
+    def test_saves_and_deletes_update_the_index(self):
+        engine.similar(self.target, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            closest = self.create_listing(10000, 2015, 101000)
+            self.older.year = 2016
+            self.older.save()
+            self.close.delete()
+
+        self.assertIn(closest.id, engine.delta[self.corolla.brand_id])
+        incremental = engine.similar(self.target, 3)
+        engine.rebuild()
+
+        self.assertEqual(engine.similar(self.target, 3), incremental)
+        self.assertEqual(
+            incremental, [closest.id, self.older.id, self.pricier.id]
+        )
+
+    def test_expired_index_is_rebuilt_in_the_background(self):
+        engine.similar(self.target, 1)
+        engine.built_at = 0.0
+
+        with mock.patch("marketplace.similar.executor") as executor:
+            with mock.patch.object(SimilarityIndex, "load") as load:
+                self.assertEqual(
+                    engine.similar(self.target, 1), [self.close.id]
+                )
+                engine.similar(self.target, 1)
+        engine.rebuilding = False
+
+        load.assert_not_called()
+        executor.submit.assert_called_once_with(engine.rebuild_in_background)
+
+    def test_index_dropped_during_a_search_is_loaded_again(self):
+        engine.similar(self.target, 1)
+        ensure_fresh = engine.ensure_fresh
+
+        def check_then_invalidate():
+            ensure_fresh()
+            if engine.index is not None and not invalidated:
+                invalidated.append(True)
+                engine.invalidate()
+
+        invalidated = []
+        with mock.patch.object(
+            engine, "ensure_fresh", side_effect=check_then_invalidate
+        ):
+            self.assertEqual(engine.similar(self.target, 1), [self.close.id])
+        self.assertEqual(invalidated, [True])
+
+    @override_settings(SIMILAR_LISTINGS_ASYNC_REBUILD=False)
+    def test_changes_during_a_rebuild_are_kept(self):
+        engine.similar(self.target, 1)
+        engine.expire()
+        load = SimilarityIndex.load
+        created = []
+
+        def load_then_save():
+            index = load()
+            with self.captureOnCommitCallbacks(execute=True):
+                created.append(self.create_listing(10000, 2015, 101000))
+                self.close.delete()
+            return index
+
+        with mock.patch.object(
+            SimilarityIndex, "load", side_effect=load_then_save
+        ):
+            engine.similar(self.target, 1)
+
+        self.assertIn(created[0].id, engine.delta[self.corolla.brand_id])
+        self.assertEqual(
+            engine.similar(self.target, 2), [created[0].id, self.older.id]
+        )
+
+    @override_settings(LISTING_DETAIL_CACHE_TIMEOUT=3600)
+    def test_detail_page_caches_the_similar_block(self):
+        get_catalog()
+        get_price_table()
+        engine.rebuild()
+        url = reverse(
+            "marketplace:listing-detail", kwargs={"pk": self.target.pk}
+        )
+
+        # The listing, its images, then the similar listings.
+        with self.assertMaxQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "Similar cars")
+        self.assertContains(
+            response,
+            reverse(
+                "marketplace:listing-detail", kwargs={"pk": self.close.pk}
+            ),
+        )
+
+        with self.assertMaxQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.target.price = 50000
+            self.target.save()
+        response = self.client.get(url)
+        self.assertContains(
+            response,
+            reverse("marketplace:listing-detail", kwargs={"pk": self.far.pk}),
+        )
+
+    def test_detail_page_without_similar_listings(self):
+        response = self.client.get(
+            reverse(
+                "marketplace:listing-detail",
+                kwargs={"pk": self.golf_listing.pk},
+            )
+        )
+
+        self.assertNotContains(response, "Similar cars")
+
+    def test_benchmark_command(self):
+        out = StringIO()
+
+        call_command("benchmark_similar_listings", queries=5, stdout=out)
+
+        self.assertIn("Index of 7 listings", out.getvalue())
+        self.assertIn("5 queries", out.getvalue())
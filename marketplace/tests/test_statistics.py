@@ -0,0 +1,192 @@
+from importlib import import_module
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase
+from django.urls import reverse
+
+from marketplace.catalog import get_catalog
+from marketplace.models import (
+    Brand,
+    Listing,
+    MarketStatistic,
+    MarketUser,
+    Model,
+)
+from marketplace.statistics import (
+    histogram_percentile,
+    market_counters,
+    market_statistics,
+)
+from marketplace.tests.utils import QueryBudgetMixin
+
+
+class MarketStatisticsTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = MarketUser.objects.create_user(
+            username="seller", password="pass12345"
+        )
+        brand = Brand.objects.create(name="Toyota")
+        self.corolla = Model.objects.create(brand=brand, name="Corolla")
+        self.yaris = Model.objects.create(brand=brand, name="Yaris")
+
+    def create_listing(self, price, year=2015, mileage=100000, model=None):
+        return Listing.objects.create(
+            seller=self.seller,
+            car_model=model or self.corolla,
+            year=year,
+            price=price,
+            mileage=mileage,
+            description="Test",
+        )
+
+    def statistic(self, dimension, key=0):
+        return MarketStatistic.objects.get(dimension=dimension, key=key)
+
+    def rollup(self):
+        return sorted(
+            MarketStatistic.objects.values_list(
+                "dimension", "key", "count", "price_sum", "price_min",
+                "price_max", "price_median", "price_p90", "price_histogram",
+                "mileage_sum", "mileage_min", "mileage_max",
+                "mileage_histogram",
+            )
+        )
+
+    def test_saves_and_deletes_update_the_rollup(self):
+        first = self.create_listing(10000)
+        second = self.create_listing(20000, year=2018)
+        self.create_listing(30000, model=self.yaris)
+
+        corolla = self.statistic(MarketStatistic.MODEL, self.corolla.id)
+        self.assertEqual(corolla.count, 2)
+        self.assertEqual(corolla.price_sum, 30000)
+        self.assertEqual((corolla.price_min, corolla.price_max),
+                         (10000, 20000))
+        self.assertEqual(self.statistic(MarketStatistic.TOTAL).count, 3)
+        self.assertEqual(self.statistic(MarketStatistic.YEAR, 2015).count, 2)
+
+        second.price = 25000
+        second.save()
+        first.delete()
+
+        corolla = self.statistic(MarketStatistic.MODEL, self.corolla.id)
+        self.assertEqual(corolla.count, 1)
+        self.assertEqual(corolla.price_sum, 25000)
+        self.assertEqual((corolla.price_min, corolla.price_max),
+                         (25000, 25000))
+        self.assertEqual(self.statistic(MarketStatistic.TOTAL).count, 2)
+
+    def test_moving_a_listing_empties_its_old_groups(self):
+        listing = self.create_listing(10000, year=2015)
+
+        listing.car_model = self.yaris
+        listing.year = 2016
+        listing.save()
+
+        self.assertFalse(
+            MarketStatistic.objects.filter(
+                dimension=MarketStatistic.MODEL, key=self.corolla.id
+            ).exists()
+        )
+        self.assertFalse(
+            MarketStatistic.objects.filter(
+                dimension=MarketStatistic.YEAR, key=2015
+            ).exists()
+        )
+        self.assertEqual(
+            self.statistic(MarketStatistic.MODEL, self.yaris.id).count, 1
+        )
+
+    def test_saves_of_other_fields_skip_the_stored_row(self):
+        listing = self.create_listing(10000)
+        listing.description = "Updated"
+
+        with self.assertNumQueries(1):
+            listing.save(update_fields=["description"])
+
+        self.assertEqual(self.statistic(MarketStatistic.TOTAL).count, 1)
+
+    def test_incremental_rollup_matches_a_rebuild(self):
+        for price in (1000, 5200, 9900, 48000, 51000):
+            self.create_listing(price, mileage=price * 3)
+        self.create_listing(7000, model=self.yaris, year=2020)
+        Listing.objects.filter(price=5200).delete()
+        incremental = self.rollup()
+
+        call_command("rebuild_market_statistics", stdout=StringIO())
+
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_percentiles_come_from_the_histogram(self):
+        histogram = {"2": 5, "10": 4, "40": 1}
+
+        self.assertEqual(
+            histogram_percentile(histogram, 10, 0.5, 500, 1000, 20100),
+            1250,
+        )
+        self.assertEqual(
+            histogram_percentile(histogram, 10, 0.9, 500, 1000, 20100),
+            5250,
+        )
+        self.assertEqual(
+            histogram_percentile(histogram, 10, 1.0, 500, 1000, 20100),
+            20100,
+        )
+
+    def test_counts_users_and_models(self):
+        self.create_listing(10000)
+        MarketUser.objects.create_user(username="buyer", password="x")
+        self.yaris.delete()
+
+        self.assertEqual(
+            market_counters(),
+            {"num_listings": 1, "num_users": 2, "num_models": 1},
+        )
+
+    def test_migration_backfills_the_rollup(self):
+        for price in (10000, 12500, 31000):
+            self.create_listing(price, mileage=price * 7)
+        self.create_listing(20000, model=self.yaris)
+        call_command("rebuild_market_statistics", stdout=StringIO())
+        rebuilt = self.rollup()
+        MarketStatistic.objects.all().delete()
+        name = "0013_backfill_market_statistics"
+        state = MigrationLoader(connection).project_state(
+            ("marketplace", name)
+        )
+
+        import_module(
+            f"marketplace.migrations.{name}"
+        ).backfill_market_statistics(state.apps, None)
+
+        self.assertEqual(self.rollup(), rebuilt)
+        self.assertEqual(
+            market_counters(),
+            {"num_listings": 4, "num_users": 1, "num_models": 2},
+        )
+
+    def test_index_and_statistics_page_read_the_rollup(self):
+        self.create_listing(10000)
+        self.create_listing(30000, model=self.yaris, year=2020)
+        get_catalog()
+
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse("marketplace:index"))
+        self.assertEqual(response.context["num_listings"], 2)
+        self.assertEqual(response.context["num_models"], 2)
+
+        with self.assertMaxQueries(1):
+            response = self.client.get(
+                reverse("marketplace:market-statistics")
+            )
+        self.assertContains(response, "Toyota Yaris")
+        self.assertContains(response, "30 000")
+        self.assertEqual(
+            [row["key"] for row in market_statistics()["year"]],
+            [2015, 2020],
+        )
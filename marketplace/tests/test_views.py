@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
@@ -103,7 +104,7 @@ class PrivateMarketUserTests(TestCase):
             in listing.users.all()
         )
 
-        response = self.client.get(
+        response = self.client.post(
             reverse(
                 "marketplace:toggle-assign-to-listing",
                 kwargs={"pk": market_user.id}
@@ -137,7 +138,7 @@ class PrivateMarketUserTests(TestCase):
             listing.users.all()
         )
 
-        response = self.client.get(
+        response = self.client.post(
             reverse(
                 "marketplace:toggle-assign-to-listing",
                 kwargs={"pk": market_user.id}
@@ -151,6 +152,9 @@ class PrivateMarketUserTests(TestCase):
 
 
 class PublicListingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
     def test_login_required(self):
         response = self.client.get(LISTINGS_URL)
 
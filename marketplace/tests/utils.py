@@ -0,0 +1,35 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class _AssertMaxQueriesContext(CaptureQueriesContext):
+    def __init__(self, test_case, budget, connection):
+        self.test_case = test_case
+        self.budget = budget
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        executed = len(self)
+        self.test_case.assertLessEqual(
+            executed,
+            self.budget,
+            f"{executed} queries executed, the budget is {self.budget}:\n"
+            + "\n".join(
+                f"{number}. {query['sql']}"
+                for number, query in enumerate(self.captured_queries, 1)
+            ),
+        )
+
+
+class QueryBudgetMixin:
+    """
+    ``TestCase`` mixin adding ``assertMaxQueries``, which fails when the
+    block runs more queries than its budget, so N+1 regressions are
+    caught without pinning the exact count.
+    """
+
+    def assertMaxQueries(self, budget: int, using: str = DEFAULT_DB_ALIAS):
+        return _AssertMaxQueriesContext(self, budget, connections[using])
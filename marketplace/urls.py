@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
 
+from marketplace import async_views
+from marketplace.api import listing_detail_api, listing_list_api
 from marketplace.views import (
     index,
+    brand_models,
+    price_estimate,
+    statistics,
     ListingCreateView,
     ListingListView,
     ListingDetailView,
@@ -14,12 +20,16 @@ from marketplace.views import (
     MarketUserSaleListingsView,
     ListingUpdateView,
     ListingDeleteView,
+    SavedSearchCreateView,
+    SavedSearchDeleteView,
+    SavedSearchListView,
     UserPasswordChangeView,
 )
 
 
 urlpatterns = [
     path("", index, name="index"),
+    path("statistics/", statistics, name="market-statistics"),
     path(
         "listing/create/",
         ListingCreateView.as_view(),
@@ -45,11 +55,31 @@ urlpatterns = [
         ToggleAssignToListingView.as_view(),
         name="toggle-assign-to-listing",
     ),
+    path(
+        "brands/<int:pk>/models/",
+        brand_models,
+        name="brand-models",
+    ),
+    path(
+        "price-estimate/",
+        price_estimate,
+        name="price-estimate",
+    ),
     path(
         "listings/",
         ListingListView.as_view(),
         name="listings-list"
     ),
+    path(
+        "api/listings/",
+        listing_list_api,
+        name="api-listing-list",
+    ),
+    path(
+        "api/listings/<int:pk>",
+        listing_detail_api,
+        name="api-listing-detail",
+    ),
     path(
         "market-user-detail/<int:pk>/",
         MarketUserDetailView.as_view(),
@@ -75,6 +105,21 @@ urlpatterns = [
         MarketUserSaleListingsView.as_view(),
         name="sale-listings",
     ),
+    path(
+        "saved-searches/",
+        SavedSearchListView.as_view(),
+        name="saved-searches",
+    ),
+    path(
+        "saved-searches/create/",
+        SavedSearchCreateView.as_view(),
+        name="saved-search-create",
+    ),
+    path(
+        "saved-searches/<int:pk>/delete/",
+        SavedSearchDeleteView.as_view(),
+        name="saved-search-delete",
+    ),
     path(
         "accounts/password_change/",
         UserPasswordChangeView.as_view(),
@@ -82,4 +127,27 @@ urlpatterns = [
     ),
 ]
 
+# Matched before their sync counterparts when ASYNC_VIEWS is enabled.
+async_urlpatterns = [
+    path("", async_views.index, name="index"),
+    path(
+        "listing-detail/<int:pk>",
+        async_views.ListingDetailView.as_view(),
+        name="listing-detail"
+    ),
+    path(
+        "listings-detail/<int:pk>/toggle-assign/",
+        async_views.ToggleAssignToListingView.as_view(),
+        name="toggle-assign-to-listing",
+    ),
+    path(
+        "listings/",
+        async_views.ListingListView.as_view(),
+        name="listings-list"
+    ),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
+
 app_name = "marketplace"
@@ -1,13 +1,27 @@
+import hashlib
+
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import PasswordChangeView
-from django.db.models import Prefetch
 from django.forms import inlineformset_factory
-from django.http import HttpRequest, HttpResponseRedirect
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+)
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views import generic, View
+from django.views.decorators.cache import cache_control
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
 
 from marketplace.forms import (
     SearchForm,
@@ -16,16 +30,43 @@ from marketplace.forms import (
     MarketUserUpdateForm,
     UserPasswordChangeForm,
 )
-from marketplace.models import Model, MarketUser, Listing, Image
+from marketplace.models import (
+    MarketUser,
+    Listing,
+    Image,
+    Notification,
+    SavedSearch,
+)
+from marketplace.catalog import get_catalog
+from marketplace.facets import listing_facets
+from marketplace.caching import (
+    get_favourites_generation,
+    get_fragments_generation,
+    listing_detail_key,
+)
+from marketplace.favourites import (
+    Favourite,
+    FavouriteFlagsMixin,
+    is_favourite,
+    toggle_favourite,
+)
+from marketplace.images import save_with_concurrent_uploads
+from marketplace.pagination import ListingPaginationMixin
+from marketplace.pricing import get_price_table
+from marketplace.response_cache import cache_anonymous_response
+from marketplace.search import ORMSearchBackend, get_search_backend
+from marketplace.statistics import (
+    MILEAGE_BUCKET,
+    PRICE_BUCKET,
+    market_counters,
+    market_statistics,
+)
 
 
+@cache_anonymous_response("index")
 def index(request: HttpRequest):
     form = SearchForm(request.GET)
-    context = {
-        "num_listings": Listing.objects.count(),
-        "num_users": MarketUser.objects.count(),
-        "num_models": Model.objects.count(),
-    }
+    context = market_counters()
 
     if form.is_valid():
         context.update(
@@ -36,50 +77,110 @@ def index(request: HttpRequest):
         return render(request, "marketplace/index.html", context=context)
 
 
-class ListingListView(generic.ListView):
+@cache_anonymous_response("statistics")
+def statistics(request: HttpRequest):
+    summaries = market_statistics()
+    model_labels = dict(get_catalog().model_choices())
+    for row in summaries["model"]:
+        row["label"] = model_labels.get(row["key"], row["key"])
+    for row in summaries["year"]:
+        row["label"] = row["key"]
+
+    return render(
+        request,
+        "marketplace/statistics.html",
+        context={
+            "tables": [
+                ("By model", summaries["model"]),
+                ("By year", summaries["year"]),
+            ],
+            "price_bucket": PRICE_BUCKET,
+            "mileage_bucket": MILEAGE_BUCKET,
+        },
+    )
+
+
+@require_GET
+def price_estimate(request: HttpRequest):
+    try:
+        car_model_id = int(request.GET["car_model"])
+        year = int(request.GET["year"])
+        mileage = int(request.GET["mileage"])
+    except (KeyError, ValueError):
+        return JsonResponse(
+            {"error": "car_model, year and mileage must be integers."},
+            status=400,
+        )
+
+    estimate = get_price_table().estimate(car_model_id, year, mileage)
+    if estimate is None:
+        raise Http404("No listings of this car model")
+    return JsonResponse(estimate)
+
+
+@require_GET
+@cache_control(public=True, max_age=settings.CATALOG_HTTP_MAX_AGE)
+def brand_models(request: HttpRequest, pk: int):
+    catalog = get_catalog()
+    if pk not in catalog.models_by_brand:
+        raise Http404("Brand not found")
+
+    response = JsonResponse(
+        {
+            "brand": pk,
+            "models": [
+                {"id": model_id, "name": label}
+                for model_id, label in catalog.brand_model_choices(pk)
+            ],
+        }
+    )
+    # Derived from the body, so every worker sends the same ETag for the
+    # same models, across restarts too.
+    response["ETag"] = quote_etag(hashlib.md5(response.content).hexdigest())
+    return get_conditional_response(
+        request, etag=response["ETag"], response=response
+    )
+
+
+class BaseListingListView(
+    FavouriteFlagsMixin, ListingPaginationMixin, generic.ListView
+):
     model = Listing
     paginate_by = 5
     template_name = "marketplace/listing_list.html"
     context_object_name = "listings"
 
     def get_queryset(self):
-        queryset = Listing.objects.select_related("car_model__brand")
-
-        brand = self.request.GET.get("brand")
-        model = self.request.GET.get("model")
-        year_start = self.request.GET.get("year_start")
-        year_end = self.request.GET.get("year_end")
-        price_start = self.request.GET.get("price_start")
-        price_end = self.request.GET.get("price_end")
-        mileage_start = self.request.GET.get("mileage_start")
-        mileage_end = self.request.GET.get("mileage_end")
-
-        if brand:
-            queryset = queryset.filter(car_model__brand__id=brand)
-        if model:
-            queryset = queryset.filter(car_model__id=model)
-        if year_start:
-            queryset = queryset.filter(year__gte=year_start)
-        if year_end:
-            queryset = queryset.filter(year__lte=year_end)
-        if price_start:
-            queryset = queryset.filter(price__gte=price_start)
-        if price_end:
-            queryset = queryset.filter(price__lte=price_end)
-        if mileage_start:
-            queryset = queryset.filter(mileage__gte=mileage_start)
-        if mileage_end:
-            queryset = queryset.filter(mileage__lte=mileage_end)
-
-        queryset = queryset.prefetch_related(
-            Prefetch(
-                "images",
-                queryset=Image.objects.order_by("id")[:1],
-                to_attr="first_image",
-            )
+        queryset = Listing.objects.select_related(
+            "car_model__brand", "cover_image"
         )
 
-        return queryset
+        if self.use_cursor_pagination():
+            search_backend = ORMSearchBackend()
+        else:
+            search_backend = get_search_backend()
+
+        return search_backend.search(queryset, self.request.GET)
+
+    def get_facets(self) -> dict:
+        return listing_facets(self.request.GET)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["facets"] = self.get_facets()
+        if self.request.user.is_authenticated:
+            context["saved_search_params"] = [
+                (param, value)
+                for param, value in self.request.GET.items()
+                if param in SearchForm.base_fields and value
+            ]
+
+        return context
+
+
+@method_decorator(cache_anonymous_response("listings"), name="dispatch")
+class ListingListView(BaseListingListView):
+    pass
 
 
 ImageFormSet = inlineformset_factory(
@@ -90,10 +191,62 @@ ImageFormSet = inlineformset_factory(
 class ListingDetailView(generic.DetailView):
     model = Listing
 
+    def get_queryset(self):
+        # The listing is cached as loaded, so only the seller fields the
+        # page shows are read, never the password hash or e-mail.
+        queryset = Listing.objects.select_related(
+            "car_model__brand", "seller"
+        ).only(
+            *(field.name for field in Listing._meta.concrete_fields),
+            "car_model__name",
+            "car_model__brand__name",
+            "seller__first_name",
+            "seller__phone_number",
+        ).prefetch_related(
+            Prefetch("images", queryset=Image.objects.order_by("id"))
+        )
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favourite=Exists(
+                    Favourite.objects.filter(
+                        listing_id=OuterRef("pk"),
+                        marketuser_id=self.request.user.id,
+                    )
+                )
+            )
+        return queryset
+
+    def get_cached_object(self) -> tuple:
+        """
+        Return ``(key, listing)`` of the listing detail cache, with
+        ``listing`` None on a miss.
+        """
+        if not settings.LISTING_DETAIL_CACHE_TIMEOUT:
+            return None, None
+        key = listing_detail_key(
+            self.kwargs[self.pk_url_kwarg], get_fragments_generation()
+        )
+        return key, cache.get(key)
+
+    def get_object(self, queryset=None):
+        key, listing = self.get_cached_object()
+        if listing is not None:
+            self.is_favourite = is_favourite(self.request.user, listing.id)
+            return listing
+
+        listing = super().get_object(queryset)
+        # The flag belongs to the current user, so keep it out of the
+        # shared cache entry.
+        self.is_favourite = listing.__dict__.pop("is_favourite", False)
+        if key is not None:
+            cache.set(key, listing, settings.LISTING_DETAIL_CACHE_TIMEOUT)
+        return listing
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["images"] = self.object.images.all()
-        context["is_author"] = self.object.seller == self.request.user
+        context["is_author"] = self.object.seller_id == self.request.user.id
+        context["is_favourite"] = self.is_favourite
 
         return context
 
@@ -124,9 +277,10 @@ class ListingCreateView(LoginRequiredMixin, generic.CreateView):
             instances = image_formset.save(commit=False)
             for instance in instances:
                 instance.listing = listing
-                instance.save()
+            save_with_concurrent_uploads(instances, "image")
 
-            return super().form_valid(form)
+            self.object = listing
+            return HttpResponseRedirect(self.get_success_url())
         else:
             return self.render_to_response(self.get_context_data(form=form))
 
@@ -163,9 +317,10 @@ class ListingUpdateView(LoginRequiredMixin, generic.UpdateView):
                 instance.delete()
             for instance in instances:
                 instance.listing = listing
-                instance.save()
+            save_with_concurrent_uploads(instances, "image")
 
-            return super().form_valid(form)
+            self.object = listing
+            return HttpResponseRedirect(self.get_success_url())
         else:
             return self.render_to_response(self.get_context_data(form=form))
 
@@ -218,7 +373,12 @@ class MarketUserUpdateView(LoginRequiredMixin, generic.UpdateView):
         )
 
 
-class MarketUserFavouriteListingsView(LoginRequiredMixin, generic.ListView):
+class MarketUserFavouriteListingsView(
+    LoginRequiredMixin,
+    FavouriteFlagsMixin,
+    ListingPaginationMixin,
+    generic.ListView,
+):
     model = Listing
     template_name = "marketplace/listing_list.html"
     paginate_by = 5
@@ -229,27 +389,32 @@ class MarketUserFavouriteListingsView(LoginRequiredMixin, generic.ListView):
         if self.request.user.id != user_id:
             return Listing.objects.none()
 
-        queryset = Listing.objects.filter(users__in=[self.request.user])
-
-        queryset = queryset.prefetch_related(
-            Prefetch(
-                "images",
-                queryset=Image.objects.order_by("id")[:1],
-                to_attr="first_image",
-            )
-        )
+        queryset = Listing.objects.filter(
+            users__in=[self.request.user]
+        ).select_related("car_model__brand", "cover_image")
 
         return queryset
 
+    def get_count_key(self) -> str:
+        user_id = self.request.user.id
+        return (
+            f"{super().get_count_key()}:{user_id}:"
+            f"{get_favourites_generation(user_id)}"
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        all_listings_count = self.get_queryset().count()
-        context["num_listings"] = all_listings_count
+        context["num_listings"] = context["paginator"].count
 
         return context
 
 
-class MarketUserSaleListingsView(LoginRequiredMixin, generic.ListView):
+class MarketUserSaleListingsView(
+    LoginRequiredMixin,
+    FavouriteFlagsMixin,
+    ListingPaginationMixin,
+    generic.ListView,
+):
     model = Listing
     paginate_by = 5
     template_name = "marketplace/listing_list.html"
@@ -258,40 +423,80 @@ class MarketUserSaleListingsView(LoginRequiredMixin, generic.ListView):
     def get_queryset(self):
         user_id = self.kwargs.get("pk")
 
-        queryset = Listing.objects.filter(seller_id=user_id)
-        queryset = queryset.prefetch_related(
-            Prefetch(
-                "images",
-                queryset=Image.objects.order_by("id")[:1],
-                to_attr="first_image",
-            )
-        )
+        queryset = Listing.objects.filter(
+            seller_id=user_id
+        ).select_related("car_model__brand", "cover_image")
 
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        all_listings_count = self.get_queryset().count()
-        context["num_listings"] = all_listings_count
+        context["num_listings"] = context["paginator"].count
 
         return context
 
 
 class ToggleAssignToListingView(LoginRequiredMixin, View):
-    def get(self, request, pk):
-        user = MarketUser.objects.get(id=request.user.id)
-        listing = get_object_or_404(Listing, id=pk)
-
-        if listing in user.favourite_listings.all():
-            user.favourite_listings.remove(listing)
-        else:
-            user.favourite_listings.add(listing)
+    def post(self, request, pk):
+        if not Listing.objects.filter(pk=pk).exists():
+            raise Http404("Listing not found")
+        toggle_favourite(request.user, pk)
 
         return HttpResponseRedirect(
             reverse_lazy("marketplace:listing-detail", args=[pk])
         )
 
 
+class SavedSearchListView(LoginRequiredMixin, generic.ListView):
+    model = SavedSearch
+    template_name = "marketplace/saved_search_list.html"
+    context_object_name = "saved_searches"
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(
+            user=self.request.user
+        ).select_related("brand", "car_model__brand")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        notifications = list(
+            Notification.objects.filter(
+                user=self.request.user
+            ).select_related("listing__car_model__brand")[
+                :settings.NOTIFICATIONS_SHOWN
+            ]
+        )
+        unseen = [
+            notification.id
+            for notification in notifications
+            if not notification.seen
+        ]
+        if unseen:
+            Notification.objects.filter(id__in=unseen).update(seen=True)
+        context["notifications"] = notifications
+
+        return context
+
+
+class SavedSearchCreateView(LoginRequiredMixin, View):
+    def post(self, request):
+        form = SearchForm(request.POST)
+        if not form.is_valid() or not any(form.cleaned_data.values()):
+            return HttpResponseBadRequest("Choose at least one filter.")
+        form.saved_search(request.user).save()
+
+        return HttpResponseRedirect(reverse("marketplace:saved-searches"))
+
+
+class SavedSearchDeleteView(LoginRequiredMixin, generic.DeleteView):
+    model = SavedSearch
+    http_method_names = ["post"]
+    success_url = reverse_lazy("marketplace:saved-searches")
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user)
+
+
 class UserPasswordChangeView(PasswordChangeView):
     template_name = "registration/password_change.html"
     form_class = UserPasswordChangeForm
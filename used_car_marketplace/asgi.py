@@ -9,8 +9,64 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "used_car_marketplace.settings")
+os.environ.setdefault("DJANGO_ASYNC_VIEWS", "True")
+
+
+class StaticFiles(WhiteNoiseMiddleware):
+    """
+    WhiteNoise configured from the Django settings like its middleware,
+    as a WSGI application that answers unknown files with a 404.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.application = self.not_found
+
+    # The WSGI entry points of WhiteNoise, not those of the middleware.
+    serve = staticmethod(WhiteNoise.serve)
+
+    def __call__(self, environ, start_response):
+        return WhiteNoise.__call__(self, environ, start_response)
+
+    @staticmethod
+    def not_found(environ, start_response):
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"Not Found"]
+
+
+def with_static_files(application):
+    """
+    Serve ``STATIC_URL`` with WhiteNoise in front of ``application``.
+
+    As sync-only middleware WhiteNoise would hold a thread for every
+    request; here only static file requests reach it, each on a thread
+    of its own.
+    """
+    static_files = StaticFiles()
+    static_application = WsgiToAsgi(static_files)
+
+    async def dispatch(scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(
+            static_files.static_prefix
+        ):
+            async with ThreadSensitiveContext():
+                await static_application(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+
+    return dispatch
+
 
 application = get_asgi_application()
+
+if settings.ASYNC_VIEWS:
+    # WhiteNoise is left out of the middleware under async views.
+    application = with_static_files(application)
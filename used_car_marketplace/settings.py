@@ -102,6 +102,27 @@ DATABASES = {
 db_from_env = dj_database_url.config(conn_max_age=600)
 DATABASES["default"].update(db_from_env)
 
+# The covering listing index only includes its extra columns on
+# PostgreSQL; SQLite builds it as a plain index.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Listing caches are invalidated for every worker through the default
+# cache, so it has to be shared by all of them. Without REDIS_URL each
+# process keeps its own local memory cache, and the long-lived listing
+# card and detail caches are switched off.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+SHARED_CACHE = bool(REDIS_URL)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -122,6 +143,115 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "marketplace.MarketUser"
 
+# Listing pages are paginated with (created_at, id) cursors instead of
+# page numbers when enabled, so deep pages cost the same as the first one.
+LISTING_CURSOR_PAGINATION = (
+    os.environ.get("LISTING_CURSOR_PAGINATION", "False").lower() == "true"
+)
+
+# Search result counts above the threshold are shown as "10 000+" instead
+# of being counted exactly. On PostgreSQL the planner row estimate can be
+# used to skip the count query entirely for broad searches.
+LISTING_COUNT_THRESHOLD = int(os.environ.get("LISTING_COUNT_THRESHOLD", 10000))
+LISTING_COUNT_CACHE_TIMEOUT = int(
+    os.environ.get("LISTING_COUNT_CACHE_TIMEOUT", 60)
+)
+LISTING_COUNT_ESTIMATE = (
+    os.environ.get("LISTING_COUNT_ESTIMATE", "True").lower() == "true"
+)
+
+# Search backend for ListingListView. The columnar backend answers the
+# filters from an in-memory NumPy snapshot of the listings table.
+LISTING_SEARCH_BACKEND = os.environ.get(
+    "LISTING_SEARCH_BACKEND", "marketplace.search.ORMSearchBackend"
+)
+LISTING_SEARCH_REFRESH_SECONDS = 30
+# Changes are re-read this far back, to cover transactions that commit
+# after a later one and clock skew between workers.
+LISTING_SEARCH_CHANGE_OVERLAP_SECONDS = 60
+LISTING_SEARCH_REBUILD_SECONDS = 60 * 60
+LISTING_SEARCH_MAX_DELTA = 10000
+# Load expired snapshots on a background thread instead of in a request.
+LISTING_SEARCH_ASYNC_REBUILD = True
+
+# Facet counts shown next to the search results. Cached counts are not
+# invalidated by listing changes, so they lag behind by up to the timeout.
+LISTING_FACET_PRICE_STEP = 5000
+LISTING_FACET_MILEAGE_STEP = 50000
+LISTING_FACET_CACHE_TIMEOUT = 60
+
+# Rendered listing cards and listing detail data, invalidated by signals
+# when a listing, its images, its car model or its seller change.
+LISTING_CARD_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 0
+LISTING_DETAIL_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 0
+
+# Rendered index and listing search pages served to anonymous visitors.
+# Entries are dropped whenever a listing changes; set to 0 to disable.
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 60))
+
+# Brands and models are kept in memory by every worker, which checks the
+# shared catalog version at most this often.
+CATALOG_CHECK_SECONDS = 5
+
+# Browser/CDN lifetime of the brand models JSON; revalidated with an ETag
+# hashed from the response body.
+CATALOG_HTTP_MAX_AGE = 5 * 60
+
+# Per car model price regressions are kept in memory by every worker,
+# which checks for refitted models at most this often. Updated rows are
+# re-read this far back, to cover transactions that commit late and
+# clock skew between workers. Listings of models with fewer listings
+# than the minimum get no deal badge.
+PRICE_TABLE_CHECK_SECONDS = 5
+PRICE_TABLE_CHANGE_OVERLAP_SECONDS = 60
+PRICE_ESTIMATE_MIN_LISTINGS = 20
+
+# Similar listings on the detail page come from an in-memory index kept
+# by every worker. Saves in the worker update it in place; it is rebuilt
+# after this many such changes or this long, which is also how listings
+# saved by other workers get in. Rendered blocks are cached per listing.
+SIMILAR_LISTINGS_COUNT = 4
+SIMILAR_LISTINGS_MAX_DELTA = 10000
+SIMILAR_LISTINGS_REBUILD_SECONDS = 60 * 60
+# Load expired indexes on a background thread instead of in a request.
+SIMILAR_LISTINGS_ASYNC_REBUILD = True
+SIMILAR_LISTINGS_CACHE_TIMEOUT = 10 * 60
+
+# New listings are matched against saved searches from an in-memory index
+# kept by every worker. Searches created since it was loaded are re-read
+# into a small side index at most every SAVED_SEARCH_CHECK_SECONDS, from
+# the overlap before the load on; the main index is reloaded in the
+# background once the side index or its age passes the limits below.
+# Notifications are inserted this many rows at a time, and the saved
+# searches page lists the latest ones.
+SAVED_SEARCH_CHECK_SECONDS = 5
+SAVED_SEARCH_CHANGE_OVERLAP_SECONDS = 60
+SAVED_SEARCH_MAX_RECENT = 1000
+SAVED_SEARCH_REBUILD_SECONDS = 10 * 60
+SAVED_SEARCH_ASYNC_REBUILD = True
+NOTIFICATION_BATCH_SIZE = 1000
+NOTIFICATIONS_SHOWN = 50
+
+# The index, listing search, listing detail and favourite toggle are
+# served by async views when enabled, which asgi.py does. Sync-only
+# middleware is left out then, as it would put every request back on a
+# thread of its own; asgi.py puts WhiteNoise in front of the application
+# for static files instead.
+ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "False").lower() == "true"
+if ASYNC_VIEWS:
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in (
+            "debug_toolbar.middleware.DebugToolbarMiddleware",
+            "whitenoise.middleware.WhiteNoiseMiddleware",
+        )
+    ]
+
+# Independent queries of an async view run at the same time on this many
+# worker threads, each keeping its own database connection. With 0 they
+# run one after another on the request's thread.
+ASYNC_QUERY_WORKERS = int(os.environ.get("ASYNC_QUERY_WORKERS", 8))
+
 LOGIN_REDIRECT_URL = "/"
 
 # Internationalization
@@ -162,3 +292,11 @@ PUBLIC_MEDIA_LOCATION = 'media'
 MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/{PUBLIC_MEDIA_LOCATION}/'
 DEFAULT_FILE_STORAGE = 'used_car_marketplace.storage_backends.PublicMediaStorage'
 
+# Thumbnails and WebP/AVIF variants of uploaded images are generated on a
+# background thread after the upload is committed.
+IMAGE_VARIANTS_ASYNC = True
+
+# Listing photos submitted together are uploaded to the media storage in
+# parallel by this many threads.
+MEDIA_UPLOAD_WORKERS = int(os.environ.get("MEDIA_UPLOAD_WORKERS", 4))
+
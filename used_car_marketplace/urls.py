@@ -29,6 +29,6 @@ urlpatterns = [
 
 # if settings.DEBUG:
 urlpatterns += [
-    static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
+    *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
     path("__debug__/", include("debug_toolbar.urls")),
 ]